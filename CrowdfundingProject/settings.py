@@ -11,11 +11,13 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
-import dj_database_url
 from dotenv import load_dotenv
 
+from core import cache_url, database_url
+
 load_dotenv()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -59,6 +61,7 @@ INSTALLED_APPS = [
   "django_browser_reload",  # Live reloader
   "heroicons",
   # Project apps
+  "core",
   "user",
   "campaigns",
   "donations",
@@ -67,13 +70,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+  "core.tracing.TracingMiddleware",  # Request traces with SQL/template/cache spans (off unless TRACING_EXPORT)
+  "core.metrics.MetricsMiddleware",  # Request latency and per-request DB histograms for /metrics
+  "core.querybudget.QueryBudgetMiddleware",  # Query counts and budgets, outermost to see every query
+  "core.profiling.ProfilingMiddleware",  # Sampled cProfile/tracemalloc (off unless PROFILING_SAMPLE_RATE > 0)
   "django.middleware.security.SecurityMiddleware",
-  "whitenoise.middleware.WhiteNoiseMiddleware",
+  "core.static.AsyncWhiteNoiseMiddleware",  # WhiteNoise, without forcing the stack into sync mode
   "django.contrib.sessions.middleware.SessionMiddleware",
   "django.middleware.locale.LocaleMiddleware",
   "django.middleware.common.CommonMiddleware",
   "django.middleware.csrf.CsrfViewMiddleware",
   "django.contrib.auth.middleware.AuthenticationMiddleware",
+  "user.middleware.ProfileMiddleware",  # Lazy request.profile
   "django.contrib.messages.middleware.MessageMiddleware",
   "django.middleware.clickjacking.XFrameOptionsMiddleware",
   "django_browser_reload.middleware.BrowserReloadMiddleware",  # Live reloader
@@ -84,7 +92,7 @@ ROOT_URLCONF = "CrowdfundingProject.urls"
 
 TEMPLATES = [
   {
-    "BACKEND": "django.template.backends.django.DjangoTemplates",
+    "BACKEND": "core.template_backends.TimedDjangoTemplates",  # DjangoTemplates + render time metrics
     "DIRS": [BASE_DIR / "templates"],
     "APP_DIRS": True,
     "OPTIONS": {
@@ -105,14 +113,29 @@ WSGI_APPLICATION = "CrowdfundingProject.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection reuse and pooling are DATABASE_URL parameters (see core/database_url.py),
+# e.g. postgres://.../db?pool=true&pool_max_size=10. DATABASE_PARAMS appends
+# parameters to a URL provided by the host. A site served from SQLite should
+# set DATABASE_PARAMS=profile=production (WAL, tuned pragmas, BEGIN IMMEDIATE).
+
 DATABASES = {
-  "default": dj_database_url.config(
-    default=os.environ.get("DATABASE_URL", "sqlite:///" + str(BASE_DIR / "db.sqlite3")),
-    conn_max_age=600,
+  "default": database_url.parse(
+    os.environ.get("DATABASE_URL", "sqlite:///" + str(BASE_DIR / "db.sqlite3")),
+    os.environ.get("DATABASE_PARAMS", ""),
   )
 }
 
 
+# Cache
+# Per-process memory by default. Workers only share cached data (and cache
+# invalidations) with a shared backend, e.g. CACHE_URL=db://django_cache;
+# see core/cache_url.py for the supported URLs.
+
+CACHES = {
+  "default": cache_url.parse(os.environ.get("CACHE_URL", "locmem://")),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -175,8 +198,117 @@ LOGOUT_REDIRECT_URL = "/"
 
 DEFAULT_UI_THEME = "light"
 
-# Dev-friendly password reset emails
-EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+# Notifications
+
+# Read notifications older than this are removed by `manage.py prune_notifications`.
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get("NOTIFICATION_RETENTION_DAYS", "90"))
+
+# Emails per SMTP batch in `manage.py send_notification_digests`.
+NOTIFICATION_DIGEST_BATCH_SIZE = int(os.environ.get("NOTIFICATION_DIGEST_BATCH_SIZE", "100"))
+
+# Absolute base URL for links in emails.
+SITE_URL = os.environ.get(
+  "SITE_URL",
+  f"https://{RENDER_EXTERNAL_HOSTNAME}" if RENDER_EXTERNAL_HOSTNAME else "http://localhost:8000",
+)
+
+# Campaigns
+
+# Max age of the per-process category/tag snapshot (also invalidated on change).
+TAXONOMY_CACHE_SECONDS = int(os.environ.get("TAXONOMY_CACHE_SECONDS", "300"))
+
+# Follower notifications inserted per transaction by `manage.py process_campaign_fanouts`.
+CAMPAIGN_FANOUT_CHUNK_SIZE = int(os.environ.get("CAMPAIGN_FANOUT_CHUNK_SIZE", "1000"))
+
+# Feed
+
+# The first page of each user's activity feed is cached for this long.
+FEED_CACHE_SECONDS = int(os.environ.get("FEED_CACHE_SECONDS", "30"))
+
+# Groups
+
+# Group messages older than this are moved to the archive table by
+# `manage.py archive_group_messages`.
+GROUP_MESSAGE_RETENTION_DAYS = int(os.environ.get("GROUP_MESSAGE_RETENTION_DAYS", "180"))
+
+# Async views (see core/asyncdb.py)
+
+# Serve the hot read views (campaign list/detail, updates, events) as async
+# views. Only worth it under ASGI, so asgi.py turns it on (production runs
+# uvicorn workers); WSGI, tests and management commands use the sync views.
+ASYNC_READ_VIEWS = os.environ.get("ASYNC_READ_VIEWS", "False") == "True"
+
+# Threads (each with its own DB connection) per process for the queries async
+# views run concurrently.
+ASYNC_DB_THREADS = int(os.environ.get("ASYNC_DB_THREADS", "4"))
+
+# Query budgets (see core/querybudget.py)
+
+# A SQL fingerprint running more often than this in one request is reported as an N+1.
+QUERY_BUDGET_MAX_REPEATS = int(os.environ.get("QUERY_BUDGET_MAX_REPEATS", "5"))
+
+# Raise instead of logging when a request goes over budget (set in tests).
+QUERY_BUDGET_STRICT = os.environ.get("QUERY_BUDGET_STRICT", "False") == "True"
+
+# Request profiling (see core/profiling.py; reports at /admin/profiles/)
+
+# Fraction of requests profiled with cProfile; 0 disables the middleware.
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+
+# Also record allocation sites of sampled requests with tracemalloc (slower).
+PROFILING_TRACEMALLOC = os.environ.get("PROFILING_TRACEMALLOC", "False") == "True"
+
+# Aggregated profiles are kept here, for at most PROFILING_MAX_VIEWS URL names.
+PROFILING_DIR = os.environ.get("PROFILING_DIR", str(BASE_DIR / "profiles"))
+PROFILING_MAX_VIEWS = int(os.environ.get("PROFILING_MAX_VIEWS", "200"))
+
+# Metrics (see core/metrics.py)
+
+# Scrapers must send "Authorization: Bearer <METRICS_TOKEN>"; without a token
+# /metrics only answers in DEBUG.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Each gunicorn worker writes its values here at most every
+# METRICS_FLUSH_SECONDS; /metrics sums them. gunicorn.conf.py empties it when
+# the server starts.
+METRICS_DIR = os.environ.get("METRICS_DIR", str(Path(tempfile.gettempdir()) / "crowdfunding-metrics"))
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", "5"))
+
+# Tracing (see core/tracing.py)
+
+# Where kept traces go: "file:///path/traces.jsonl" or an OTLP/HTTP collector
+# such as "http://localhost:4318". Empty disables tracing.
+TRACING_EXPORT = os.environ.get("TRACING_EXPORT", "")
+
+# Tail sampling: traces this slow (or failing) are always kept, others with
+# probability TRACING_SAMPLE_RATE.
+TRACING_SLOW_MS = float(os.environ.get("TRACING_SLOW_MS", "500"))
+TRACING_SAMPLE_RATE = float(os.environ.get("TRACING_SAMPLE_RATE", "0.01"))
+TRACING_MAX_SPANS = int(os.environ.get("TRACING_MAX_SPANS", "1000"))
+TRACING_SERVICE_NAME = os.environ.get("TRACING_SERVICE_NAME", "crowdfunding-web")
+
+LOGGING = {
+  "version": 1,
+  "disable_existing_loggers": False,
+  "handlers": {
+    "console": {"class": "logging.StreamHandler"},
+  },
+  "loggers": {
+    "core": {"handlers": ["console"], "level": os.environ.get("CORE_LOG_LEVEL", "INFO")},
+  },
+}
+
+# Email
+# Console backend by default (dev-friendly password reset emails). For SMTP set
+# EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend plus EMAIL_HOST/EMAIL_PORT;
+# a local stand-in works too, e.g. `python -m aiosmtpd -n -l localhost:1025`.
+EMAIL_BACKEND = os.environ.get("EMAIL_BACKEND", "django.core.mail.backends.console.EmailBackend")
+EMAIL_HOST = os.environ.get("EMAIL_HOST", "localhost")
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT", "25"))
+EMAIL_HOST_USER = os.environ.get("EMAIL_HOST_USER", "")
+EMAIL_HOST_PASSWORD = os.environ.get("EMAIL_HOST_PASSWORD", "")
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS", "False") == "True"
+DEFAULT_FROM_EMAIL = os.environ.get("DEFAULT_FROM_EMAIL", "webmaster@localhost")
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -19,12 +19,16 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 
+from core.views import metrics
+
 urlpatterns = [
   path("", include("campaigns.urls")),
   path("i18n/", include("django.conf.urls.i18n")),
   path("accounts/", include("user.urls")),
   path("donations/", include("donations.urls")),
   path("groups/", include("groups.urls")),
+  path("metrics", metrics, name="metrics"),
+  path("admin/", include("core.urls")),
   path("admin/", admin.site.urls),
 ]
 
@@ -16,6 +16,7 @@ python manage.py collectstatic --no-input
 
 # 4. Run migrations
 python manage.py migrate
+python manage.py createcachetable
 
 # 5. Make admin
 python manage.py createadmin
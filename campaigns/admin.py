@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Campaign, Category, Tag, CampaignUpdate, Event
+from .models import Campaign, CampaignFanout, Category, Tag, CampaignUpdate, Event
 
 
 @admin.register(Category)
@@ -27,7 +27,14 @@ class EventInline(admin.TabularInline):
 
 @admin.register(Campaign)
 class CampaignAdmin(admin.ModelAdmin):
-  list_display = ("title", "created_by", "goal_amount", "end_date", "created_at")
-  list_filter = ("end_date", "categories", "tags")
+  list_display = ("title", "created_by", "goal_amount", "end_date", "status", "created_at")
+  list_filter = ("status", "end_date", "categories", "tags")
   search_fields = ("title", "description")
   inlines = [CampaignUpdateInline, EventInline]
+
+
+@admin.register(CampaignFanout)
+class CampaignFanoutAdmin(admin.ModelAdmin):
+  list_display = ("campaign", "kind", "status", "sent_count", "created_at", "finished_at")
+  list_filter = ("status", "kind")
+  raw_id_fields = ("campaign",)
@@ -0,0 +1,86 @@
+"""Category and tag facet counts for the campaign list.
+
+Counts are disjunctive: category counts apply every filter except the
+category itself (so the other options stay visible), tag counts every filter
+except the tag. Like the list, they cover open campaigns only unless the list
+is sorted by popularity. Both are computed in one UNION ALL of two grouped
+queries over the M2M link tables. Results without a text search and with at
+most one facet selected are cached in the taxonomy cache namespace (see
+campaigns.taxonomy), which campaigns/signals.py bumps on any campaign,
+category, tag or link change and close_expired_campaigns after closing any.
+"""
+
+from __future__ import annotations
+
+from django.db.models import CharField, Count, F, Q, Value
+from django.utils import timezone
+
+from core.cache import cached_query
+
+from .models import Campaign
+from .taxonomy import TAXONOMY_NAMESPACE
+
+FACET_TAG_LIMIT = 20
+
+
+def filtered_campaigns(q: str = "", category: str = "", tag: str = "", open_only: bool = False):
+  """Campaigns matching the list filters; `category` and `tag` are exact slugs."""
+  campaigns = Campaign.objects.all()
+  if open_only:
+    # status=active matches the partial indexes; the end date covers the hours
+    # before close_expired_campaigns runs.
+    campaigns = campaigns.filter(status=Campaign.STATUS_ACTIVE, end_date__gte=timezone.localdate())
+  if q:
+    campaigns = campaigns.filter(Q(title__icontains=q) | Q(description__icontains=q))
+  if category:
+    campaigns = campaigns.filter(categories__slug=category)
+  if tag:
+    campaigns = campaigns.filter(tags__slug=tag)
+  return campaigns
+
+
+def _grouped(link_model, facet: str, campaigns):
+  return (
+    link_model.objects.filter(campaign_id__in=campaigns.values("id"))
+    .values(f"{facet}_id")
+    .annotate(
+      kind=Value(facet, output_field=CharField()),
+      name=F(f"{facet}__name"),
+      slug=F(f"{facet}__slug"),
+      n=Count("id"),
+    )
+    .values_list("kind", f"{facet}_id", "name", "slug", "n")
+    .order_by()
+  )
+
+
+def _count(q: str, category: str, tag: str, open_only: bool) -> dict:
+  categories = _grouped(Campaign.categories.through, "category", filtered_campaigns(q, tag=tag, open_only=open_only))
+  tags = _grouped(Campaign.tags.through, "tag", filtered_campaigns(q, category=category, open_only=open_only))
+
+  result = {"categories": {}, "tags": []}
+  for kind, facet_id, name, slug, n in categories.union(tags, all=True):
+    if kind == "category":
+      result["categories"][facet_id] = n
+    else:
+      result["tags"].append({"name": name, "slug": slug, "count": n})
+  result["tags"].sort(key=lambda t: (-t["count"], t["name"]))
+  result["tags"] = result["tags"][:FACET_TAG_LIMIT]
+  return result
+
+
+def _count_key(category: str, tag: str, open_only: bool) -> str:
+  # Open-only counts change at midnight, when campaigns pass their end date.
+  return f"{category}:{tag}:{timezone.localdate().isoformat() if open_only else 'all'}"
+
+
+@cached_query(TAXONOMY_NAMESPACE, ttl=60 * 60, key=_count_key)
+def _cached_count(category: str, tag: str, open_only: bool) -> dict:
+  return _count("", category, tag, open_only)
+
+
+def facet_counts(q: str = "", category: str = "", tag: str = "", open_only: bool = False) -> dict:
+  """{"categories": {category_id: count}, "tags": [{"name", "slug", "count"}, ...]} for the filters."""
+  if q or (category and tag):
+    return _count(q, category, tag, open_only)
+  return _cached_count(category, tag, open_only)
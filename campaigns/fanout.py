@@ -0,0 +1,107 @@
+"""Notifying a campaign's followers about new updates and events.
+
+Followers are the campaign's approved donors plus users who followed it
+explicitly, minus anyone who unfollowed and the owner. Posting an update only
+enqueues a CampaignFanout row; `manage.py process_campaign_fanouts` does the
+actual inserts (see CampaignFanout for the resume semantics).
+"""
+
+from __future__ import annotations
+
+from itertools import batched
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from core import tracing
+from donations.models import Donation
+from user.notifications import notify_many
+
+from .models import Campaign, CampaignFanout, CampaignFollow
+
+
+def follower_ids(campaign: Campaign):
+  """Ids of the users to notify about `campaign`, ascending."""
+  donors = Donation.objects.filter(campaign_id=campaign.id, status=Donation.STATUS_APPROVED).values("donor_id")
+  follows = CampaignFollow.objects.filter(campaign_id=campaign.id)
+  return (
+    get_user_model()
+    .objects.filter(Q(id__in=donors) | Q(id__in=follows.filter(subscribed=True).values("user_id")))
+    .exclude(id__in=follows.filter(subscribed=False).values("user_id"))
+    .exclude(id=campaign.created_by_id)
+    .order_by("id")
+    .values_list("id", flat=True)
+  )
+
+
+def followed_campaign_ids(user_id: int) -> set[int]:
+  """Campaigns `user_id` follows under the same rules as follower_ids()."""
+  follows = dict(CampaignFollow.objects.filter(user_id=user_id).values_list("campaign_id", "subscribed"))
+  donated = Donation.objects.filter(donor_id=user_id, status=Donation.STATUS_APPROVED).values_list("campaign_id", flat=True)
+  return {cid for cid in donated.order_by().distinct() if follows.get(cid, True)} | {cid for cid, sub in follows.items() if sub}
+
+
+def is_following(campaign: Campaign, user_id: int) -> bool:
+  follow = CampaignFollow.objects.filter(campaign=campaign, user_id=user_id).values_list("subscribed", flat=True).first()
+  if follow is not None:
+    return follow
+  return Donation.objects.filter(campaign=campaign, donor_id=user_id, status=Donation.STATUS_APPROVED).exists()
+
+
+def set_following(campaign: Campaign, user_id: int, subscribed: bool) -> None:
+  CampaignFollow.objects.update_or_create(campaign=campaign, user_id=user_id, defaults={"subscribed": subscribed})
+
+
+def enqueue_fanout(campaign: Campaign, kind: str, message: str, url: str = "") -> CampaignFanout:
+  return CampaignFanout.objects.create(
+    campaign=campaign,
+    kind=kind,
+    message=message,
+    url=url,
+    trace_context=tracing.current_traceparent(),
+  )
+
+
+def run_fanout(job: CampaignFanout, chunk_size: int | None = None) -> int:
+  """Notify the job's remaining recipients in chunks. Returns how many were notified in this run.
+
+  Stops early if another worker advanced the same job in the meantime. Traced
+  as part of the trace that enqueued the job.
+  """
+  with tracing.start_trace(
+    "job campaign_fanout",
+    job.trace_context,
+    tracing.KIND_CONSUMER,
+    **{"job.id": job.id, "campaign.id": job.campaign_id},
+  ) as root:
+    sent = _run_fanout(job, chunk_size)
+    root.set(sent=sent)
+  return sent
+
+
+def _run_fanout(job: CampaignFanout, chunk_size: int | None) -> int:
+  chunk_size = chunk_size or settings.CAMPAIGN_FANOUT_CHUNK_SIZE
+  recipients = follower_ids(job.campaign).filter(id__gt=job.last_user_id).iterator(chunk_size=chunk_size)
+
+  sent = 0
+  for chunk in batched(recipients, chunk_size):
+    with tracing.span("fanout.chunk", size=len(chunk)), transaction.atomic():
+      # Claim the chunk by advancing the cursor from the value we started from.
+      claimed = CampaignFanout.objects.filter(id=job.id, last_user_id=job.last_user_id).update(
+        last_user_id=chunk[-1],
+        sent_count=F("sent_count") + len(chunk),
+      )
+      if not claimed:
+        return sent
+      notify_many(chunk, job.kind, job.message, url=job.url)
+    job.last_user_id = chunk[-1]
+    job.sent_count += len(chunk)
+    sent += len(chunk)
+
+  job.status = CampaignFanout.STATUS_DONE
+  job.finished_at = timezone.now()
+  job.save(update_fields=["status", "finished_at"])
+  return sent
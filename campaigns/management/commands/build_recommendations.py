@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from campaigns.recommendations import rebuild_recommendations, recommendations_available
+
+
+class Command(BaseCommand):
+  help = "Recomputes per-user campaign recommendations and related campaigns (TF-IDF; needs numpy and scipy)."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--top-k", type=int, default=10, help="Rows stored per user and per campaign.")
+    parser.add_argument("--batch-size", type=int, default=256, help="Rows scored per matrix multiply.")
+
+  def handle(self, *args, **options):
+    if not recommendations_available():
+      raise CommandError("numpy and scipy are required: pip install '.[recommendations]'")
+
+    related, personal = rebuild_recommendations(k=options["top_k"], batch_size=options["batch_size"])
+    self.stdout.write(self.style.SUCCESS(f"Stored {related} related-campaign row(s) and {personal} user recommendation(s)."))
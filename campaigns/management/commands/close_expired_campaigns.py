@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from campaigns.lifecycle import CLOSE_BATCH_SIZE, close_expired_campaigns
+
+
+class Command(BaseCommand):
+  help = "Closes campaigns past their end date, expires their pending donations and notifies the owners."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--batch-size", type=int, default=CLOSE_BATCH_SIZE)
+
+  def handle(self, *args, **options):
+    result = close_expired_campaigns(batch_size=options["batch_size"])
+    self.stdout.write(
+      self.style.SUCCESS(
+        f"Closed {result.ended + result.funded} campaign(s) ({result.funded} funded), "
+        f"expired {result.expired_donations} pending donation(s)."
+      )
+    )
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from campaigns.fanout import run_fanout
+from campaigns.models import CampaignFanout
+
+
+class Command(BaseCommand):
+  help = "Sends queued campaign update/event notifications to followers, resuming interrupted jobs."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--chunk-size", type=int, default=settings.CAMPAIGN_FANOUT_CHUNK_SIZE)
+
+  def handle(self, *args, **options):
+    jobs = CampaignFanout.objects.filter(status=CampaignFanout.STATUS_PENDING).select_related("campaign")
+
+    processed = 0
+    sent = 0
+    for job in jobs:
+      sent += run_fanout(job, chunk_size=options["chunk_size"])
+      processed += 1
+
+    self.stdout.write(self.style.SUCCESS(f"Processed {processed} fan-out job(s), {sent} notification(s) sent."))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0005_campaign_follow_fanout'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='campaignupdate',
+            index=models.Index(fields=['campaign', '-created_at'], name='campaign_update_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['campaign', '-created_at'], name='campaign_event_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:01
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+
+def backfill_status(apps, schema_editor):
+    # Campaigns that already ended are closed silently; only campaigns ending
+    # from now on go through close_expired_campaigns and notify their owners.
+    Campaign = apps.get_model('campaigns', 'Campaign')
+    Donation = apps.get_model('donations', 'Donation')
+    raised = (
+        Donation.objects.filter(campaign_id=OuterRef('id'), status='approved')
+        .order_by()
+        .values('campaign_id')
+        .annotate(total=Sum('amount'))
+        .values('total')
+    )
+    ended = Campaign.objects.filter(end_date__lt=timezone.localdate())
+    now = timezone.now()
+    funded_ids = list(
+        ended.annotate(raised=Subquery(raised))
+        .filter(goal_amount__gt=0, raised__gte=models.F('goal_amount'))
+        .values_list('id', flat=True)
+    )
+    ended.filter(id__in=funded_ids).update(status='funded', closed_at=now)
+    ended.exclude(id__in=funded_ids).update(status='ended', closed_at=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0007_recommendations'),
+        ('donations', '0005_donation_feed_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='campaign',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('ended', 'Ended'), ('funded', 'Funded')], default='active', max_length=10),
+        ),
+        migrations.RunPython(backfill_status, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['-created_at'], name='campaign_active_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='campaign',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['end_date'], name='campaign_active_end_idx'),
+        ),
+    ]
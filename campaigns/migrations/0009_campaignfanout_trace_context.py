@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0008_campaign_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaignfanout',
+            name='trace_context',
+            field=models.CharField(blank=True, default='', max_length=55),
+        ),
+    ]
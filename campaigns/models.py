@@ -4,7 +4,9 @@ from decimal import Decimal
 
 from django.conf import settings
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.text import slugify
 
 
@@ -41,6 +43,18 @@ class Tag(models.Model):
 
 
 class Campaign(models.Model):
+  # Stored so listings can filter on it; `manage.py close_expired_campaigns`
+  # moves campaigns past their end date to ENDED, or FUNDED if they met the goal.
+  STATUS_ACTIVE = "active"
+  STATUS_ENDED = "ended"
+  STATUS_FUNDED = "funded"
+
+  STATUS_CHOICES = [
+    (STATUS_ACTIVE, "Active"),
+    (STATUS_ENDED, "Ended"),
+    (STATUS_FUNDED, "Funded"),
+  ]
+
   created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="campaigns")
   title = models.CharField(max_length=200)
   donate_qr_image_url = models.URLField(blank=True)
@@ -51,15 +65,24 @@ class Campaign(models.Model):
   categories = models.ManyToManyField(Category, blank=True, related_name="campaigns")
   tags = models.ManyToManyField(Tag, blank=True, related_name="campaigns")
   created_at = models.DateTimeField(auto_now_add=True)
+  status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+  closed_at = models.DateTimeField(null=True, blank=True)
 
   class Meta:
     ordering = ["-created_at"]
+    indexes = [
+      # Listings only show active campaigns, a shrinking slice of the table.
+      models.Index(fields=["-created_at"], condition=models.Q(status="active"), name="campaign_active_recent_idx"),
+      models.Index(fields=["end_date"], condition=models.Q(status="active"), name="campaign_active_end_idx"),
+    ]
 
   @property
   def is_active(self) -> bool:
-    return self.end_date >= timezone.localdate()
+    # The end date also counts until the closer has run for the day.
+    return self.status == self.STATUS_ACTIVE and self.end_date >= timezone.localdate()
 
-  @property
+  # cached_property so with_progress() can fill both in from annotations.
+  @cached_property
   def total_raised(self) -> Decimal:
     donation_model = self.donations.model
     amount_field = donation_model._meta.get_field("amount")
@@ -75,7 +98,7 @@ class Campaign(models.Model):
     total = qs.aggregate(total=models.Sum("amount")).get("total")
     return total or Decimal("0")
 
-  @property
+  @cached_property
   def donor_count(self) -> int:
     donation_model = self.donations.model
     amount_field = donation_model._meta.get_field("amount")
@@ -101,6 +124,25 @@ class Campaign(models.Model):
     return self.title
 
 
+def with_progress(campaigns):
+  """Annotate total_raised and donor_count so progress cards need no per-campaign queries."""
+  donation_model = Campaign._meta.get_field("donations").related_model
+  amount_field = donation_model._meta.get_field("amount")
+  integer_digits = int(amount_field.max_digits) - int(amount_field.decimal_places)
+  approved = donation_model.objects.filter(campaign_id=models.OuterRef("pk"), status=donation_model.STATUS_APPROVED)
+  if integer_digits > 0:
+    max_amount = (Decimal(10) ** integer_digits) - (Decimal(1) / (Decimal(10) ** int(amount_field.decimal_places)))
+    approved = approved.filter(amount__lte=max_amount)
+  approved = approved.order_by().values("campaign_id")
+
+  total = approved.annotate(total=models.Sum("amount")).values("total")
+  donors = approved.annotate(n=models.Count("donor_id", distinct=True)).values("n")
+  return campaigns.annotate(
+    total_raised=Coalesce(models.Subquery(total, output_field=amount_field), Decimal("0"), output_field=amount_field),
+    donor_count=Coalesce(models.Subquery(donors), 0),
+  )
+
+
 class CampaignUpdate(models.Model):
   campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="updates")
   title = models.CharField(max_length=200)
@@ -110,6 +152,9 @@ class CampaignUpdate(models.Model):
 
   class Meta:
     ordering = ["-created_at"]
+    indexes = [
+      models.Index(fields=["campaign", "-created_at"], name="campaign_update_feed_idx"),
+    ]
 
 
 class Event(models.Model):
@@ -122,6 +167,92 @@ class Event(models.Model):
 
   class Meta:
     ordering = ["starts_at"]
+    indexes = [
+      models.Index(fields=["campaign", "-created_at"], name="campaign_event_feed_idx"),
+    ]
 
   def __str__(self) -> str:
     return self.title
+
+
+class CampaignFollow(models.Model):
+  """Explicit follow/unfollow of a campaign's updates.
+
+  Approved donors follow by default; a row with `subscribed=False` opts a
+  donor out again.
+  """
+
+  campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="follows")
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="campaign_follows")
+  subscribed = models.BooleanField(default=True)
+  created_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=["campaign", "user"], name="campaign_follow_uniq"),
+    ]
+
+
+class CampaignFanout(models.Model):
+  """A queued "new update/event" notification for a campaign's followers.
+
+  Processed off the request path by `manage.py process_campaign_fanouts`.
+  Recipients are walked in user id order and `last_user_id` is saved in the
+  same transaction as each chunk of notifications, so a crashed run resumes
+  after the last committed chunk instead of notifying anyone twice.
+  """
+
+  STATUS_PENDING = "pending"
+  STATUS_DONE = "done"
+
+  STATUS_CHOICES = [
+    (STATUS_PENDING, "Pending"),
+    (STATUS_DONE, "Done"),
+  ]
+
+  campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="fanouts")
+  kind = models.CharField(max_length=40)
+  message = models.TextField()
+  url = models.CharField(max_length=300, blank=True, default="")
+  status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+  last_user_id = models.BigIntegerField(default=0)
+  sent_count = models.PositiveIntegerField(default=0)
+  created_at = models.DateTimeField(auto_now_add=True)
+  finished_at = models.DateTimeField(null=True, blank=True)
+  # W3C traceparent of the request that enqueued the job (core.tracing).
+  trace_context = models.CharField(max_length=55, blank=True, default="")
+
+  class Meta:
+    ordering = ["id"]
+    indexes = [
+      models.Index(fields=["status", "id"], name="campaign_fanout_queue_idx"),
+    ]
+
+
+class CampaignRecommendation(models.Model):
+  """Top-K campaigns for a user, written by `manage.py build_recommendations`."""
+
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="campaign_recommendations")
+  campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="+")
+  rank = models.PositiveSmallIntegerField()
+  score = models.FloatField()
+
+  class Meta:
+    constraints = [
+      # Also the lookup index: WHERE user_id = ? ORDER BY rank.
+      models.UniqueConstraint(fields=["user", "rank"], name="campaign_recommendation_uniq"),
+    ]
+
+
+class RelatedCampaign(models.Model):
+  """Top-K similar campaigns per campaign, written by `manage.py build_recommendations`."""
+
+  campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="related_links")
+  related = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="+")
+  rank = models.PositiveSmallIntegerField()
+  score = models.FloatField()
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=["campaign", "rank"], name="related_campaign_uniq"),
+    ]
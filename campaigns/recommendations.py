@@ -0,0 +1,242 @@
+"""Content-based campaign recommendations.
+
+`rebuild_recommendations` (run by `manage.py build_recommendations`) builds a
+TF-IDF matrix over campaign text (title, description, tags, categories) and
+scores, in batched sparse matrix products:
+
+- each campaign against the active campaigns -> RelatedCampaign rows;
+- each user, represented by their profile interests plus the campaigns they
+  donated to, against the active campaigns -> CampaignRecommendation rows.
+
+Only the top K per row is stored, so pages read recommendations with a single
+indexed lookup (`recommended_for`, `related_to`), which skips campaigns that
+ended since the last build. Building needs the optional
+numpy/scipy dependencies (`pip install .[recommendations]`); reading does not.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from itertools import batched
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from donations.models import Donation
+from user.models import Profile
+
+from .models import Campaign, CampaignRecommendation, RelatedCampaign
+
+try:
+  import numpy as np
+  from scipy import sparse
+except ImportError:
+  np = None
+  sparse = None
+
+_WORD_RE = re.compile(r"\w\w+")
+
+STOP_WORDS = frozenset(
+  "a an and are as at be by for from has have help in is it its of on or our the this to we with you your".split()
+)
+
+# Title, tag and category words say more about a campaign than description words.
+TITLE_WEIGHT = 3
+LABEL_WEIGHT = 3
+
+
+def recommendations_available() -> bool:
+  return np is not None and sparse is not None
+
+
+def recommended_for(user_id: int, limit: int = 6) -> list[Campaign]:
+  rows = (
+    CampaignRecommendation.objects.filter(
+      user_id=user_id, campaign__status=Campaign.STATUS_ACTIVE, campaign__end_date__gte=timezone.localdate()
+    )
+    .select_related("campaign")
+    .order_by("rank")[:limit]
+  )
+  return [row.campaign for row in rows]
+
+
+def related_to(campaign_id: int, limit: int = 4) -> list[Campaign]:
+  rows = (
+    RelatedCampaign.objects.filter(
+      campaign_id=campaign_id, related__status=Campaign.STATUS_ACTIVE, related__end_date__gte=timezone.localdate()
+    )
+    .select_related("related")
+    .order_by("rank")[:limit]
+  )
+  return [row.related for row in rows]
+
+
+def tokenize(text: str) -> list[str]:
+  folded = unicodedata.normalize("NFKD", text.lower())
+  folded = "".join(c for c in folded if not unicodedata.combining(c))
+  return [w for w in _WORD_RE.findall(folded) if w not in STOP_WORDS and not w.isdigit()]
+
+
+def _campaign_documents() -> tuple[list[int], list[Counter], list[bool]]:
+  labels = defaultdict(list)
+  for campaign_id, name in Campaign.tags.through.objects.values_list("campaign_id", "tag__name"):
+    labels[campaign_id].append(name)
+  for campaign_id, name in Campaign.categories.through.objects.values_list("campaign_id", "category__name"):
+    labels[campaign_id].append(name)
+
+  today = timezone.localdate()
+  ids, docs, active = [], [], []
+  rows = Campaign.objects.order_by("id").values_list("id", "title", "description", "end_date", "status")
+  for campaign_id, title, description, end_date, status in rows.iterator():
+    doc = Counter(tokenize(description))
+    for _ in range(TITLE_WEIGHT):
+      doc.update(tokenize(title))
+    for _ in range(LABEL_WEIGHT):
+      doc.update(tokenize(" ".join(labels[campaign_id])))
+    ids.append(campaign_id)
+    docs.append(doc)
+    active.append(status == Campaign.STATUS_ACTIVE and end_date >= today)
+  return ids, docs, active
+
+
+def _normalize_rows(matrix):
+  norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+  norms[norms == 0] = 1.0
+  return sparse.diags(1.0 / norms) @ matrix
+
+
+def _vectorize(docs: list[Counter], vocab: dict[str, int], idf):
+  """Sublinear-tf TF-IDF rows, L2-normalized, as a CSR matrix."""
+  indptr, indices, data = [0], [], []
+  for doc in docs:
+    for term, tf in doc.items():
+      col = vocab.get(term)
+      if col is not None:
+        indices.append(col)
+        data.append((1.0 + np.log(tf)) * idf[col])
+    indptr.append(len(indices))
+  matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(docs), len(vocab)), dtype=np.float64)
+  return _normalize_rows(matrix)
+
+
+def _top_k(scores, k: int):
+  """Column indices and values of the k largest entries per row, best first."""
+  k = min(k, scores.shape[1])
+  idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+  values = np.take_along_axis(scores, idx, axis=1)
+  order = np.argsort(-values, axis=1, kind="stable")
+  return np.take_along_axis(idx, order, axis=1), np.take_along_axis(values, order, axis=1)
+
+
+def _build_related(matrix, ids, candidates, candidate_ids, k: int, batch_size: int) -> int:
+  written = 0
+  candidates_t = candidates.T.tocsc()
+  position = {campaign_id: i for i, campaign_id in enumerate(candidate_ids)}
+  for start in range(0, len(ids), batch_size):
+    batch_ids = ids[start : start + batch_size]
+    scores = (matrix[start : start + batch_size] @ candidates_t).toarray()
+    for row, campaign_id in enumerate(batch_ids):
+      if campaign_id in position:
+        scores[row, position[campaign_id]] = 0.0
+    top_idx, top_val = _top_k(scores, k)
+
+    rows = [
+      RelatedCampaign(campaign_id=campaign_id, related_id=int(candidate_ids[col]), rank=rank, score=float(score))
+      for row, campaign_id in enumerate(batch_ids)
+      for rank, (col, score) in enumerate(zip(top_idx[row], top_val[row]), start=1)
+      if score > 0
+    ]
+    with transaction.atomic():
+      RelatedCampaign.objects.filter(campaign_id__gte=batch_ids[0], campaign_id__lte=batch_ids[-1]).delete()
+      RelatedCampaign.objects.bulk_create(rows, batch_size=1000)
+    written += len(rows)
+  return written
+
+
+def _build_user_recommendations(matrix, ids, vocab, idf, candidates, candidate_ids, k: int, batch_size: int) -> int:
+  column = {campaign_id: i for i, campaign_id in enumerate(ids)}
+  position = {campaign_id: i for i, campaign_id in enumerate(candidate_ids)}
+  candidates_t = candidates.T.tocsc()
+
+  written = 0
+  last_user_id = 0
+  user_ids = get_user_model().objects.order_by("id").values_list("id", flat=True)
+  for batch in batched(user_ids.iterator(), batch_size):
+    interests = dict(
+      Profile.objects.filter(user_id__in=batch).exclude(interests="").values_list("user_id", "interests")
+    )
+    donated = defaultdict(set)
+    donations = Donation.objects.filter(donor_id__in=batch, status=Donation.STATUS_APPROVED)
+    for donor_id, campaign_id in donations.order_by().values_list("donor_id", "campaign_id").distinct():
+      donated[donor_id].add(campaign_id)
+    owned = defaultdict(set)
+    for owner_id, campaign_id in Campaign.objects.filter(created_by_id__in=batch).values_list("created_by_id", "id"):
+      owned[owner_id].add(campaign_id)
+
+    users = [uid for uid in batch if uid in interests or uid in donated]
+    rows = []
+    if users:
+      # Profile: normalized interest vector plus the normalized sum of donated campaigns.
+      interest_vecs = _vectorize([Counter(tokenize(interests.get(uid, ""))) for uid in users], vocab, idf)
+      d_rows, d_cols = [], []
+      for r, uid in enumerate(users):
+        # Campaigns created after the matrix was built are skipped until the next run.
+        for campaign_id in donated.get(uid, ()) & column.keys():
+          d_rows.append(r)
+          d_cols.append(column[campaign_id])
+      history = sparse.csr_matrix((np.ones(len(d_rows)), (d_rows, d_cols)), shape=(len(users), len(ids)))
+      profiles = _normalize_rows(interest_vecs + _normalize_rows(history @ matrix))
+
+      scores = (profiles @ candidates_t).toarray()
+      for r, uid in enumerate(users):
+        for campaign_id in donated.get(uid, set()) | owned.get(uid, set()):
+          if campaign_id in position:
+            scores[r, position[campaign_id]] = 0.0
+      top_idx, top_val = _top_k(scores, k)
+      rows = [
+        CampaignRecommendation(user_id=uid, campaign_id=int(candidate_ids[col]), rank=rank, score=float(score))
+        for r, uid in enumerate(users)
+        for rank, (col, score) in enumerate(zip(top_idx[r], top_val[r]), start=1)
+        if score > 0
+      ]
+
+    with transaction.atomic():
+      CampaignRecommendation.objects.filter(user_id__gt=last_user_id, user_id__lte=batch[-1]).delete()
+      CampaignRecommendation.objects.bulk_create(rows, batch_size=1000)
+    written += len(rows)
+    last_user_id = batch[-1]
+
+  CampaignRecommendation.objects.filter(user_id__gt=last_user_id).delete()
+  return written
+
+
+def rebuild_recommendations(k: int = 10, batch_size: int = 256) -> tuple[int, int]:
+  """Recompute both tables. Returns (related rows, user recommendation rows)."""
+  if not recommendations_available():
+    raise RuntimeError("numpy and scipy are required to build recommendations.")
+
+  ids, docs, active = _campaign_documents()
+  if not ids:
+    RelatedCampaign.objects.all().delete()
+    CampaignRecommendation.objects.all().delete()
+    return 0, 0
+
+  df = Counter(term for doc in docs for term in doc)
+  vocab = {term: i for i, term in enumerate(sorted(df))}
+  idf = np.array([np.log((1 + len(docs)) / (1 + df[term])) + 1.0 for term in sorted(df)])
+  matrix = _vectorize(docs, vocab, idf)
+
+  active_rows = np.flatnonzero(active)
+  candidates = matrix[active_rows]
+  candidate_ids = np.asarray(ids)[active_rows]
+  if not len(candidate_ids):
+    RelatedCampaign.objects.all().delete()
+    CampaignRecommendation.objects.all().delete()
+    return 0, 0
+
+  related = _build_related(matrix, ids, candidates, candidate_ids, k, batch_size)
+  personal = _build_user_recommendations(matrix, ids, vocab, idf, candidates, candidate_ids, k, batch_size)
+  return related, personal
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from core.cache import invalidate_on
+
+from .models import Campaign, Category, Tag
+from .taxonomy import TAXONOMY_NAMESPACE
+
+# The taxonomy snapshot and facet counts depend on campaigns, their labels and
+# the links between them.
+invalidate_on(
+  Campaign,
+  Category,
+  Tag,
+  Campaign.categories.through,
+  Campaign.tags.through,
+  namespace=TAXONOMY_NAMESPACE,
+)
@@ -0,0 +1,134 @@
+"""Per-process cache of categories and tags, and prefix autocomplete over it.
+
+The snapshot (names, slugs, usage counts) lives in module memory and is
+rebuilt with two queries when the version of the shared TAXONOMY_NAMESPACE
+changes or it is older than TAXONOMY_CACHE_SECONDS. campaigns/signals.py bumps
+the namespace on any campaign, category, tag or link change; the age limit
+covers deployments whose cache backend is not shared between processes.
+
+Autocomplete keeps a sorted list of accent-folded keys, one per word start
+("clean water", "water"), and answers with bisect. Its only I/O is the
+version check in get_taxonomy: a cache lookup, which is itself a query when
+the cache lives in the database (CACHE_URL=db://).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Count
+
+from core.cache import namespace_version
+
+from .models import Category, Tag
+
+KIND_CATEGORY = "category"
+KIND_TAG = "tag"
+
+AUTOCOMPLETE_LIMIT = 8
+
+# Cache namespace of everything derived from campaign labels (also facets).
+TAXONOMY_NAMESPACE = "campaign_taxonomy"
+
+
+@dataclass(frozen=True)
+class TaxonomyEntry:
+  id: int
+  name: str
+  slug: str
+  count: int
+
+
+class _PrefixIndex:
+  def __init__(self, entries: list[TaxonomyEntry]):
+    pairs = []
+    for i, entry in enumerate(entries):
+      words = fold(entry.name).split()
+      for start in range(len(words)):
+        pairs.append((" ".join(words[start:]), i))
+    pairs.sort()
+    self.keys = [key for key, _ in pairs]
+    self.positions = [i for _, i in pairs]
+    self.entries = entries
+
+  def search(self, prefix: str, limit: int) -> list[TaxonomyEntry]:
+    prefix = " ".join(fold(prefix).split())
+    if not prefix:
+      return []
+    found = {}
+    i = bisect_left(self.keys, prefix)
+    while i < len(self.keys) and self.keys[i].startswith(prefix):
+      found.setdefault(self.positions[i], None)
+      i += 1
+    matches = [self.entries[pos] for pos in found]
+    matches.sort(key=lambda e: (-e.count, e.name.lower()))
+    return matches[:limit]
+
+
+@dataclass(frozen=True)
+class Taxonomy:
+  version: int
+  built_at: float
+  categories: list[TaxonomyEntry]
+  tags: list[TaxonomyEntry]
+  category_index: _PrefixIndex
+  tag_index: _PrefixIndex
+
+  def autocomplete(self, kind: str, prefix: str, limit: int = AUTOCOMPLETE_LIMIT) -> list[TaxonomyEntry]:
+    index = self.tag_index if kind == KIND_TAG else self.category_index
+    return index.search(prefix, limit)
+
+
+_taxonomy: Taxonomy | None = None
+_lock = threading.Lock()
+
+
+def fold(text: str) -> str:
+  """Lowercase without diacritics ("Bóng đá" -> "bong da")."""
+  decomposed = unicodedata.normalize("NFKD", text.lower().replace("đ", "d"))
+  return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def taxonomy_version() -> int:
+  return namespace_version(TAXONOMY_NAMESPACE)
+
+
+def _entries(model) -> list[TaxonomyEntry]:
+  rows = model.objects.annotate(n=Count("campaigns")).order_by("name").values_list("id", "name", "slug", "n")
+  return [TaxonomyEntry(*row) for row in rows]
+
+
+def _is_fresh(taxonomy: Taxonomy | None, version: int) -> bool:
+  return (
+    taxonomy is not None
+    and taxonomy.version == version
+    and time.monotonic() - taxonomy.built_at < settings.TAXONOMY_CACHE_SECONDS
+  )
+
+
+def get_taxonomy() -> Taxonomy:
+  """The current snapshot; costs one cache lookup unless it has to be rebuilt."""
+  global _taxonomy
+  version = taxonomy_version()
+  if _is_fresh(_taxonomy, version):
+    return _taxonomy
+
+  with _lock:
+    if _is_fresh(_taxonomy, version):
+      return _taxonomy
+    categories = _entries(Category)
+    tags = _entries(Tag)
+    _taxonomy = Taxonomy(
+      version=version,
+      built_at=time.monotonic(),
+      categories=categories,
+      tags=tags,
+      category_index=_PrefixIndex(categories),
+      tag_index=_PrefixIndex(tags),
+    )
+    return _taxonomy
@@ -0,0 +1,265 @@
+import importlib
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.shortcuts import get_object_or_404
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import clear_url_caches, resolve
+from django.utils import timezone
+
+from donations.models import Donation
+from groups.models import DonorGroup, GroupContributionStats, GroupMembership
+from user.models import Notification
+from user.notifications import notify_many
+
+from .fanout import enqueue_fanout, run_fanout
+from .models import Campaign, CampaignFanout, CampaignFollow, CampaignUpdate, Category, Event, Tag
+
+
+class DonationDecisionTests(TestCase):
+  def setUp(self):
+    User = get_user_model()
+    self.owner = User.objects.create_user("owner", password="pw")
+    self.donor = User.objects.create_user("donor", password="pw")
+    self.campaign = Campaign.objects.create(
+      created_by=self.owner, title="Wells", description="d", goal_amount=1000, end_date=timezone.localdate() + timedelta(days=30)
+    )
+    self.group = DonorGroup.objects.create(name="Circle", owner=self.donor)
+    GroupMembership.objects.create(group=self.group, user=self.donor)
+    self.donation = Donation.objects.create(campaign=self.campaign, donor=self.donor, group=self.group, amount=Decimal("250"))
+    self.client.force_login(self.owner)
+
+  def decide(self, action: str):
+    return self.client.post(f"/campaigns/{self.campaign.id}/donation-requests/{self.donation.id}/{action}/")
+
+  def group_total(self) -> Decimal:
+    stats = GroupContributionStats.objects.filter(group=self.group, campaign=None, member=None).first()
+    return stats.total_amount if stats else Decimal("0")
+
+  def test_approving_twice_counts_once(self):
+    self.decide("approve")
+    self.decide("approve")
+
+    self.donation.refresh_from_db()
+    self.assertEqual(self.donation.status, Donation.STATUS_APPROVED)
+    self.assertEqual(self.group_total(), Decimal("250"))
+
+  def test_concurrent_decisions_count_once(self):
+    # Both requests read the donation while it was still pending.
+    stale = Donation.objects.get(pk=self.donation.pk)
+    self.decide("approve")
+
+    def lookup(model, **kwargs):
+      return stale if model is Donation else get_object_or_404(model, **kwargs)
+
+    with mock.patch("campaigns.views.get_object_or_404", side_effect=lookup):
+      self.decide("approve")
+      self.decide("reject")
+
+    self.donation.refresh_from_db()
+    self.assertEqual(self.donation.status, Donation.STATUS_APPROVED)
+    self.assertEqual(self.group_total(), Decimal("250"))
+    self.assertEqual(GroupContributionStats.objects.get(group=self.group, campaign=None, member=None).donation_count, 1)
+
+  def test_reject_leaves_totals_alone(self):
+    self.decide("reject")
+
+    self.donation.refresh_from_db()
+    self.assertEqual(self.donation.status, Donation.STATUS_REJECTED)
+    self.assertEqual(self.group_total(), Decimal("0"))
+
+
+class FanoutTests(TestCase):
+  def setUp(self):
+    User = get_user_model()
+    self.owner = User.objects.create_user("owner")
+    self.campaign = Campaign.objects.create(
+      created_by=self.owner, title="Wells", description="d", goal_amount=1000, end_date=timezone.localdate() + timedelta(days=30)
+    )
+    self.followers = [User.objects.create_user(f"follower{i}") for i in range(7)]
+    for user in self.followers:
+      CampaignFollow.objects.create(campaign=self.campaign, user=user, subscribed=True)
+    # Approved donors follow unless they unfollowed; the owner never hears about their own posts.
+    quitter = User.objects.create_user("quitter")
+    Donation.objects.create(campaign=self.campaign, donor=quitter, amount=10, status=Donation.STATUS_APPROVED)
+    CampaignFollow.objects.create(campaign=self.campaign, user=quitter, subscribed=False)
+    Donation.objects.create(campaign=self.campaign, donor=self.owner, amount=10, status=Donation.STATUS_APPROVED)
+    self.job = enqueue_fanout(self.campaign, Notification.KIND_CAMPAIGN_UPDATE, "New update", url=f"/campaigns/{self.campaign.id}/")
+
+  def notified(self) -> list[str]:
+    return list(
+      Notification.objects.filter(kind=Notification.KIND_CAMPAIGN_UPDATE).order_by("user_id").values_list("user__username", flat=True)
+    )
+
+  def test_resumes_after_a_partial_run(self):
+    calls = []
+
+    def crash_on_third_chunk(user_ids, *args, **kwargs):
+      calls.append(user_ids)
+      if len(calls) == 3:
+        raise RuntimeError("worker died")
+      return notify_many(user_ids, *args, **kwargs)
+
+    with mock.patch("campaigns.fanout.notify_many", side_effect=crash_on_third_chunk), self.assertRaises(RuntimeError):
+      run_fanout(CampaignFanout.objects.get(id=self.job.id), chunk_size=2)
+
+    self.job.refresh_from_db()
+    self.assertEqual(self.job.status, CampaignFanout.STATUS_PENDING)
+    self.assertEqual(self.job.last_user_id, self.followers[3].id)
+    self.assertEqual(self.job.sent_count, 4)
+    self.assertEqual(len(self.notified()), 4)
+
+    out = StringIO()
+    call_command("process_campaign_fanouts", chunk_size=2, stdout=out)
+    self.assertIn("Processed 1 fan-out job(s), 3 notification(s) sent.", out.getvalue())
+
+    self.job.refresh_from_db()
+    self.assertEqual(self.job.status, CampaignFanout.STATUS_DONE)
+    self.assertEqual(self.job.sent_count, 7)
+    self.assertEqual(self.notified(), [u.username for u in self.followers])
+
+  def test_stale_worker_stops(self):
+    stale = CampaignFanout.objects.get(id=self.job.id)
+    run_fanout(CampaignFanout.objects.get(id=self.job.id), chunk_size=2)
+
+    self.assertEqual(run_fanout(stale, chunk_size=2), 0)
+    self.assertEqual(len(self.notified()), 7)
+
+
+class CloseExpiredCampaignsTests(TestCase):
+  def setUp(self):
+    User = get_user_model()
+    self.owner = User.objects.create_user("owner")
+    self.donor = User.objects.create_user("donor")
+    today = timezone.localdate()
+    self.funded = self.make_campaign("Funded", today - timedelta(days=1))
+    self.short = self.make_campaign("Short", today - timedelta(days=2))
+    self.running = self.make_campaign("Running", today)
+    self.donate(self.funded, 1000, Donation.STATUS_APPROVED)
+    self.donate(self.short, 200, Donation.STATUS_APPROVED)
+    self.pending = [self.donate(c, 50, Donation.STATUS_PENDING) for c in (self.funded, self.short, self.running)]
+
+  def make_campaign(self, title: str, end_date) -> Campaign:
+    return Campaign.objects.create(created_by=self.owner, title=title, description="d", goal_amount=1000, end_date=end_date)
+
+  def donate(self, campaign: Campaign, amount: int, status: str) -> Donation:
+    return Donation.objects.create(campaign=campaign, donor=self.donor, amount=Decimal(amount), status=status)
+
+  def close(self) -> str:
+    out = StringIO()
+    call_command("close_expired_campaigns", batch_size=1, stdout=out)
+    return out.getvalue()
+
+  def test_closes_and_rejects_pending_donations(self):
+    self.assertIn("Closed 2 campaign(s) (1 funded), expired 2 pending donation(s).", self.close())
+
+    statuses = dict(Campaign.objects.values_list("title", "status"))
+    self.assertEqual(statuses, {"Funded": Campaign.STATUS_FUNDED, "Short": Campaign.STATUS_ENDED, "Running": Campaign.STATUS_ACTIVE})
+    for donation in self.pending:
+      donation.refresh_from_db()
+    self.assertEqual([d.status for d in self.pending], [Donation.STATUS_REJECTED, Donation.STATUS_REJECTED, Donation.STATUS_PENDING])
+    self.assertIsNotNone(self.pending[0].decided_at)
+    self.assertEqual(Notification.objects.filter(user=self.owner, kind=Notification.KIND_CAMPAIGN_CLOSED).count(), 2)
+
+  def test_rerun_changes_nothing(self):
+    self.close()
+    self.assertIn("Closed 0 campaign(s) (0 funded), expired 0 pending donation(s).", self.close())
+    self.assertEqual(Notification.objects.filter(kind=Notification.KIND_CAMPAIGN_CLOSED).count(), 2)
+
+
+@override_settings(ASYNC_READ_VIEWS=True)
+class AsyncReadViewTests(TransactionTestCase):
+  """The async read views asgi.py serves in production, through the ASGI handler."""
+
+  # run_concurrently queries from other threads, which a TestCase transaction would lock out.
+
+  @classmethod
+  def setUpClass(cls):
+    super().setUpClass()
+    _reload_urlconf()
+
+  @classmethod
+  def tearDownClass(cls):
+    super().tearDownClass()
+    _reload_urlconf()
+
+  def setUp(self):
+    cache.clear()
+    User = get_user_model()
+    self.owner = User.objects.create_user("owner", password="pw")
+    self.reader = User.objects.create_user("reader", password="pw")
+    self.campaign = Campaign.objects.create(
+      created_by=self.owner, title="Wells", description="Clean water", goal_amount=1000,
+      end_date=timezone.localdate() + timedelta(days=30),
+    )
+    self.campaign.categories.add(Category.objects.create(name="Water", slug="water"))
+    self.campaign.tags.add(Tag.objects.create(name="Wells", slug="wells"))
+    group = DonorGroup.objects.create(name="Circle", owner=self.reader)
+    GroupMembership.objects.create(group=group, user=self.reader)
+    Donation.objects.create(campaign=self.campaign, donor=self.reader, group=group, amount=100, status=Donation.STATUS_APPROVED)
+    Donation.objects.create(campaign=self.campaign, donor=self.reader, amount=50)
+    self.update = CampaignUpdate.objects.create(campaign=self.campaign, title="First well", content_md="Dug *deep*.")
+    self.event = Event.objects.create(campaign=self.campaign, title="Opening", starts_at=timezone.now() + timedelta(days=3))
+
+  def test_views_are_async(self):
+    self.assertEqual(resolve("/").func.__name__, "acampaign_list")
+    self.assertEqual(resolve(f"/campaigns/{self.campaign.id}/").func.__name__, "acampaign_detail")
+
+  async def test_list(self):
+    for user in (None, self.reader):
+      if user:
+        await self.async_client.aforce_login(user)
+      for query in ("", "?sort=popular", "?sort=urgent", "?category=water", "?tag=wells", "?q=wells"):
+        with self.subTest(user=user, query=query):
+          response = await self.async_client.get(f"/{query}")
+          self.assertContains(response, "Wells")
+
+  async def test_detail(self):
+    path = f"/campaigns/{self.campaign.id}/"
+    follow_form = f'action="{path}follow/"'
+    response = await self.async_client.get(path)
+    self.assertContains(response, "Wells")
+    self.assertNotContains(response, follow_form)
+
+    await self.async_client.aforce_login(self.reader)
+    response = await self.async_client.get(path)
+    self.assertContains(response, follow_form)
+    self.assertNotContains(response, "Donation requests")
+
+    await self.async_client.aforce_login(self.owner)
+    response = await self.async_client.get(path)
+    self.assertContains(response, "Donation requests")
+    self.assertNotContains(response, follow_form)
+
+  async def test_update_and_event_detail(self):
+    await self.async_client.aforce_login(self.reader)
+    response = await self.async_client.get(f"/campaigns/{self.campaign.id}/updates/{self.update.id}/")
+    self.assertContains(response, "First well")
+    response = await self.async_client.get(f"/campaigns/{self.campaign.id}/events/{self.event.id}/")
+    self.assertContains(response, "Opening")
+
+  async def test_missing_objects_are_404(self):
+    missing = self.campaign.id + 100
+    for path in (
+      f"/campaigns/{missing}/",
+      f"/campaigns/{missing}/updates/{self.update.id}/",
+      f"/campaigns/{self.campaign.id}/updates/{self.update.id + 100}/",
+      f"/campaigns/{missing}/events/{self.event.id}/",
+      f"/campaigns/{self.campaign.id}/events/{self.event.id + 100}/",
+    ):
+      with self.subTest(path=path):
+        response = await self.async_client.get(path)
+        self.assertEqual(response.status_code, 404)
+
+
+def _reload_urlconf():
+  importlib.reload(import_module("campaigns.urls"))
+  importlib.reload(import_module(settings.ROOT_URLCONF))
+  clear_url_caches()
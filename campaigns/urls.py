@@ -1,20 +1,33 @@
+from django.conf import settings
 from django.urls import path
 
+from core.querybudget import query_budget
+
 from . import views
 
 app_name = "campaigns"
 
+# Native async read views when asgi.py turns them on (see core.asyncdb); the sync ones serve everything else.
+if settings.ASYNC_READ_VIEWS:
+  campaign_list, campaign_detail = views.acampaign_list, views.acampaign_detail
+  campaign_update_detail, event_detail = views.acampaign_update_detail, views.aevent_detail
+else:
+  campaign_list, campaign_detail = views.campaign_list, views.campaign_detail
+  campaign_update_detail, event_detail = views.campaign_update_detail, views.event_detail
+
 urlpatterns = [
-  path("", views.campaign_list, name="list"),
-  path("campaigns/new/", views.campaign_create, name="create"),
-  path("campaigns/<int:campaign_id>/", views.campaign_detail, name="detail"),
-  path("campaigns/<int:campaign_id>/donation-requests/", views.campaign_donation_requests, name="donation_requests"),
+  path("", query_budget(campaign_list, queries=12), name="list"),
+  path("campaigns/new/", query_budget(views.campaign_create, queries=19), name="create"),
+  path("campaigns/autocomplete/", query_budget(views.taxonomy_autocomplete, queries=4), name="taxonomy_autocomplete"),
+  path("campaigns/<int:campaign_id>/", query_budget(campaign_detail, queries=15), name="detail"),
+  path("campaigns/<int:campaign_id>/follow/", views.campaign_follow, name="follow"),
+  path("campaigns/<int:campaign_id>/donation-requests/", query_budget(views.campaign_donation_requests, queries=8), name="donation_requests"),
   path("campaigns/<int:campaign_id>/donation-requests/<int:donation_id>/approve/", views.campaign_approve_donation, name="approve_donation"),
   path("campaigns/<int:campaign_id>/donation-requests/<int:donation_id>/reject/", views.campaign_reject_donation, name="reject_donation"),
   path("campaigns/<int:campaign_id>/image/", views.campaign_update_image, name="update_image"),
   path("campaigns/<int:campaign_id>/donate-qr/", views.campaign_update_donate_qr, name="update_donate_qr"),
   path("campaigns/<int:campaign_id>/update/", views.campaign_add_update, name="add_update"),
-  path("campaigns/<int:campaign_id>/updates/<int:update_id>/", views.campaign_update_detail, name="update_detail"),
+  path("campaigns/<int:campaign_id>/updates/<int:update_id>/", campaign_update_detail, name="update_detail"),
   path("campaigns/<int:campaign_id>/events/new/", views.event_create, name="event_create"),
-  path("campaigns/<int:campaign_id>/events/<int:event_id>/", views.event_detail, name="event_detail"),
+  path("campaigns/<int:campaign_id>/events/<int:event_id>/", event_detail, name="event_detail"),
 ]
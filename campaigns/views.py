@@ -2,23 +2,34 @@ from __future__ import annotations
 
 from datetime import date, datetime, timedelta, timezone as dt_timezone
 from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from functools import partial
 from urllib.parse import urlencode
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Q
-from django.db.models import CharField, Count, Sum
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.db.models import CharField
 from django.db.models.functions import Cast
-from django.http import HttpRequest, HttpResponse
-from django.shortcuts import get_object_or_404, redirect, render
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.utils import timezone
+from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
+from core.asyncdb import run_concurrently
+from core.metrics import DONATIONS
 from donations.models import Donation
-from user.models import Profile
+from groups.stats import record_donation_decision
+from user.middleware import aget_profile, aload_user
 from user.models import Notification
+from user.notifications import notify
 
-from .models import Campaign, Category, Tag, CampaignUpdate, Event
+from .facets import facet_counts, filtered_campaigns
+from .fanout import enqueue_fanout, is_following, set_following
+from .models import Campaign, Category, Tag, CampaignUpdate, Event, with_progress
+from .recommendations import recommended_for, related_to
+from .taxonomy import KIND_CATEGORY, KIND_TAG, get_taxonomy
 
 
 def _decimal_field_max_value(model_cls: type[object], field_name: str) -> Decimal:
@@ -63,103 +74,211 @@ def _parse_categories(raw: str) -> list[str]:
   return _parse_tags(raw)
 
 
-def _get_or_create_tags(names: list[str]) -> list[Tag]:
-  tags: list[Tag] = []
+def _get_or_create_by_slug(model: type[Category] | type[Tag], names: list[str]) -> list[Category | Tag]:
+  # "Medical" and "medical " are the same label; match on the slug before
+  # creating. Three queries however many labels there are; the m2m_changed
+  # signal of the following set()/add() invalidates the taxonomy cache.
+  by_slug = {}
+  unsluggable = []
   for name in names:
-    tag, _ = Tag.objects.get_or_create(name=name)
-    tags.append(tag)
-  return tags
+    slug = slugify(name)
+    if slug:
+      by_slug.setdefault(slug, name)
+    else:
+      unsluggable.append(name)
+
+  found = {obj.slug: obj for obj in model.objects.filter(slug__in=by_slug)}
+  missing = [model(name=name, slug=slug) for slug, name in by_slug.items() if slug not in found]
+  if missing:
+    model.objects.bulk_create(missing, ignore_conflicts=True)
+    found.update((obj.slug, obj) for obj in model.objects.filter(slug__in=[obj.slug for obj in missing]))
+
+  # Labels whose name exists under a different slug fall back to a name lookup.
+  unsluggable += [name for slug, name in by_slug.items() if slug not in found]
+  result = [found[slug] for slug in by_slug if slug in found]
+  result += [model.objects.get_or_create(name=name)[0] for name in unsluggable]
+  return result
 
 
-def campaign_list(request: HttpRequest) -> HttpResponse:
-  q = (request.GET.get("q") or "").strip()
-  category_slug = (request.GET.get("category") or "").strip()
-  tag_q = (request.GET.get("tag") or "").strip()
-  sort = (request.GET.get("sort") or "").strip()
+def _open_only(sort: str) -> bool:
+  # Popularity ranks ended campaigns too; the other orders list open ones.
+  return sort != "popular"
 
-  campaigns = Campaign.objects.all().prefetch_related("categories", "tags")
 
-  if q:
-    campaigns = campaigns.filter(Q(title__icontains=q) | Q(description__icontains=q))
+def _list_filters(request: HttpRequest) -> dict[str, str]:
+  return {
+    "q": (request.GET.get("q") or "").strip(),
+    "category": (request.GET.get("category") or "").strip(),
+    # Tags are matched by exact slug; "#Clean Water" and "clean-water" both work.
+    "tag": slugify((request.GET.get("tag") or "").strip().lstrip("#")),
+    "sort": (request.GET.get("sort") or "").strip(),
+  }
 
-  if category_slug:
-    campaigns = campaigns.filter(categories__slug=category_slug)
 
-  if tag_q:
-    campaigns = campaigns.filter(tags__name__icontains=tag_q).distinct()
+def _listed_campaigns(q: str, category: str, tag: str, sort: str):
+  campaigns = with_progress(filtered_campaigns(q, category, tag, _open_only(sort))).prefetch_related("categories", "tags")
 
   if sort == "popular":
-    max_amount = _decimal_field_max_value(Donation, "amount")
-    donation_filter = Q(donations__status=Donation.STATUS_APPROVED)
-    if max_amount > 0:
-      donation_filter &= Q(donations__amount__lte=max_amount)
-
-    campaigns = (
-      campaigns
-      .annotate(
-        total=Sum("donations__amount", filter=donation_filter),
-        donors=Count("donations__id", filter=donation_filter),
-      )
-      .order_by("-total", "-donors")
-    )
-  elif sort == "urgent":
-    campaigns = campaigns.order_by("end_date")
-  else:
-    campaigns = campaigns.order_by("-created_at")
+    # Rank by the progress annotations: a donations join would repeat their
+    # correlated subqueries once per donation row.
+    return campaigns.order_by("-total_raised", "-donor_count")
+  if sort == "urgent":
+    return campaigns.order_by("end_date")
+  return campaigns.order_by("-created_at")
 
-  categories = Category.objects.all()
 
-  context = {
+def _wants_recommendations(request: HttpRequest, filters: dict[str, str]) -> bool:
+  return request.user.is_authenticated and not (filters["q"] or filters["category"] or filters["tag"])
+
+
+def _list_context(filters: dict[str, str], campaigns, facets: dict, taxonomy, recommended) -> dict:
+  categories = [
+    {"name": c.name, "slug": c.slug, "facet_count": facets["categories"].get(c.id, 0)}
+    for c in taxonomy.categories
+  ]
+  return {
+    **filters,
     "campaigns": campaigns,
+    "recommended_campaigns": recommended,
     "categories": categories,
-    "q": q,
-    "category": category_slug,
-    "tag": tag_q,
-    "sort": sort,
+    "tag_facets": facets["tags"],
     "today": timezone.localdate(),
   }
+
+
+def campaign_list(request: HttpRequest) -> HttpResponse:
+  filters = _list_filters(request)
+  campaigns = _listed_campaigns(**filters)
+  facets = facet_counts(filters["q"], filters["category"], filters["tag"], _open_only(filters["sort"]))
+  recommended = recommended_for(request.user.id) if _wants_recommendations(request, filters) else []
+  context = _list_context(filters, campaigns, facets, get_taxonomy(), recommended)
   return render(request, "campaigns/campaign_list.html", context)
 
 
-def campaign_detail(request: HttpRequest, campaign_id: int) -> HttpResponse:
-  campaign = get_object_or_404(
-    Campaign.objects.select_related("created_by").prefetch_related("categories", "tags", "updates", "events"),
-    id=campaign_id,
+async def acampaign_list(request: HttpRequest) -> HttpResponse:
+  """campaign_list for ASGI: the listing, facets, taxonomy and recommendations load concurrently."""
+  filters = _list_filters(request)
+  user = await aload_user(request)
+  await aget_profile(request)
+  campaigns, facets, taxonomy, recommended = await run_concurrently(
+    lambda: list(_listed_campaigns(**filters)),
+    partial(facet_counts, filters["q"], filters["category"], filters["tag"], _open_only(filters["sort"])),
+    get_taxonomy,
+    partial(recommended_for, user.id) if _wants_recommendations(request, filters) else list,
   )
+  context = _list_context(filters, campaigns, facets, taxonomy, recommended)
+  return render(request, "campaigns/campaign_list.html", context)
 
-  creator_user = campaign.created_by
-  creator_profile = Profile.get_or_create_for_user(creator_user) if creator_user else None
-
-  can_manage = request.user.is_authenticated and campaign.created_by_id == request.user.id
-  is_fundraiser = False
-  if request.user.is_authenticated:
-    profile = Profile.get_or_create_for_user(request.user)
-    is_fundraiser = bool(profile.can_fundraise)
 
+def _approved_donations(campaign: Campaign):
   max_amount = _decimal_field_max_value(Donation, "amount")
   donations_qs = Donation.objects.filter(campaign=campaign)
   donations_qs = donations_qs.filter(status=Donation.STATUS_APPROVED)
   if max_amount > 0:
     donations_qs = donations_qs.filter(amount__lte=max_amount)
-  donations = donations_qs.select_related("donor", "group")[:10]
+  return donations_qs.select_related("donor", "group")[:10]
 
-  pending_count = 0
-  if can_manage:
-    pending_count = Donation.objects.filter(campaign=campaign, status=Donation.STATUS_PENDING).count()
 
-  context = {
+def _pending_donations(campaign: Campaign):
+  return Donation.objects.filter(campaign=campaign, status=Donation.STATUS_PENDING)
+
+
+def _detail_context(
+  campaign: Campaign,
+  can_manage: bool,
+  is_fundraiser: bool,
+  following: bool,
+  donations,
+  pending_count: int,
+  related,
+) -> dict:
+  creator_user = campaign.created_by
+  creator_profile = getattr(creator_user, "profile", None) if creator_user else None
+  return {
     "campaign": campaign,
     "creator_user": creator_user,
     "creator_profile": creator_profile,
     "donations": donations,
     "can_manage": can_manage,
-    "disable_donate": can_manage or is_fundraiser,
-    "disable_donate_reason": "owner" if can_manage else ("fundraiser" if is_fundraiser else ""),
+    "disable_donate": can_manage or is_fundraiser or not campaign.is_active,
+    "disable_donate_reason": (
+      "owner" if can_manage else ("fundraiser" if is_fundraiser else ("" if campaign.is_active else "ended"))
+    ),
     "pending_donation_count": pending_count,
+    "is_following": following,
+    "related_campaigns": related,
   }
+
+
+def campaign_detail(request: HttpRequest, campaign_id: int) -> HttpResponse:
+  campaign = get_object_or_404(
+    Campaign.objects.select_related("created_by__profile").prefetch_related("categories", "tags", "updates", "events"),
+    id=campaign_id,
+  )
+
+  can_manage = request.user.is_authenticated and campaign.created_by_id == request.user.id
+  is_fundraiser = False
+  following = False
+  if request.user.is_authenticated:
+    is_fundraiser = bool(request.profile.can_fundraise)
+    if not can_manage:
+      following = is_following(campaign, request.user.id)
+
+  pending_count = 0
+  if can_manage:
+    pending_count = _pending_donations(campaign).count()
+
+  context = _detail_context(
+    campaign, can_manage, is_fundraiser, following, _approved_donations(campaign), pending_count, related_to(campaign.id)
+  )
+  return render(request, "campaigns/campaign_detail.html", context)
+
+
+async def acampaign_detail(request: HttpRequest, campaign_id: int) -> HttpResponse:
+  """campaign_detail for ASGI: everything after the campaign itself loads concurrently.
+
+  The campaign is annotated with_progress() and the donate box's group list
+  is prefetched, so rendering runs no queries.
+  """
+  user = await aload_user(request)
+  campaign = await aget_object_or_404(
+    with_progress(Campaign.objects.select_related("created_by__profile")).prefetch_related(
+      "categories", "tags", "updates", "events"
+    ),
+    id=campaign_id,
+  )
+  can_manage = user.is_authenticated and campaign.created_by_id == user.id
+  follows = user.is_authenticated and not can_manage
+  profile = await aget_profile(request)
+  is_fundraiser = bool(profile and profile.can_fundraise)
+
+  donations, related, following, pending_count, _groups = await run_concurrently(
+    lambda: list(_approved_donations(campaign)),
+    partial(related_to, campaign.id),
+    partial(is_following, campaign, user.id) if follows else bool,
+    _pending_donations(campaign).count if can_manage else int,
+    partial(prefetch_related_objects, [user], "groups_member") if user.is_authenticated else bool,
+  )
+
+  context = _detail_context(campaign, can_manage, is_fundraiser, following, donations, pending_count, related)
   return render(request, "campaigns/campaign_detail.html", context)
 
 
+@login_required
+def campaign_follow(request: HttpRequest, campaign_id: int) -> HttpResponse:
+  campaign = get_object_or_404(Campaign, id=campaign_id)
+  if request.method != "POST" or campaign.created_by_id == request.user.id:
+    return redirect("campaigns:detail", campaign_id=campaign.id)
+
+  subscribed = request.POST.get("action") != "unfollow"
+  set_following(campaign, request.user.id, subscribed)
+  if subscribed:
+    messages.success(request, _("You will be notified about updates and events of this campaign."))
+  else:
+    messages.success(request, _("You will no longer be notified about this campaign."))
+  return redirect("campaigns:detail", campaign_id=campaign.id)
+
+
 @login_required
 def campaign_donation_requests(request: HttpRequest, campaign_id: int) -> HttpResponse:
   campaign = get_object_or_404(Campaign, id=campaign_id)
@@ -182,6 +301,24 @@ def campaign_donation_requests(request: HttpRequest, campaign_id: int) -> HttpRe
   return render(request, "campaigns/donation_requests.html", context)
 
 
+def _decide_donation(campaign: Campaign, donation_id: int, status: str, user) -> Donation | None:
+  """Move a pending donation to `status`; None if another request decided it first."""
+  donation = get_object_or_404(Donation, id=donation_id, campaign=campaign)
+  now = timezone.now()
+  with transaction.atomic():
+    # Only the request whose UPDATE flips the row from pending records the
+    # decision, so a double submit cannot count it in the group totals twice.
+    decided = Donation.objects.filter(id=donation.id, status=Donation.STATUS_PENDING).update(
+      status=status, decided_by=user, decided_at=now
+    )
+    if not decided:
+      return None
+    donation.status, donation.decided_by, donation.decided_at = status, user, now
+    record_donation_decision(donation, Donation.STATUS_PENDING)
+    DONATIONS.inc_on_commit(event=status)
+  return donation
+
+
 @login_required
 def campaign_approve_donation(request: HttpRequest, campaign_id: int, donation_id: int) -> HttpResponse:
   campaign = get_object_or_404(Campaign, id=campaign_id)
@@ -192,20 +329,15 @@ def campaign_approve_donation(request: HttpRequest, campaign_id: int, donation_i
   if request.method != "POST":
     return redirect("campaigns:donation_requests", campaign_id=campaign.id)
 
-  donation = get_object_or_404(Donation, id=donation_id, campaign=campaign)
-  if donation.status != Donation.STATUS_PENDING:
+  donation = _decide_donation(campaign, donation_id, Donation.STATUS_APPROVED, request.user)
+  if donation is None:
     messages.info(request, _("This donation request was already decided."))
     return redirect("campaigns:donation_requests", campaign_id=campaign.id)
 
-  donation.status = Donation.STATUS_APPROVED
-  donation.decided_by = request.user
-  donation.decided_at = timezone.now()
-  donation.save(update_fields=["status", "decided_by", "decided_at"])
-
-  Notification.objects.create(
-    user=donation.donor,
-    kind=Notification.KIND_DONATION,
-    message=_("Your donation request for '%(title)s' was approved.") % {"title": campaign.title},
+  notify(
+    donation.donor,
+    Notification.KIND_DONATION,
+    _("Your donation request for '%(title)s' was approved.") % {"title": campaign.title},
     url=f"/campaigns/{campaign.id}/",
   )
 
@@ -223,20 +355,15 @@ def campaign_reject_donation(request: HttpRequest, campaign_id: int, donation_id
   if request.method != "POST":
     return redirect("campaigns:donation_requests", campaign_id=campaign.id)
 
-  donation = get_object_or_404(Donation, id=donation_id, campaign=campaign)
-  if donation.status != Donation.STATUS_PENDING:
+  donation = _decide_donation(campaign, donation_id, Donation.STATUS_REJECTED, request.user)
+  if donation is None:
     messages.info(request, _("This donation request was already decided."))
     return redirect("campaigns:donation_requests", campaign_id=campaign.id)
 
-  donation.status = Donation.STATUS_REJECTED
-  donation.decided_by = request.user
-  donation.decided_at = timezone.now()
-  donation.save(update_fields=["status", "decided_by", "decided_at"])
-
-  Notification.objects.create(
-    user=donation.donor,
-    kind=Notification.KIND_DONATION,
-    message=_("Your donation request for '%(title)s' was rejected.") % {"title": campaign.title},
+  notify(
+    donation.donor,
+    Notification.KIND_DONATION,
+    _("Your donation request for '%(title)s' was rejected.") % {"title": campaign.title},
     url=f"/campaigns/{campaign.id}/",
   )
 
@@ -246,12 +373,12 @@ def campaign_reject_donation(request: HttpRequest, campaign_id: int, donation_id
 
 @login_required
 def campaign_create(request: HttpRequest) -> HttpResponse:
-  profile = Profile.get_or_create_for_user(request.user)
+  profile = request.profile
   if not profile.can_fundraise:
     messages.error(request, "Your account is not set as a fundraiser.")
     return redirect("user:profile")
 
-  categories = Category.objects.all()
+  categories = get_taxonomy().categories
 
   if request.method == "POST":
     title = (request.POST.get("title") or "").strip()
@@ -306,14 +433,10 @@ def campaign_create(request: HttpRequest) -> HttpResponse:
             campaign.categories.set(Category.objects.filter(id__in=selected_categories))
 
           if new_category_names:
-            created = []
-            for name in new_category_names:
-              cat, _ = Category.objects.get_or_create(name=name)
-              created.append(cat)
-            campaign.categories.add(*created)
+            campaign.categories.add(*_get_or_create_by_slug(Category, new_category_names))
 
           if tag_names:
-            campaign.tags.set(_get_or_create_tags(tag_names))
+            campaign.tags.set(_get_or_create_by_slug(Tag, tag_names))
           messages.success(request, "Campaign created.")
           return redirect("campaigns:detail", campaign_id=campaign.id)
 
@@ -324,6 +447,23 @@ def campaign_create(request: HttpRequest) -> HttpResponse:
   return render(request, "campaigns/campaign_form.html", context)
 
 
+def taxonomy_autocomplete(request: HttpRequest) -> HttpResponse:
+  """Tag/category suggestions for the last comma-separated entry of an input, served from memory."""
+  kind = KIND_CATEGORY if request.GET.get("kind") == KIND_CATEGORY else KIND_TAG
+  field = request.GET.get("field") or ""
+  raw = request.GET.get(field) if field else request.GET.get("q")
+  prefix = (raw or "").split(",")[-1].strip().lstrip("#")
+  matches = get_taxonomy().autocomplete(kind, prefix)
+
+  if not request.htmx:
+    return JsonResponse({"results": [{"name": m.name, "slug": m.slug, "count": m.count} for m in matches]})
+  context = {
+    "matches": matches,
+    "field": field,
+  }
+  return render(request, "campaigns/partials/taxonomy_suggestions.html", context)
+
+
 @login_required
 def campaign_update_image(request: HttpRequest, campaign_id: int) -> HttpResponse:
   campaign = get_object_or_404(Campaign, id=campaign_id)
@@ -372,7 +512,14 @@ def campaign_add_update(request: HttpRequest, campaign_id: int) -> HttpResponse:
     if not title or not content_md:
       messages.error(request, "Title and content are required.")
     else:
-      CampaignUpdate.objects.create(campaign=campaign, title=title, content_md=content_md, image_url=image_url)
+      with transaction.atomic():
+        update = CampaignUpdate.objects.create(campaign=campaign, title=title, content_md=content_md, image_url=image_url)
+        enqueue_fanout(
+          campaign,
+          Notification.KIND_CAMPAIGN_UPDATE,
+          _("New update on '%(campaign)s': %(title)s") % {"campaign": campaign.title, "title": title},
+          url=f"/campaigns/{campaign.id}/updates/{update.id}/",
+        )
       messages.success(request, "Update posted.")
       return redirect("campaigns:detail", campaign_id=campaign.id)
 
@@ -390,6 +537,21 @@ def campaign_update_detail(request: HttpRequest, campaign_id: int, update_id: in
   return render(request, "campaigns/update_detail.html", context)
 
 
+async def acampaign_update_detail(request: HttpRequest, campaign_id: int, update_id: int) -> HttpResponse:
+  await aload_user(request)
+  await aget_profile(request)
+  campaign, update = await run_concurrently(
+    partial(get_object_or_404, Campaign, id=campaign_id),
+    partial(get_object_or_404, CampaignUpdate, id=update_id, campaign_id=campaign_id),
+  )
+
+  context = {
+    "campaign": campaign,
+    "update": update,
+  }
+  return render(request, "campaigns/update_detail.html", context)
+
+
 @login_required
 def event_create(request: HttpRequest, campaign_id: int) -> HttpResponse:
   campaign = get_object_or_404(Campaign, id=campaign_id)
@@ -414,23 +576,27 @@ def event_create(request: HttpRequest, campaign_id: int) -> HttpResponse:
       if not starts_at:
         messages.error(request, "Please provide a valid start time.")
       else:
-        Event.objects.create(
-          campaign=campaign,
-          title=title,
-          description=description,
-          starts_at=starts_at,
-          location=location,
-        )
+        with transaction.atomic():
+          event = Event.objects.create(
+            campaign=campaign,
+            title=title,
+            description=description,
+            starts_at=starts_at,
+            location=location,
+          )
+          enqueue_fanout(
+            campaign,
+            Notification.KIND_CAMPAIGN_EVENT,
+            _("New event for '%(campaign)s': %(title)s") % {"campaign": campaign.title, "title": title},
+            url=f"/campaigns/{campaign.id}/events/{event.id}/",
+          )
         messages.success(request, "Event created.")
         return redirect("campaigns:detail", campaign_id=campaign.id)
 
   return render(request, "campaigns/event_form.html", {"campaign": campaign})
 
 
-def event_detail(request: HttpRequest, campaign_id: int, event_id: int) -> HttpResponse:
-  campaign = get_object_or_404(Campaign, id=campaign_id)
-  event = get_object_or_404(Event, id=event_id, campaign=campaign)
-
+def _event_context(campaign: Campaign, event: Event) -> dict:
   starts_at = event.starts_at
   if timezone.is_naive(starts_at):
     starts_at = starts_at.replace(tzinfo=dt_timezone.utc)
@@ -447,9 +613,24 @@ def event_detail(request: HttpRequest, campaign_id: int, event_id: int) -> HttpR
   }
   gcal_url = "https://calendar.google.com/calendar/render?" + urlencode(params)
 
-  context = {
+  return {
     "campaign": campaign,
     "event": event,
     "gcal_url": gcal_url,
   }
-  return render(request, "campaigns/event_detail.html", context)
+
+
+def event_detail(request: HttpRequest, campaign_id: int, event_id: int) -> HttpResponse:
+  campaign = get_object_or_404(Campaign, id=campaign_id)
+  event = get_object_or_404(Event, id=event_id, campaign=campaign)
+  return render(request, "campaigns/event_detail.html", _event_context(campaign, event))
+
+
+async def aevent_detail(request: HttpRequest, campaign_id: int, event_id: int) -> HttpResponse:
+  await aload_user(request)
+  await aget_profile(request)
+  campaign, event = await run_concurrently(
+    partial(get_object_or_404, Campaign, id=campaign_id),
+    partial(get_object_or_404, Event, id=event_id, campaign_id=campaign_id),
+  )
+  return render(request, "campaigns/event_detail.html", _event_context(campaign, event))
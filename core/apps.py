@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class CoreConfig(AppConfig):
+  default_auto_field = "django.db.models.BigAutoField"
+  name = "core"
+
+  def ready(self):
+    from . import sqlhooks
+
+    connection_created.connect(sqlhooks.install, dispatch_uid="core.sqlhooks")
+    # Connections opened while apps were loading.
+    for connection in connections.all(initialized_only=True):
+      sqlhooks.install(connection=connection)
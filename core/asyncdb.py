@@ -0,0 +1,71 @@
+"""Running independent ORM work concurrently from async views.
+
+The async ORM (`aget`, `acount`, `async for`) hands each query to
+sync_to_async with thread_sensitive=True. Under ASGI that means one thread
+per request, so a view awaiting several queries with asyncio.gather still
+runs them one after the other. `run_concurrently` runs sync callables in a
+separate bounded pool (ASYNC_DB_THREADS per process) instead. Each of its
+threads keeps its own connection for CONN_MAX_AGE like any other thread (or
+borrows one per call from the connection pool, see core.database_url), so
+the number of extra connections per worker is bounded too.
+
+    campaigns, facets = await run_concurrently(
+      lambda: list(queryset),
+      partial(facet_counts, q, category, tag),
+    )
+
+With a connection pool, a request must not hold a connection while waiting
+for others: a burst of requests could take every connection and then wait
+for more until pool_timeout. So `run_concurrently` first gives back the
+connection of the request's own thread, and a view does its async ORM work
+before or after it, never alongside (no asyncio.gather of the two).
+
+Context variables follow the work into the pool, so core.querybudget and
+core.tracing see these queries as part of the request. Whatever a template
+will touch must be loaded here or with the async ORM before rendering:
+rendering runs on the event loop, where a lazy query raises
+SynchronousOnlyOperation.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+  global _executor
+  if _executor is None:
+    _executor = ThreadPoolExecutor(settings.ASYNC_DB_THREADS, thread_name_prefix="async-db")
+  return _executor
+
+
+def _release() -> None:
+  # close_old_connections() (what request_finished runs), minus connections
+  # inside a transaction. A pooled connection goes back to the pool.
+  for connection in connections.all(initialized_only=True):
+    if not connection.in_atomic_block:
+      connection.close_if_unusable_or_obsolete()
+
+
+def _call(func: Callable):
+  try:
+    return func()
+  finally:
+    _release()
+
+
+async def run_concurrently(*funcs: Callable) -> list:
+  """Run each callable in the DB pool, all at once; their results in order."""
+  await sync_to_async(_release)()  # the request's own thread
+  executor = _get_executor()
+  return await asyncio.gather(
+    *(sync_to_async(_call, thread_sensitive=False, executor=executor)(func) for func in funcs)
+  )
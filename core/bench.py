@@ -0,0 +1,444 @@
+"""In-process latency benchmarks of the hot views (`manage.py bench`).
+
+Each scenario drives one view through the Django test client against a seeded
+database (`manage.py seed_bulk`), as logged-in seed users picked with the
+same Zipf skew the seeder uses. The request list is drawn from a fixed seed up
+front, split across a thread pool and replayed at every concurrency level.
+Users are logged in up front, from one thread, and workers keep one client
+per user carrying that session.
+
+Per scenario and concurrency level the report has p50/p95/p99 latency,
+throughput, errors (5xx) and mean queries per request (core.querybudget).
+Allocated memory per request is measured in a separate single-threaded pass
+under tracemalloc, which would otherwise slow down and mix up the timed
+requests of concurrent workers.
+
+With `asgi=True` (`bench --asgi`) requests go through the project's ASGI
+application instead, the way uvicorn calls it: one event loop, one task per
+concurrent worker, session and CSRF cookies from logging the users in
+beforehand. That measures async views as deployed, including the thread
+hops of any sync code on the way. manage.py loads the sync views; run with
+ASYNC_READ_VIEWS=True, as CrowdfundingProject/asgi.py does, to see what the
+async read views buy:
+
+    manage.py bench --asgi --save sync.json
+    ASYNC_READ_VIEWS=True manage.py bench --asgi --compare sync.json
+
+The memory pass uses the test client and is skipped in ASGI mode.
+
+Results can be saved as a JSON baseline and compared against one: a
+scenario regresses when its p50 or p95 latency or its memory grows by more
+than `threshold` (and by at least `min_delta_ms` for latency, so noise on
+millisecond views does not trip it), when it runs more queries or when more
+of its requests fail. Throughput in the comparison counts successful requests
+only: a write that fails with "database is locked" is fast, not done.
+
+The write scenarios (donating, posting a group message) add rows, so point
+the benchmark at a throwaway database.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from functools import partial
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.db import connections
+from django.middleware.csrf import CSRF_SECRET_LENGTH
+from django.test import Client
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from campaigns.models import Campaign
+from groups.models import GroupMembership
+
+from .querybudget import record_queries
+from .seed import ZipfPicker
+
+DEFAULT_CONCURRENCY = (1, 4, 8)
+DEFAULT_REQUESTS = 200
+DEFAULT_THRESHOLD = 0.2
+DEFAULT_MIN_DELTA_MS = 1.0
+
+# A host from ALLOWED_HOSTS, so the benchmark does not need test settings.
+_HOST = "localhost"
+
+
+@dataclass(frozen=True)
+class Call:
+  user_id: int
+  method: str
+  path: str
+  data: dict = field(default_factory=dict)
+  headers: dict = field(default_factory=dict)
+
+
+class Targets:
+  """Ids of the seeded rows the scenarios pick from."""
+
+  def __init__(self, prefix: str, rng: random.Random, zipf: float):
+    User = get_user_model()
+    seeded = User.objects.filter(username__startswith=f"{prefix}_")
+    donors = list(seeded.filter(profile__can_fundraise=False).order_by("id").values_list("id", flat=True))
+    campaigns = list(
+      Campaign.objects.filter(status=Campaign.STATUS_ACTIVE, end_date__gte=timezone.localdate(), created_by__in=seeded)
+      .order_by("id")
+      .values_list("id", flat=True)
+    )
+    memberships = list(
+      GroupMembership.objects.filter(user__in=seeded).order_by("group_id", "user_id").values_list("group_id", "user_id")
+    )
+    if not donors or not campaigns or not memberships:
+      raise ValueError(f"No seeded data with prefix '{prefix}'; run `manage.py seed_bulk` first.")
+
+    self.donors = ZipfPicker(rng, donors, zipf)
+    self.campaigns = ZipfPicker(rng, campaigns, zipf)
+    self.memberships = ZipfPicker(rng, memberships, zipf)
+
+
+@dataclass(frozen=True)
+class Scenario:
+  name: str
+  make_call: Callable[[Targets, random.Random], Call]
+
+
+def _campaign_list(t: Targets, rng: random.Random) -> Call:
+  return Call(t.donors.pick(), "get", "/")
+
+
+def _campaign_detail(t: Targets, rng: random.Random) -> Call:
+  return Call(t.donors.pick(), "get", f"/campaigns/{t.campaigns.pick()}/")
+
+
+def _donate_to_campaign(t: Targets, rng: random.Random) -> Call:
+  return Call(
+    t.donors.pick(),
+    "post",
+    f"/donations/campaign/{t.campaigns.pick()}/",
+    data={"amount": str(rng.choice([20_000, 50_000, 100_000]))},
+    headers={"HX-Request": "true"},
+  )
+
+
+def _group_detail(t: Targets, rng: random.Random) -> Call:
+  group_id, user_id = t.memberships.pick()
+  return Call(user_id, "get", f"/groups/{group_id}/")
+
+
+def _group_post_message(t: Targets, rng: random.Random) -> Call:
+  group_id, user_id = t.memberships.pick()
+  return Call(user_id, "post", f"/groups/{group_id}/messages/", data={"content": f"bench message {rng.randrange(10**6)}"})
+
+
+SCENARIOS = {
+  s.name: s
+  for s in [
+    Scenario("campaign_list", _campaign_list),
+    Scenario("campaign_detail", _campaign_detail),
+    Scenario("donate_to_campaign", _donate_to_campaign),
+    Scenario("group_detail", _group_detail),
+    Scenario("group_post_message", _group_post_message),
+  ]
+}
+
+
+@dataclass
+class Sample:
+  seconds: float
+  queries: int
+  error: bool
+
+
+@dataclass
+class Result:
+  scenario: str
+  concurrency: int
+  requests: int
+  errors: int
+  p50_ms: float
+  p95_ms: float
+  p99_ms: float
+  mean_ms: float
+  throughput: float
+  queries: float
+  alloc_kib: float | None = None
+
+  @property
+  def key(self) -> str:
+    return f"{self.scenario}@{self.concurrency}"
+
+
+class _Sessions:
+  """Sessions of logged-in users (and a CSRF secret), created once and shared by every worker."""
+
+  def __init__(self):
+    self.by_user = {}
+    self.csrf = get_random_string(CSRF_SECRET_LENGTH)
+
+  def session_key(self, user_id: int) -> str:
+    key = self.by_user.get(user_id)
+    if key is None:
+      client = Client(HTTP_HOST=_HOST)
+      client.force_login(get_user_model().objects.get(pk=user_id))
+      key = self.by_user[user_id] = client.cookies[settings.SESSION_COOKIE_NAME].value
+    return key
+
+  def log_in(self, calls: list[Call]) -> None:
+    # Before the clock starts, and from one thread: concurrent logins are writes too.
+    for call in calls:
+      self.session_key(call.user_id)
+
+  def cookie(self, user_id: int) -> bytes:
+    return f"{settings.SESSION_COOKIE_NAME}={self.session_key(user_id)}; {settings.CSRF_COOKIE_NAME}={self.csrf}".encode()
+
+
+class _Clients(threading.local):
+  """One test client per user, per worker thread, carrying the user's session."""
+
+  def __init__(self, sessions: _Sessions):
+    self.sessions = sessions
+    self.by_user = {}
+
+  def get(self, user_id: int) -> Client:
+    client = self.by_user.get(user_id)
+    if client is None:
+      client = Client(HTTP_HOST=_HOST, raise_request_exception=False)
+      client.cookies[settings.SESSION_COOKIE_NAME] = self.sessions.session_key(user_id)
+      self.by_user[user_id] = client
+    return client
+
+
+def _perform(clients: _Clients, call: Call) -> Sample:
+  client = clients.get(call.user_id)
+  send = client.post if call.method == "post" else client.get
+  with record_queries() as recorder:
+    start = time.perf_counter()
+    response = send(call.path, call.data, headers=call.headers)
+    seconds = time.perf_counter() - start
+  return Sample(seconds, recorder.count, response.status_code >= 500)
+
+
+def _replay(calls: list[Call], concurrency: int, clients: _Clients) -> tuple[list[Sample], float]:
+  clients.sessions.log_in(calls)
+  slices = [calls[i::concurrency] for i in range(concurrency)]
+
+  def worker(part: list[Call]) -> list[Sample]:
+    try:
+      return [_perform(clients, call) for call in part]
+    finally:
+      # Worker threads open their own connections; don't leave them behind.
+      connections.close_all()
+
+  start = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=concurrency) as pool:
+    samples = [sample for part in pool.map(worker, slices) for sample in part]
+  return samples, time.perf_counter() - start
+
+
+async def _asgi_perform(app, sessions: _Sessions, call: Call) -> Sample:
+  path, _, query = call.path.partition("?")
+  body = urlencode(call.data).encode() if call.method == "post" else b""
+  headers = [(b"host", _HOST.encode()), (b"cookie", sessions.cookie(call.user_id))]
+  if call.method == "post":
+    headers += [
+      (b"content-type", b"application/x-www-form-urlencoded"),
+      (b"content-length", str(len(body)).encode()),
+      (b"x-csrftoken", sessions.csrf.encode()),
+    ]
+  headers += [(name.lower().encode(), value.encode()) for name, value in call.headers.items()]
+  scope = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": call.method.upper(),
+    "scheme": "http",
+    "path": path,
+    "raw_path": path.encode(),
+    "query_string": query.encode(),
+    "root_path": "",
+    "headers": headers,
+    "client": ("127.0.0.1", 0),
+    "server": (_HOST, 80),
+  }
+  messages = [{"type": "http.request", "body": body, "more_body": False}]
+  status = 500
+
+  async def receive():
+    if messages:
+      return messages.pop()
+    await asyncio.Event().wait()  # the client never disconnects
+
+  async def send(message):
+    nonlocal status
+    if message["type"] == "http.response.start":
+      status = message["status"]
+
+  with record_queries() as recorder:
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    seconds = time.perf_counter() - start
+  return Sample(seconds, recorder.count, status >= 500)
+
+
+def _replay_asgi(calls: list[Call], concurrency: int, app, sessions: _Sessions) -> tuple[list[Sample], float]:
+  sessions.log_in(calls)
+  slices = [calls[i::concurrency] for i in range(concurrency)]
+
+  async def worker(part: list[Call]) -> list[Sample]:
+    return [await _asgi_perform(app, sessions, call) for call in part]
+
+  async def main() -> list[list[Sample]]:
+    return await asyncio.gather(*(worker(part) for part in slices))
+
+  start = time.perf_counter()
+  parts = asyncio.run(main())
+  return [sample for part in parts for sample in part], time.perf_counter() - start
+
+
+def _percentile_ms(cuts: list[float], p: int) -> float:
+  return round(cuts[p - 1] * 1000, 2)
+
+
+def _summarize(scenario: str, concurrency: int, samples: list[Sample], wall: float) -> Result:
+  seconds = [s.seconds for s in samples]
+  cuts = statistics.quantiles(seconds, n=100, method="inclusive") if len(seconds) > 1 else seconds * 99
+  return Result(
+    scenario=scenario,
+    concurrency=concurrency,
+    requests=len(samples),
+    errors=sum(s.error for s in samples),
+    p50_ms=_percentile_ms(cuts, 50),
+    p95_ms=_percentile_ms(cuts, 95),
+    p99_ms=_percentile_ms(cuts, 99),
+    mean_ms=round(statistics.fmean(seconds) * 1000, 2),
+    throughput=round(len(samples) / wall, 1) if wall else 0.0,
+    queries=round(statistics.fmean(s.queries for s in samples), 1),
+  )
+
+
+def _allocated_kib(calls: list[Call], clients: _Clients) -> float:
+  """Mean peak of memory allocated while serving one request, in KiB."""
+  peaks = []
+  tracemalloc.start()
+  try:
+    for call in calls:
+      clients.get(call.user_id)  # log in before measuring
+      tracemalloc.reset_peak()
+      baseline, _peak = tracemalloc.get_traced_memory()
+      _perform(clients, call)
+      _current, peak = tracemalloc.get_traced_memory()
+      peaks.append(peak - baseline)
+  finally:
+    tracemalloc.stop()
+  return round(statistics.fmean(peaks) / 1024, 1) if peaks else 0.0
+
+
+def run(
+  scenarios: list[str],
+  concurrency: list[int] = DEFAULT_CONCURRENCY,
+  requests: int = DEFAULT_REQUESTS,
+  warmup: int = 20,
+  memory_requests: int = 20,
+  prefix: str = "seed",
+  seed: int = 1,
+  zipf: float = 1.1,
+  asgi: bool = False,
+  log: Callable[[Result], None] = lambda result: None,
+) -> list[Result]:
+  rng = random.Random(seed)
+  targets = Targets(prefix, rng, zipf)
+  sessions = _Sessions()
+  clients = _Clients(sessions)
+  if asgi:
+    replay = partial(_replay_asgi, app=get_asgi_application(), sessions=sessions)
+    memory_requests = 0
+  else:
+    replay = partial(_replay, clients=clients)
+  results = []
+
+  # Every request logs a line at INFO outside DEBUG; keep only the warnings.
+  budget_logger = logging.getLogger("core.querybudget")
+  level = budget_logger.level
+  budget_logger.setLevel(logging.WARNING)
+  try:
+    for name in scenarios:
+      scenario = SCENARIOS[name]
+      calls = [scenario.make_call(targets, rng) for _ in range(warmup + requests)]
+      if warmup:
+        replay(calls[:warmup], 1)
+      alloc_kib = _allocated_kib(calls[warmup : warmup + memory_requests], clients) if memory_requests else None
+      for workers in concurrency:
+        samples, wall = replay(calls[warmup:], workers)
+        result = _summarize(name, workers, samples, wall)
+        result.alloc_kib = alloc_kib
+        results.append(result)
+        log(result)
+  finally:
+    budget_logger.setLevel(level)
+  return results
+
+
+def save(results: list[Result], path: str | Path) -> None:
+  data = {"results": {result.key: asdict(result) for result in results}}
+  Path(path).write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+
+def load(path: str | Path) -> dict[str, dict]:
+  return json.loads(Path(path).read_text())["results"]
+
+
+def regressions(
+  results: list[Result],
+  baseline: dict[str, dict],
+  threshold: float = DEFAULT_THRESHOLD,
+  min_delta_ms: float = DEFAULT_MIN_DELTA_MS,
+) -> list[str]:
+  problems = []
+  for result in results:
+    base = baseline.get(result.key)
+    if base is None:
+      continue
+    for metric in ("p50_ms", "p95_ms"):
+      now, before = getattr(result, metric), base[metric]
+      if now > before * (1 + threshold) and now - before >= min_delta_ms:
+        problems.append(f"{result.key}: {metric} {before} -> {now}")
+    if result.errors > base.get("errors", 0):
+      problems.append(f"{result.key}: errors {base.get('errors', 0)} -> {result.errors}")
+    if result.queries > base["queries"] + 0.5:
+      problems.append(f"{result.key}: queries {base['queries']} -> {result.queries}")
+    if result.alloc_kib is not None and base.get("alloc_kib") and result.alloc_kib > base["alloc_kib"] * (1 + threshold):
+      problems.append(f"{result.key}: alloc_kib {base['alloc_kib']} -> {result.alloc_kib}")
+  return problems
+
+
+def _successful_throughput(result: dict) -> float:
+  return round(result["throughput"] * (result["requests"] - result["errors"]) / result["requests"], 1) if result["requests"] else 0.0
+
+
+def speedups(results: list[Result], baseline: dict[str, dict]) -> list[str]:
+  """Successful requests per second against the baseline, one line per scenario and concurrency level."""
+  lines = []
+  for result in results:
+    base = baseline.get(result.key)
+    if not base:
+      continue
+    now, before = _successful_throughput(asdict(result)), _successful_throughput(base)
+    if before:
+      lines.append(f"{result.key}: {now} req/s vs {before} ({now / before:.2f}x)")
+    elif now:
+      lines.append(f"{result.key}: {now} req/s vs {before}")
+  return lines
@@ -0,0 +1,197 @@
+"""Project-wide caching on top of Django's default cache (see core.cache_url).
+
+Keys are namespaced and versioned: `versioned_key("taxonomy", ...)` embeds the
+namespace's current version, so `bump_namespace("taxonomy")` retires every key
+of the namespace at once without having to find and delete them.
+
+`cached_query` memoizes a function's result under such a key. Stampedes are
+limited with a cache lock: on a miss only the lock holder runs the query and
+the others wait for its result; once an entry is past its TTL but within
+`stale_ttl`, the lock holder refreshes it while the others keep serving the
+stale value.
+
+`invalidate_on` registers model changes (post_save, post_delete and, for M2M
+through models, m2m_changed) that bump a namespace or delete specific keys.
+Invalidation runs on commit, so a concurrent reader cannot cache the
+pre-commit state under the new version.
+
+Lookups are counted as hit, stale or miss per namespace in core.metrics and
+traced as `cache.lookup` spans.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from . import tracing
+from .metrics import CACHE_LOOKUPS
+
+LOCK_TIMEOUT = 10
+_LOCK_POLL_SECONDS = 0.05
+
+
+def _namespace_key(namespace: str) -> str:
+  return f"ns:{namespace}"
+
+
+def namespace_version(namespace: str) -> int:
+  key = _namespace_key(namespace)
+  version = cache.get(key)
+  if version is None:
+    # Start from the clock rather than 1: if the counter was evicted, old
+    # entries written under small versions must not become valid again.
+    cache.add(key, time.time_ns() // 1000, None)
+    version = cache.get(key)
+  return version
+
+
+def bump_namespace(namespace: str) -> None:
+  key = _namespace_key(namespace)
+  try:
+    cache.incr(key)
+  except ValueError:
+    cache.add(key, time.time_ns() // 1000, None)
+
+
+def versioned_key(namespace: str, *parts: object) -> str:
+  return ":".join([namespace, str(namespace_version(namespace)), *map(str, parts)])
+
+
+def cached_query(
+  namespace: str,
+  ttl: int,
+  stale_ttl: int = 0,
+  key: Callable[..., str] | None = None,
+  lock_timeout: int = LOCK_TIMEOUT,
+):
+  """Cache the decorated function's result for `ttl` seconds under `namespace`.
+
+  `key(*args, **kwargs)` names the entry (default: the repr of the
+  arguments). The wrapper also gets `.key(*args, **kwargs)` for use with
+  `invalidate_on(keys=...)`, `.forget(*args, **kwargs)` and `.invalidate()`.
+  """
+
+  def _count(current: tracing.Span | None, result: str) -> None:
+    CACHE_LOOKUPS.inc(namespace=namespace, result=result)
+    if current is not None:
+      current.set(result=result)
+
+  def decorator(func):
+    name = f"{func.__module__}.{func.__qualname__}"
+
+    def make_key(*args, **kwargs) -> str:
+      raw = key(*args, **kwargs) if key else repr((args, sorted(kwargs.items())))
+      # Hashed so keys stay short and free of characters memcached rejects.
+      return versioned_key(namespace, name, hashlib.blake2b(raw.encode(), digest_size=16).hexdigest())
+
+    def refresh(cache_key: str, args, kwargs):
+      value = func(*args, **kwargs)
+      cache.set(cache_key, (value, time.time() + ttl), ttl + stale_ttl)
+      return value
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+      with tracing.span("cache.lookup", tracing.KIND_CLIENT, namespace=namespace, function=name) as current:
+        return lookup(current, args, kwargs)
+
+    def lookup(current, args, kwargs):
+      cache_key = make_key(*args, **kwargs)
+      lock_key = f"{cache_key}:lock"
+
+      entry = cache.get(cache_key)
+      if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until:
+          _count(current, "hit")
+          return value
+        _count(current, "stale")
+        if not cache.add(lock_key, 1, lock_timeout):
+          return value
+        try:
+          return refresh(cache_key, args, kwargs)
+        finally:
+          cache.delete(lock_key)
+
+      _count(current, "miss")
+      if cache.add(lock_key, 1, lock_timeout):
+        try:
+          return refresh(cache_key, args, kwargs)
+        finally:
+          cache.delete(lock_key)
+
+      # Another worker is computing this entry; wait for it instead of
+      # running the same query, but not longer than its lock can be held.
+      deadline = time.monotonic() + lock_timeout
+      while time.monotonic() < deadline:
+        time.sleep(_LOCK_POLL_SECONDS)
+        entry = cache.get(cache_key)
+        if entry is not None:
+          return entry[0]
+      return func(*args, **kwargs)
+
+    wrapper.key = make_key
+    wrapper.forget = lambda *args, **kwargs: cache.delete(make_key(*args, **kwargs))
+    wrapper.invalidate = lambda: bump_namespace(namespace)
+    return wrapper
+
+  return decorator
+
+
+@dataclass(frozen=True)
+class _Rule:
+  namespace: str | None
+  keys: Callable[[models.Model], Iterable[str]] | None
+
+
+_rules: dict[type[models.Model], list[_Rule]] = defaultdict(list)
+
+
+def invalidate_on(
+  *senders: type[models.Model],
+  namespace: str | None = None,
+  keys: Callable[[models.Model], Iterable[str]] | None = None,
+) -> None:
+  """After a change to any of `senders` commits, bump `namespace` and/or delete `keys(instance)`.
+
+  For an M2M through model, `instance` is the object whose relation changed
+  (the signal's `instance`), not the through row.
+  """
+  if namespace is None and keys is None:
+    raise ValueError("invalidate_on() needs a namespace or a keys callable.")
+
+  rule = _Rule(namespace, keys)
+  for sender in senders:
+    if sender not in _rules:
+      uid = f"core.cache:{sender._meta.label}"
+      if sender._meta.auto_created:
+        m2m_changed.connect(_on_change, sender=sender, dispatch_uid=uid)
+      post_save.connect(_on_change, sender=sender, dispatch_uid=uid)
+      post_delete.connect(_on_change, sender=sender, dispatch_uid=uid)
+    _rules[sender].append(rule)
+
+
+def _on_change(sender, instance, using=None, **kwargs):
+  action = kwargs.get("action")
+  if action is not None and not action.startswith("post_"):
+    return
+
+  rules = _rules.get(sender, ())
+  namespaces = {rule.namespace for rule in rules if rule.namespace}
+  stale_keys = [k for rule in rules if rule.keys for k in rule.keys(instance)]
+
+  def invalidate():
+    for namespace in namespaces:
+      bump_namespace(namespace)
+    if stale_keys:
+      cache.delete_many(stale_keys)
+
+  transaction.on_commit(invalidate, using=using)
@@ -0,0 +1,65 @@
+"""CACHES["default"] from a CACHE_URL, in the spirit of dj_database_url.
+
+    locmem://                       per-process memory (development default)
+    file:///var/tmp/crowdfunding    files shared by the workers of one machine
+    db://django_cache               database table (`manage.py createcachetable`)
+    redis://host:6379/0             Redis/Valkey (`pip install .[redis]`)
+    memcached://host:11211          Memcached (`pip install .[memcached]`)
+    dummy://                        no caching
+
+Query parameters: `timeout` (seconds, or "none"), `key_prefix`, and anything
+else as a backend option (e.g. `?max_entries=5000`).
+"""
+
+from __future__ import annotations
+
+from urllib.parse import parse_qsl, urlsplit
+
+BACKENDS = {
+  "locmem": "django.core.cache.backends.locmem.LocMemCache",
+  "file": "django.core.cache.backends.filebased.FileBasedCache",
+  "db": "django.core.cache.backends.db.DatabaseCache",
+  "redis": "django.core.cache.backends.redis.RedisCache",
+  "rediss": "django.core.cache.backends.redis.RedisCache",
+  "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+  "dummy": "django.core.cache.backends.dummy.DummyCache",
+}
+
+# Backends whose OPTIONS are Django's own (upper-case) culling settings; the
+# others pass OPTIONS through to the client library.
+_DJANGO_OPTIONS = {"locmem", "file", "db"}
+
+
+def _value(raw: str) -> int | str:
+  return int(raw) if raw.isdigit() else raw
+
+
+def parse(url: str) -> dict:
+  parts = urlsplit(url)
+  scheme = parts.scheme
+  if scheme not in BACKENDS:
+    raise ValueError(f"Unsupported CACHE_URL scheme {scheme!r}; expected one of {', '.join(BACKENDS)}.")
+
+  config = {"BACKEND": BACKENDS[scheme]}
+  if scheme == "locmem":
+    config["LOCATION"] = parts.netloc or "crowdfunding"
+  elif scheme == "file":
+    config["LOCATION"] = parts.path
+  elif scheme == "db":
+    config["LOCATION"] = parts.netloc or parts.path.strip("/") or "django_cache"
+  elif scheme in ("redis", "rediss"):
+    config["LOCATION"] = f"{scheme}://{parts.netloc}{parts.path}"
+  elif scheme == "memcached":
+    config["LOCATION"] = parts.netloc
+
+  options = {}
+  for name, raw in parse_qsl(parts.query):
+    if name == "timeout":
+      config["TIMEOUT"] = None if raw.lower() == "none" else int(raw)
+    elif name == "key_prefix":
+      config["KEY_PREFIX"] = raw
+    else:
+      options[name.upper() if scheme in _DJANGO_OPTIONS else name] = _value(raw)
+  if options:
+    config["OPTIONS"] = options
+  return config
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import bench
+
+
+def _int_list(value: str) -> list[int]:
+  return [int(part) for part in value.split(",") if part.strip()]
+
+
+class Command(BaseCommand):
+  help = (
+    "Benchmarks the hot views in-process through the test client against data from seed_bulk: "
+    "latency percentiles, queries and memory per request. Saves JSON baselines and fails on regressions. "
+    "Write scenarios add rows, so use a throwaway database. "
+    "--asgi sends the requests through the ASGI application instead of the test client."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("--scenario", action="append", choices=sorted(bench.SCENARIOS), help="Repeatable; default: all.")
+    parser.add_argument("--concurrency", type=_int_list, default=list(bench.DEFAULT_CONCURRENCY), help="e.g. 1,4,8")
+    parser.add_argument("--requests", type=int, default=bench.DEFAULT_REQUESTS)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--memory-requests", type=int, default=20)
+    parser.add_argument("--prefix", default="seed", help="Username prefix used by seed_bulk.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--asgi", action="store_true", help="Drive the ASGI application (no memory pass).")
+    parser.add_argument("--save", metavar="PATH", help="Write the results as a JSON baseline.")
+    parser.add_argument("--compare", metavar="PATH", help="Fail if results regress against this baseline.")
+    parser.add_argument("--threshold", type=float, default=bench.DEFAULT_THRESHOLD, help="Allowed relative slowdown.")
+    parser.add_argument("--min-delta-ms", type=float, default=bench.DEFAULT_MIN_DELTA_MS)
+
+  def handle(self, *args, **options):
+    if settings.DEBUG:
+      self.stderr.write(self.style.WARNING("DEBUG is on: query logging and debug tooling inflate the numbers."))
+    if not options["concurrency"] or min(options["concurrency"]) < 1 or options["requests"] < 1:
+      raise CommandError("--concurrency levels and --requests must be at least 1.")
+
+    self.stdout.write(
+      f"{'scenario':<20} {'conc':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>7} {'KiB':>8} {'errors':>6}"
+    )
+
+    def log(r: bench.Result) -> None:
+      alloc = "-" if r.alloc_kib is None else f"{r.alloc_kib:.1f}"
+      self.stdout.write(
+        f"{r.scenario:<20} {r.concurrency:>4} {r.p50_ms:>8.2f} {r.p95_ms:>8.2f} {r.p99_ms:>8.2f} "
+        f"{r.throughput:>8.1f} {r.queries:>7.1f} {alloc:>8} {r.errors:>6}"
+      )
+
+    try:
+      results = bench.run(
+        options["scenario"] or list(bench.SCENARIOS),
+        concurrency=options["concurrency"],
+        requests=options["requests"],
+        warmup=options["warmup"],
+        memory_requests=options["memory_requests"],
+        prefix=options["prefix"],
+        seed=options["seed"],
+        asgi=options["asgi"],
+        log=log,
+      )
+    except ValueError as exc:
+      raise CommandError(str(exc)) from exc
+
+    if options["save"]:
+      bench.save(results, options["save"])
+      self.stdout.write(f"Saved baseline to {options['save']}.")
+
+    if options["compare"]:
+      baseline = bench.load(options["compare"])
+      for line in bench.speedups(results, baseline):
+        self.stdout.write(f"Throughput {line}")
+      problems = bench.regressions(results, baseline, options["threshold"], options["min_delta_ms"])
+      if problems:
+        raise CommandError("Regressions against baseline:\n  " + "\n  ".join(problems))
+      self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
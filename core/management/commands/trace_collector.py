@@ -0,0 +1,59 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+  help = (
+    "Runs a minimal OTLP/HTTP JSON collector for local use: accepts POST /v1/traces "
+    "(TRACING_EXPORT=http://localhost:4318) and appends one JSON line per span to a file."
+  )
+
+  def add_arguments(self, parser):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--output", default="traces.jsonl")
+
+  def handle(self, *args, **options):
+    output = options["output"]
+    stdout = self.stdout
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+      def do_POST(self):
+        if self.path != "/v1/traces":
+          self.send_error(404)
+          return
+        try:
+          payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        except ValueError:
+          self.send_error(400, "Expected OTLP JSON")
+          return
+
+        lines = []
+        for resource_spans in payload.get("resourceSpans", []):
+          resource = {a["key"]: next(iter(a["value"].values())) for a in resource_spans.get("resource", {}).get("attributes", [])}
+          for scope_spans in resource_spans.get("scopeSpans", []):
+            for span in scope_spans.get("spans", []):
+              lines.append(json.dumps({"resource": resource, **span}))
+        with lock, open(output, "a", encoding="utf-8") as f:
+          f.writelines(line + "\n" for line in lines)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(b"{}")
+
+      def log_message(self, format, *args):
+        stdout.write(f"{self.address_string()} {format % args}")
+
+    server = ThreadingHTTPServer((options["host"], options["port"]), Handler)
+    self.stdout.write(self.style.SUCCESS(f"Collecting traces on http://{options['host']}:{options['port']} into {output}"))
+    try:
+      server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      server.server_close()
@@ -0,0 +1,382 @@
+"""Prometheus metrics that add up across worker processes.
+
+Each process counts in memory. Web workers, which gunicorn.conf.py marks
+with start_worker(), also write a snapshot of their values to
+METRICS_DIR/<pid>-<start>.json: after a request at most every
+METRICS_FLUSH_SECONDS, and again when gunicorn stops them. Other processes
+(manage.py commands, cron jobs, benchmarks, the dev server) write nothing,
+so they cannot add their own traffic to the totals. The /metrics view
+flushes its own worker, then sums the snapshots of all of them. The numbers
+therefore cover every gunicorn/uvicorn worker, whichever one answers the
+scrape; the others are at most METRICS_FLUSH_SECONDS behind. Counters and
+histograms of exited workers are folded into METRICS_DIR/exited.json, so
+they never go backwards and the directory holds one file per running worker
+plus that one. Gauges are only summed over running workers. gunicorn.conf.py
+empties the directory when the server starts.
+
+Metrics are declared here, in one place, so every worker can render HELP and
+TYPE lines for all of them:
+
+    DONATIONS.inc_on_commit(event="created")
+    REQUEST_DURATION.observe(0.042, view="campaigns:list", method="GET", status=200)
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# Prometheus' default buckets, for durations in seconds.
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 100, 200)
+
+_lock = threading.Lock()
+_values: dict[tuple[str, tuple[str, ...]], float | list[float]] = {}
+_registry: dict[str, Metric] = {}
+_pid = os.getpid()
+_snapshot_name = f"{_pid}-{time.time_ns()}.json"
+_last_flush = 0.0
+_worker = False
+_EXITED = "exited.json"
+
+
+def _reset_after_fork() -> None:
+  # A forked worker must not report (and write under the name of) its parent's values.
+  global _pid, _snapshot_name, _last_flush
+  if os.getpid() != _pid:
+    _pid = os.getpid()
+    _snapshot_name = f"{_pid}-{time.time_ns()}.json"
+    _last_flush = 0.0
+    _values.clear()
+
+
+class Metric:
+  type = ""
+
+  def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = labelnames
+    _registry[name] = self
+
+  def _key(self, labels: dict) -> tuple[str, tuple[str, ...]]:
+    return self.name, tuple(str(labels[label]) for label in self.labelnames)
+
+
+class Counter(Metric):
+  type = "counter"
+
+  def inc(self, amount: float = 1, **labels) -> None:
+    key = self._key(labels)
+    with _lock:
+      _reset_after_fork()
+      _values[key] = _values.get(key, 0) + amount
+
+  def inc_on_commit(self, amount: float = 1, **labels) -> None:
+    """Count once the current transaction commits (right away outside one)."""
+    if amount:
+      transaction.on_commit(partial(self.inc, amount, **labels))
+
+
+class Gauge(Metric):
+  type = "gauge"
+
+  def set(self, value: float, **labels) -> None:
+    key = self._key(labels)
+    with _lock:
+      _reset_after_fork()
+      _values[key] = value
+
+
+class Histogram(Metric):
+  type = "histogram"
+
+  def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=TIME_BUCKETS):
+    super().__init__(name, documentation, labelnames)
+    self.buckets = tuple(buckets)
+
+  def observe(self, value: float, **labels) -> None:
+    key = self._key(labels)
+    with _lock:
+      _reset_after_fork()
+      # Per-bucket (not cumulative) counts, the +Inf bucket, then the sum.
+      data = _values.get(key)
+      if data is None:
+        data = _values[key] = [0] * (len(self.buckets) + 2)
+      data[bisect_left(self.buckets, value)] += 1
+      data[-1] += value
+
+
+# HTTP, DB, cache and templates
+
+REQUEST_DURATION = Histogram(
+  "http_request_duration_seconds",
+  "Time to serve a request, by URL name, method and status.",
+  ("view", "method", "status"),
+)
+DB_QUERIES = Histogram("db_queries_per_request", "SQL queries run by one request.", ("view",), COUNT_BUCKETS)
+DB_TIME = Histogram("db_time_per_request_seconds", "Time one request spent in SQL queries.", ("view",))
+CACHE_LOOKUPS = Counter(
+  "cache_lookups_total",
+  "cached_query lookups by namespace and result (hit, stale or miss).",
+  ("namespace", "result"),
+)
+TEMPLATE_RENDER = Histogram("template_render_seconds", "Time to render a template.", ("template",))
+
+# Database connection pools (DATABASE_URL ?pool=true; see core.database_url)
+
+DB_POOL_CONNECTIONS = Gauge(
+  "db_pool_connections",
+  "Pooled connections: open (size) and idle (available), and the pool's min and max, by database alias.",
+  ("alias", "state"),
+)
+DB_POOL_WAITING = Gauge("db_pool_requests_waiting", "Requests waiting for a pooled connection.", ("alias",))
+DB_POOL_REQUESTS = Counter("db_pool_requests_total", "Connections handed out by the pool.", ("alias",))
+DB_POOL_WAIT = Counter("db_pool_wait_seconds_total", "Time spent waiting for a pooled connection.", ("alias",))
+DB_POOL_CONNECTS = Counter("db_pool_connects_total", "Connections opened by the pool.", ("alias",))
+DB_POOL_ERRORS = Counter(
+  "db_pool_errors_total",
+  "Pool failures: timeouts waiting for a connection, failed connection attempts, "
+  "connections found broken by health checks and broken connections given back.",
+  ("alias", "kind"),
+)
+
+# Business events
+
+DONATIONS = Counter("donations_total", "Donation requests created, approved and rejected.", ("event",))
+GROUP_MESSAGES = Counter("group_messages_posted_total", "Messages posted in donor groups.")
+NOTIFICATIONS = Counter("notifications_sent_total", "Notifications delivered (created or coalesced), by kind.", ("kind",))
+
+
+def _record_pools() -> None:
+  for alias in connections:
+    if not connections.settings[alias].get("OPTIONS", {}).get("pool"):
+      continue
+    pool = connections[alias].pool
+    # pop_stats() resets the counters, so each flush adds what happened since the last one.
+    stats = pool.pop_stats()
+    for state in ("size", "available", "min", "max"):
+      DB_POOL_CONNECTIONS.set(stats.get(f"pool_{state}", 0), alias=alias, state=state)
+    DB_POOL_WAITING.set(stats.get("requests_waiting", 0), alias=alias)
+    DB_POOL_REQUESTS.inc(stats.get("requests_num", 0), alias=alias)
+    DB_POOL_WAIT.inc(stats.get("requests_wait_ms", 0) / 1000, alias=alias)
+    DB_POOL_CONNECTS.inc(stats.get("connections_num", 0), alias=alias)
+    for kind, key in (
+      ("timeout", "requests_errors"),
+      ("connect", "connections_errors"),
+      ("lost", "connections_lost"),
+      ("returned_bad", "returns_bad"),
+    ):
+      DB_POOL_ERRORS.inc(stats.get(key, 0), alias=alias, kind=kind)
+
+
+def start_worker() -> None:
+  """Mark this process as a web worker, whose values flush() writes to METRICS_DIR."""
+  global _worker
+  _worker = True
+
+
+def _rows() -> list[list]:
+  with _lock:
+    _reset_after_fork()
+    return [[name, list(labels), value] for (name, labels), value in _values.items()]
+
+
+def _write(path: Path, rows: list[list]) -> None:
+  fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+  with os.fdopen(fd, "w") as f:
+    json.dump(rows, f)
+  os.replace(tmp, path)
+
+
+def flush(force: bool = False) -> None:
+  """Write a web worker's values to its snapshot file (throttled unless `force`)."""
+  global _last_flush
+  now = time.monotonic()
+  if not _worker or (not force and now - _last_flush < settings.METRICS_FLUSH_SECONDS):
+    return
+  _last_flush = now
+  _record_pools()
+  rows = _rows()
+  if not rows:
+    return
+
+  root = Path(settings.METRICS_DIR)
+  try:
+    root.mkdir(parents=True, exist_ok=True)
+    _write(root / _snapshot_name, rows)
+  except OSError:
+    logger.exception("Could not write the metrics snapshot to %s", root)
+
+
+def _running(snapshot: Path) -> bool:
+  try:
+    os.kill(int(snapshot.stem.split("-")[0]), 0)
+  except ProcessLookupError:
+    return False
+  except (ValueError, PermissionError):
+    pass
+  return True
+
+
+def _read(path: Path) -> list[list] | None:
+  try:
+    return json.loads(path.read_text())
+  except (OSError, ValueError):
+    return None  # gone, or a worker replacing its snapshot right now
+
+
+def _add(merged: dict, rows: list[list], skip: set[str] = frozenset()) -> None:
+  for name, labels, value in rows:
+    if name in skip:
+      continue
+    key = (name, tuple(labels))
+    current = merged.get(key)
+    if current is None:
+      merged[key] = value
+    elif isinstance(value, list):
+      if len(value) == len(current):
+        merged[key] = [a + b for a, b in zip(current, value)]
+    else:
+      merged[key] = current + value
+
+
+@contextmanager
+def _exclusive(root: Path):
+  # Only web workers get here, and gunicorn only runs on POSIX.
+  import fcntl
+
+  with open(root / ".lock", "a") as f:
+    fcntl.flock(f, fcntl.LOCK_EX)
+    yield
+
+
+def _fold_exited(root: Path, gauges: set[str]) -> None:
+  """Add the snapshots of exited workers, minus their gauges, to exited.json and remove them."""
+  exited = [path for path in root.glob("*.json") if path.name != _EXITED and not _running(path)]
+  if not exited:
+    return
+  merged = {}
+  _add(merged, _read(root / _EXITED) or [])
+  folded = []
+  for path in exited:
+    rows = _read(path)
+    if rows is not None:
+      _add(merged, rows, skip=gauges)
+      folded.append(path)
+  _write(root / _EXITED, [[name, list(labels), value] for (name, labels), value in merged.items()])
+  for path in folded:
+    path.unlink(missing_ok=True)
+
+
+def _sum_snapshots(root: Path, gauges: set[str], merged: dict) -> None:
+  for path in root.glob("*.json"):
+    _add(merged, _read(path) or [], skip=set() if _running(path) else gauges)
+
+
+def collect() -> dict[tuple[str, tuple[str, ...]], float | list[float]]:
+  """The values of every worker, summed (gauges: of the running ones)."""
+  flush(force=True)
+  gauges = {name for name, metric in _registry.items() if isinstance(metric, Gauge)}
+  root = Path(settings.METRICS_DIR)
+  merged = {}
+  if _worker:
+    root.mkdir(parents=True, exist_ok=True)
+    # Workers answering scrapes at the same time take turns, so none sees an
+    # exited worker's values both in its snapshot and in exited.json.
+    with _exclusive(root):
+      _fold_exited(root, gauges)
+      _sum_snapshots(root, gauges, merged)
+  else:
+    # Not a web worker: its own values were never written out.
+    _record_pools()
+    _add(merged, _rows())
+    _sum_snapshots(root, gauges, merged)
+  return merged
+
+
+def _escape(value: str) -> str:
+  return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: tuple[str, str] | None = None) -> str:
+  pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+  if extra:
+    pairs.append(f'{extra[0]}="{extra[1]}"')
+  return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+  """All metrics in the Prometheus text exposition format."""
+  values = collect()
+  lines = []
+  for metric in _registry.values():
+    lines.append(f"# HELP {metric.name} {metric.documentation}")
+    lines.append(f"# TYPE {metric.name} {metric.type}")
+    samples = sorted((labels, value) for (name, labels), value in values.items() if name == metric.name)
+    for labels, value in samples:
+      if isinstance(metric, Histogram):
+        if len(value) != len(metric.buckets) + 2:
+          continue  # written with other buckets by an older release
+        cumulative = 0
+        for bound, count in zip((*metric.buckets, "+Inf"), value[:-1]):
+          cumulative += count
+          lines.append(f"{metric.name}_bucket{_labels(metric.labelnames, labels, ('le', str(bound)))} {cumulative}")
+        lines.append(f"{metric.name}_sum{_labels(metric.labelnames, labels)} {_number(value[-1])}")
+        lines.append(f"{metric.name}_count{_labels(metric.labelnames, labels)} {cumulative}")
+      else:
+        lines.append(f"{metric.name}{_labels(metric.labelnames, labels)} {_number(value)}")
+  return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+  sync_capable = async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.async_mode = iscoroutinefunction(get_response)
+    if self.async_mode:
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if self.async_mode:
+      return self.__acall__(request)
+    start = time.perf_counter()
+    response = self.get_response(request)
+    self._record(request, response, time.perf_counter() - start)
+    return response
+
+  async def __acall__(self, request):
+    start = time.perf_counter()
+    response = await self.get_response(request)
+    self._record(request, response, time.perf_counter() - start)
+    return response
+
+  def _record(self, request, response, duration: float) -> None:
+    match = getattr(request, "resolver_match", None)
+    # URL names, not paths, so the number of series stays bounded.
+    view = match.view_name if match else "<unresolved>"
+    REQUEST_DURATION.observe(duration, view=view, method=request.method, status=response.status_code)
+    recorder = getattr(request, "query_recorder", None)
+    if recorder is not None:
+      DB_QUERIES.observe(recorder.count, view=view)
+      DB_TIME.observe(recorder.duration, view=view)
+    flush()
@@ -0,0 +1,279 @@
+"""Sampled request profiling, aggregated per URL name.
+
+ProfilingMiddleware runs a random PROFILING_SAMPLE_RATE fraction of requests
+under cProfile and, with PROFILING_TRACEMALLOC, tracemalloc. When the rate is
+0 the middleware removes itself at startup (MiddlewareNotUsed), and a request
+that is not sampled costs one random() call.
+
+Samples are merged into one pstats file plus a small JSON summary per URL
+name under PROFILING_DIR. A store holds at most PROFILING_MAX_VIEWS names;
+the least recently sampled ones are dropped first, so the directory stays
+bounded however long it runs. Writes go through a temporary file and
+os.replace. Two processes merging the same view at the same moment can
+lose one of the two samples, which is fine for statistics. Staff browse the
+hot functions at /admin/profiles/ (core.views).
+
+Under ASGI with async views, a sample covers the event loop while the
+request is awaited, so it also contains whatever other requests the loop
+ran meanwhile; work handed to threads (the async ORM, core.asyncdb) only
+shows up as the time spent waiting for it.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import logging
+import os
+import pstats
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+logger = logging.getLogger(__name__)
+
+SORT_KEYS = ("cumulative", "tottime", "calls")
+ALLOCATION_SITES = 50
+
+# cProfile (sys.monitoring based since Python 3.12) and tracemalloc are
+# process-wide, so only one request per process is profiled at a time; a
+# sampled request arriving meanwhile just runs unprofiled.
+_profiling = threading.Lock()
+
+
+def _file_name(view_name: str) -> str:
+  return re.sub(r"[^\w.-]", "_", view_name)
+
+
+def _short_function(func: tuple[str, int, str]) -> str:
+  """pstats' "file:line(name)" with the file relative to its sys.path entry."""
+  filename, lineno, name = func
+  for root in sorted((p for p in sys.path if p), key=len, reverse=True):
+    if filename.startswith(root + os.sep):
+      filename = filename[len(root) + 1 :]
+      break
+  return pstats.func_std_string((filename, lineno, name))
+
+
+@dataclass(frozen=True)
+class FunctionStats:
+  function: str
+  calls: int
+  tottime: float
+  cumtime: float
+
+
+class ProfileStore:
+  def __init__(self, root: str | Path, max_views: int):
+    self.root = Path(root)
+    self.max_views = max_views
+    self._lock = threading.Lock()
+
+  def _paths(self, view_name: str) -> tuple[Path, Path]:
+    base = self.root / _file_name(view_name)
+    return base.with_suffix(".prof"), base.with_suffix(".json")
+
+  def _write(self, path: Path, write) -> None:
+    fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+    os.close(fd)
+    try:
+      write(tmp)
+      os.replace(tmp, path)
+    except BaseException:
+      Path(tmp).unlink(missing_ok=True)
+      raise
+
+  def add(
+    self,
+    view_name: str,
+    profile: cProfile.Profile,
+    seconds: float,
+    peak_bytes: int | None = None,
+    allocations: list[tuple[str, int, int]] = (),
+  ) -> None:
+    self.root.mkdir(parents=True, exist_ok=True)
+    prof_path, meta_path = self._paths(view_name)
+    with self._lock:
+      stats = pstats.Stats(profile)
+      if prof_path.exists():
+        try:
+          stats.add(str(prof_path))
+        except (OSError, EOFError, ValueError, TypeError):
+          pass  # a torn or foreign file; start over from this sample
+
+      summary = self.summary(view_name) or {
+        "view": view_name,
+        "samples": 0,
+        "seconds": 0.0,
+        "peak_bytes": 0,
+        "allocations": {},
+      }
+      summary["samples"] += 1
+      summary["seconds"] += seconds
+      summary["last_sampled"] = time.time()
+      if peak_bytes is not None:
+        summary["peak_bytes"] = max(summary["peak_bytes"], peak_bytes)
+      sites = summary["allocations"]
+      for site, size, count in allocations:
+        total_size, total_count = sites.get(site, (0, 0))
+        sites[site] = (total_size + size, total_count + count)
+      summary["allocations"] = dict(sorted(sites.items(), key=lambda item: -item[1][0])[:ALLOCATION_SITES])
+
+      self._write(prof_path, stats.dump_stats)
+      self._write(meta_path, lambda tmp: Path(tmp).write_text(json.dumps(summary)))
+      self._evict()
+
+  def _evict(self) -> None:
+    summaries = self.views()
+    for summary in sorted(summaries, key=lambda s: s.get("last_sampled", 0))[: max(0, len(summaries) - self.max_views)]:
+      self.clear(summary["view"])
+
+  def summary(self, view_name: str) -> dict | None:
+    try:
+      return json.loads(self._paths(view_name)[1].read_text())
+    except (OSError, ValueError):
+      return None
+
+  def views(self) -> list[dict]:
+    """Summaries of every profiled view, the most time-consuming first."""
+    if not self.root.is_dir():
+      return []
+    summaries = []
+    for path in self.root.glob("*.json"):
+      try:
+        summaries.append(json.loads(path.read_text()))
+      except (OSError, ValueError):
+        continue
+    return sorted(summaries, key=lambda s: -s["seconds"])
+
+  def top_functions(self, view_name: str, sort: str = "cumulative", limit: int = 50) -> list[FunctionStats]:
+    prof_path = self._paths(view_name)[0]
+    try:
+      stats = pstats.Stats(str(prof_path))
+    except (OSError, EOFError, ValueError, TypeError):
+      return []
+    rows = [
+      FunctionStats(_short_function(func), calls, tottime, cumtime)
+      for func, (_primitive, calls, tottime, cumtime, _callers) in stats.stats.items()
+    ]
+    key = {"tottime": lambda r: r.tottime, "calls": lambda r: r.calls}.get(sort, lambda r: r.cumtime)
+    return sorted(rows, key=key, reverse=True)[:limit]
+
+  def clear(self, view_name: str | None = None) -> None:
+    names = [view_name] if view_name else [s["view"] for s in self.views()]
+    for name in names:
+      for path in self._paths(name):
+        path.unlink(missing_ok=True)
+
+
+_store: ProfileStore | None = None
+
+
+def get_store() -> ProfileStore:
+  global _store
+  if _store is None:
+    _store = ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_VIEWS)
+  return _store
+
+
+def _allocation_sites(snapshot: tracemalloc.Snapshot) -> list[tuple[str, int, int]]:
+  snapshot = snapshot.filter_traces(
+    [
+      tracemalloc.Filter(False, tracemalloc.__file__),
+      tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ]
+  )
+  return [
+    (f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", stat.size, stat.count)
+    for stat in snapshot.statistics("lineno")[:ALLOCATION_SITES]
+  ]
+
+
+@dataclass
+class _Sample:
+  profile: cProfile.Profile = field(default_factory=cProfile.Profile)
+  seconds: float = 0.0
+  peak_bytes: int | None = None
+  allocations: list[tuple[str, int, int]] = field(default_factory=list)
+
+
+class ProfilingMiddleware:
+  sync_capable = async_capable = True
+
+  def __init__(self, get_response):
+    if settings.PROFILING_SAMPLE_RATE <= 0:
+      raise MiddlewareNotUsed
+    self.get_response = get_response
+    self.rate = settings.PROFILING_SAMPLE_RATE
+    self.tracemalloc = settings.PROFILING_TRACEMALLOC
+    self.async_mode = iscoroutinefunction(get_response)
+    if self.async_mode:
+      markcoroutinefunction(self)
+
+  def _sampled(self) -> bool:
+    return random.random() < self.rate and _profiling.acquire(blocking=False)
+
+  @contextmanager
+  def _profiled(self):
+    """Profile the block into the yielded _Sample; releases `_profiling` at exit."""
+    try:
+      trace = self.tracemalloc and not tracemalloc.is_tracing()
+      if trace:
+        tracemalloc.start()
+      sample = _Sample()
+      start = time.perf_counter()
+      try:
+        sample.profile.enable()
+        try:
+          yield sample
+        finally:
+          sample.profile.disable()
+        sample.seconds = time.perf_counter() - start
+        if trace:
+          sample.peak_bytes = tracemalloc.get_traced_memory()[1]
+          sample.allocations = _allocation_sites(tracemalloc.take_snapshot())
+      finally:
+        if trace:
+          tracemalloc.stop()
+    finally:
+      _profiling.release()
+
+  def __call__(self, request):
+    if self.async_mode:
+      return self.__acall__(request)
+    if not self._sampled():
+      return self.get_response(request)
+    with self._profiled() as sample:
+      response = self.get_response(request)
+    self._store(request, sample)
+    return response
+
+  async def __acall__(self, request):
+    if not self._sampled():
+      return await self.get_response(request)
+    with self._profiled() as sample:
+      response = await self.get_response(request)
+    self._store(request, sample)
+    return response
+
+  def _store(self, request, sample: _Sample) -> None:
+    match = getattr(request, "resolver_match", None)
+    if match and match.app_name == "core":
+      return  # browsing the reports should not evict what they report on
+    try:
+      get_store().add(
+        match.view_name if match else "<unresolved>", sample.profile, sample.seconds, sample.peak_bytes, sample.allocations
+      )
+    except OSError:
+      logger.exception("Could not store the profile of %s", request.path)
@@ -0,0 +1,198 @@
+"""Per-request query accounting and budgets.
+
+QueryBudgetMiddleware records every query of a request: count, total DB
+time and how often each SQL fingerprint (the statement with literals,
+numbers and IN lists normalized) ran. A fingerprint repeated many times is
+the signature of an N+1 loop. Recording is a core.sqlhooks hook, so queries
+an async view runs in worker threads count too. Statements on database
+cache tables (CACHE_URL=db://) are left out: they are the cache's traffic,
+not the view's queries, and a cold cache would otherwise break every budget.
+
+Budgets are declared on URL patterns by wrapping the view:
+
+    path("", query_budget(views.campaign_list, queries=12), name="list")
+
+Views without one only get the repeat check (QUERY_BUDGET_MAX_REPEATS). In
+DEBUG the numbers go to a `Server-Timing` header (browser dev tools show
+them next to the request), otherwise to the `core.querybudget` log.
+Violations are logged as warnings, and raise QueryBudgetExceeded when
+QUERY_BUDGET_STRICT is set, which is how tests make an over-budget view fail.
+`assert_query_budget` does the same around arbitrary code in tests. The
+recorder stays on `request.query_recorder` for core.metrics.
+"""
+
+from __future__ import annotations
+
+import functools
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .sqlhooks import sql_hook
+
+logger = logging.getLogger(__name__)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\bIN \((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_SPACE_RE = re.compile(r"\s+")
+_DATABASE_CACHE = "django.core.cache.backends.db.DatabaseCache"
+
+# Transaction bookkeeping repeats legitimately and is not a query to budget.
+_IGNORED_PREFIXES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT", "BEGIN", "COMMIT")
+
+
+class QueryBudgetExceeded(AssertionError):
+  pass
+
+
+def fingerprint(sql: str) -> str:
+  sql = _STRING_RE.sub("?", sql)
+  sql = _IN_LIST_RE.sub("IN (...)", sql)
+  sql = _NUMBER_RE.sub("?", sql)
+  return _SPACE_RE.sub(" ", sql).strip()
+
+
+@functools.cache
+def _cache_table_re() -> re.Pattern | None:
+  tables = [c["LOCATION"] for c in settings.CACHES.values() if c["BACKEND"] == _DATABASE_CACHE]
+  if not tables:
+    return None
+  # DatabaseCache always quotes its table name.
+  return re.compile(r"[\"`](?:%s)[\"`]" % "|".join(map(re.escape, tables)))
+
+
+def _is_cache_query(sql: str) -> bool:
+  pattern = _cache_table_re()
+  return pattern is not None and pattern.search(sql) is not None
+
+
+class QueryRecorder:
+  """An SQL hook collecting count, time and fingerprints (thread-safe)."""
+
+  def __init__(self):
+    self.count = 0
+    self.duration = 0.0
+    self.fingerprints = Counter()
+    self._lock = threading.Lock()
+
+  def __call__(self, execute, sql, params, many, context):
+    if _is_cache_query(sql):
+      return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+      return execute(sql, params, many, context)
+    finally:
+      elapsed = time.perf_counter() - start
+      counted = not sql.lstrip().upper().startswith(_IGNORED_PREFIXES)
+      key = fingerprint(sql) if counted else None
+      with self._lock:
+        self.duration += elapsed
+        if counted:
+          self.count += 1
+          self.fingerprints[key] += 1
+
+  def repeated(self, limit: int) -> list[tuple[str, int]]:
+    return [(sql, n) for sql, n in self.fingerprints.most_common() if n > limit]
+
+
+@contextmanager
+def record_queries():
+  """Record the queries run on every database inside the block, in any thread it hands work to."""
+  recorder = QueryRecorder()
+  with sql_hook(recorder):
+    yield recorder
+
+
+@dataclass(frozen=True)
+class Budget:
+  queries: int | None = None
+  repeats: int | None = None
+
+  def violations(self, recorder: QueryRecorder) -> list[str]:
+    problems = []
+    if self.queries is not None and recorder.count > self.queries:
+      problems.append(f"{recorder.count} queries (budget {self.queries})")
+    limit = self.repeats if self.repeats is not None else settings.QUERY_BUDGET_MAX_REPEATS
+    for sql, n in recorder.repeated(limit):
+      problems.append(f"{n}x {sql[:200]}")
+    return problems
+
+
+def query_budget(view, queries: int | None = None, repeats: int | None = None):
+  """Wrap `view` for a URL pattern with a per-request query budget."""
+
+  if iscoroutinefunction(view):
+
+    @functools.wraps(view)
+    async def wrapper(*args, **kwargs):
+      return await view(*args, **kwargs)
+
+  else:
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      return view(*args, **kwargs)
+
+  wrapper.query_budget = Budget(queries, repeats)
+  return wrapper
+
+
+@contextmanager
+def assert_query_budget(queries: int | None = None, repeats: int | None = None):
+  """Fail with QueryBudgetExceeded if the block exceeds the budget (for tests)."""
+  with record_queries() as recorder:
+    yield recorder
+  problems = Budget(queries, repeats).violations(recorder)
+  if problems:
+    raise QueryBudgetExceeded("Query budget exceeded: " + "; ".join(problems))
+
+
+class QueryBudgetMiddleware:
+  sync_capable = async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    self.async_mode = iscoroutinefunction(get_response)
+    if self.async_mode:
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if self.async_mode:
+      return self.__acall__(request)
+    with record_queries() as recorder:
+      request.query_recorder = recorder
+      response = self.get_response(request)
+    return self._check(request, response, recorder)
+
+  async def __acall__(self, request):
+    with record_queries() as recorder:
+      request.query_recorder = recorder
+      response = await self.get_response(request)
+    return self._check(request, response, recorder)
+
+  def _check(self, request, response, recorder: QueryRecorder):
+    match = getattr(request, "resolver_match", None)
+    view = match.func if match else None
+    budget = getattr(view, "query_budget", None) or Budget()
+    problems = budget.violations(recorder)
+    label = match.view_name if match else request.path
+    duration_ms = recorder.duration * 1000
+
+    if settings.DEBUG:
+      response["Server-Timing"] = f'db;dur={duration_ms:.1f};desc="{recorder.count} queries"'
+    else:
+      logger.info("%s %s: %d queries, %.1f ms", request.method, label, recorder.count, duration_ms)
+
+    if problems:
+      logger.warning("Query budget exceeded in %s: %s", label, "; ".join(problems))
+      if settings.QUERY_BUDGET_STRICT:
+        raise QueryBudgetExceeded(f"Query budget exceeded in {label}: " + "; ".join(problems))
+    return response
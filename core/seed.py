@@ -0,0 +1,394 @@
+"""Synthetic data for load testing (`manage.py seed_bulk`).
+
+Everything is drawn from one `random.Random(seed)` and time offsets from a
+fixed anchor (DEFAULT_ANCHOR unless `--anchor` is given), so the same options
+produce the same rows on any day. Campaigns end at most 120 days after the
+anchor; pass a recent `--anchor` for a dataset with open campaigns. Popularity is
+skewed the way real traffic is: campaigns, donors, groups and message senders
+are picked with Zipf weights (rank r has weight 1 / r**s), so a few campaigns
+get most donations and most groups are small.
+
+Rows are written with bulk_create in batches, one transaction per batch. The
+three high-volume tables (donations, group messages, notifications) skip the
+ORM instead: preparing each value through the model fields is most of
+bulk_create's cost, so they go in as plain tuples through executemany on
+SQLite and COPY on PostgreSQL, which is what makes 10M donations a matter of
+minutes. Signals do not fire for bulk inserts, so denormalized data (profiles, unread
+counters, group member counts and contribution stats, campaign statuses) is
+filled in directly or rebuilt at the end.
+"""
+
+from __future__ import annotations
+
+import io
+import random
+from bisect import bisect_right
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate, batched
+
+from django.contrib.auth import get_user_model
+from django.db import connection, models, transaction
+from django.db.models.functions import Coalesce
+from django.utils.text import slugify
+
+from campaigns.models import Campaign, Category, Tag
+from donations.models import Donation
+from groups.models import DonorGroup, GroupMembership, GroupMessage
+from groups.stats import rebuild_group_stats
+from user.models import Notification, Profile
+from user.notifications import reconcile_unread_counts
+
+CATEGORY_NAMES = [
+  "Education", "Medical", "Emergency", "Environment", "Animals",
+  "Community", "Children", "Elderly", "Disaster relief", "Arts",
+]
+WORDS = (
+  "clean water school books surgery flood relief village bridge library meals clinic scholarship "
+  "shelter trees river ocean wheelchair hospital orphans students farmers rice housing solar "
+  "internet laptops teachers vaccines blankets winter storm recovery rebuild garden music sports"
+).split()
+AMOUNTS = [10_000, 20_000, 50_000, 100_000, 200_000, 500_000, 1_000_000, 5_000_000]
+AMOUNT_WEIGHTS = [8, 14, 25, 22, 14, 10, 5, 2]
+NOTIFICATION_KINDS = [kind for kind, _label in Notification.KIND_CHOICES]
+
+DEFAULT_ANCHOR = datetime(2025, 1, 1, tzinfo=UTC)
+
+# Unusable (starts with "!") but fixed, so seeding stays deterministic and skips hashing.
+SEED_PASSWORD = "!seeded"
+
+
+@dataclass
+class SeedOptions:
+  users: int = 10_000
+  campaigns: int = 2_000
+  donations: int = 200_000
+  groups: int = 500
+  messages: int = 50_000
+  notifications: int = 50_000
+  tags: int = 300
+  seed: int = 1
+  zipf: float = 1.1
+  batch_size: int = 5_000
+  prefix: str = "seed"
+  anchor: datetime = DEFAULT_ANCHOR
+
+
+class ZipfPicker:
+  """Picks items with weight 1 / rank**s after shuffling which item gets which rank."""
+
+  def __init__(self, rng: random.Random, items: list, s: float):
+    self.rng = rng
+    self.items = list(items)
+    rng.shuffle(self.items)
+    self.cum_weights = list(accumulate(1.0 / (rank**s) for rank in range(1, len(self.items) + 1)))
+    self.total = self.cum_weights[-1]
+
+  def pick(self):
+    return self.items[bisect_right(self.cum_weights, self.rng.random() * self.total)]
+
+
+@contextmanager
+def _explicit_timestamps(*fields):
+  """Let bulk_create keep our created_at values instead of auto_now_add's now()."""
+  saved = [(field, field.auto_now_add) for field in fields]
+  for field, _auto in saved:
+    field.auto_now_add = False
+  try:
+    yield
+  finally:
+    for field, auto in saved:
+      field.auto_now_add = auto
+
+
+def _insert(model, rows: Iterator, batch_size: int) -> int:
+  written = 0
+  for batch in batched(rows, batch_size):
+    with transaction.atomic():
+      model.objects.bulk_create(batch, batch_size=batch_size)
+    written += len(batch)
+  return written
+
+
+def _insert_returning_ids(model, rows: Iterator, batch_size: int) -> list[int]:
+  # SQLite 3.35+ and PostgreSQL return the new primary keys from bulk_create.
+  ids = []
+  for batch in batched(rows, batch_size):
+    with transaction.atomic():
+      ids.extend(obj.pk for obj in model.objects.bulk_create(batch, batch_size=batch_size))
+  return ids
+
+
+def _copy_text(value) -> str:
+  if value is None:
+    return "\\N"
+  if isinstance(value, bool):
+    return "t" if value else "f"
+  return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _copy_rows(model, columns: list[str], rows: Iterator[tuple], batch_size: int) -> int:
+  """Insert tuples of already database-ready values for `columns` (field names)."""
+  table = connection.ops.quote_name(model._meta.db_table)
+  column_sql = ", ".join(connection.ops.quote_name(model._meta.get_field(name).column) for name in columns)
+  insert_sql = f"INSERT INTO {table} ({column_sql}) VALUES ({', '.join(['%s'] * len(columns))})"
+  copy_sql = f"COPY {table} ({column_sql}) FROM STDIN"
+
+  written = 0
+  for batch in batched(rows, batch_size):
+    with transaction.atomic(), connection.cursor() as cursor:
+      if connection.vendor != "postgresql":
+        cursor.executemany(insert_sql, batch)
+      elif hasattr(cursor.cursor, "copy"):  # psycopg 3
+        with cursor.cursor.copy(copy_sql) as copy:
+          for row in batch:
+            copy.write_row(row)
+      else:  # psycopg2
+        text = "".join("\t".join(map(_copy_text, row)) + "\n" for row in batch)
+        cursor.cursor.copy_expert(copy_sql, io.StringIO(text))
+    written += len(batch)
+  return written
+
+
+class Seeder:
+  def __init__(self, options: SeedOptions, log: Callable[[str], None] = lambda message: None):
+    self.o = options
+    self.log = log
+    self.rng = random.Random(options.seed)
+    self.naive_datetimes = connection.vendor == "sqlite"
+    self.anchor = options.anchor.astimezone(UTC)
+
+  def _ago(self, max_days: float) -> datetime:
+    return self.anchor - timedelta(seconds=self.rng.random() * max_days * 86400)
+
+  def _db_datetime(self, value: datetime):
+    # What DateTimeField sends for the UTC datetimes generated here: naive
+    # text on SQLite, the aware value elsewhere. Inlined because
+    # connection.ops.adapt_datetimefield_value costs more than the insert.
+    return str(value.replace(tzinfo=None)) if self.naive_datetimes else value
+
+  def run(self) -> dict[str, int]:
+    counts = {}
+    with _explicit_timestamps(
+      Campaign._meta.get_field("created_at"),
+      DonorGroup._meta.get_field("created_at"),
+      GroupMembership._meta.get_field("joined_at"),
+      Profile._meta.get_field("created_at"),
+    ):
+      counts["users"] = self.seed_users()
+      counts["campaigns"] = self.seed_campaigns()
+      counts["groups"], counts["memberships"] = self.seed_groups()
+      counts["donations"] = self.seed_donations()
+      counts["messages"] = self.seed_messages()
+      counts["notifications"] = self.seed_notifications()
+    self.finish()
+    return counts
+
+  def seed_users(self) -> int:
+    o, rng = self.o, self.rng
+    User = get_user_model()
+    joined = [self._ago(730) for _ in range(o.users)]
+    users = (
+      User(
+        username=f"{o.prefix}_{i}",
+        email=f"{o.prefix}_{i}@example.com",
+        password=SEED_PASSWORD,
+        date_joined=joined[i],
+      )
+      for i in range(o.users)
+    )
+    self.user_ids = _insert_returning_ids(User, users, o.batch_size)
+    self.fundraiser_ids = [uid for uid in self.user_ids if rng.random() < 0.05] or self.user_ids[:1]
+    fundraisers = set(self.fundraiser_ids)
+    profiles = (
+      Profile(
+        user_id=uid,
+        can_fundraise=uid in fundraisers,
+        full_name=f"Seed User {i}",
+        interests=" ".join(rng.sample(WORDS, 3)),
+        created_at=joined[i],
+      )
+      for i, uid in enumerate(self.user_ids)
+    )
+    _insert(Profile, profiles, o.batch_size)
+    self.log(f"{len(self.user_ids)} users")
+    return len(self.user_ids)
+
+  def seed_campaigns(self) -> int:
+    o, rng = self.o, self.rng
+    for name in CATEGORY_NAMES:
+      Category.objects.get_or_create(slug=slugify(name), defaults={"name": name})
+    tag_names = [f"{rng.choice(WORDS)} {i}" for i in range(o.tags)]
+    Tag.objects.bulk_create([Tag(name=name, slug=f"{o.prefix}-{i}") for i, name in enumerate(tag_names)], ignore_conflicts=True)
+    category_ids = list(Category.objects.order_by("id").values_list("id", flat=True))
+    tag_ids = list(Tag.objects.filter(slug__startswith=f"{o.prefix}-").order_by("id").values_list("id", flat=True))
+
+    today = self.anchor.date()
+    windows = []
+
+    def campaigns(owners):
+      for i in range(o.campaigns):
+        owners.append(rng.choice(self.fundraiser_ids))
+        created = self._ago(365)
+        end_date = created.date() + timedelta(days=rng.randint(14, 120))
+        windows.append((created, min(datetime.combine(end_date, datetime.max.time(), created.tzinfo), self.anchor)))
+        words = rng.sample(WORDS, 4)
+        yield Campaign(
+          created_by_id=owners[-1],
+          title=f"{words[0].title()} {words[1]} for {words[2]} #{i}",
+          description=" ".join(rng.choices(WORDS, k=60)),
+          goal_amount=Decimal(rng.choice([5, 10, 20, 50, 100, 500])) * 1_000_000,
+          end_date=end_date,
+          status=Campaign.STATUS_ACTIVE if end_date >= today else Campaign.STATUS_ENDED,
+          closed_at=None if end_date >= today else self.anchor,
+          created_at=created,
+        )
+
+    owners = []
+    self.campaign_ids = _insert_returning_ids(Campaign, campaigns(owners), o.batch_size)
+    self.campaign_windows = dict(zip(self.campaign_ids, windows))
+    self.campaign_owner = dict(zip(self.campaign_ids, owners))
+
+    tag_picker = ZipfPicker(rng, tag_ids, o.zipf)
+    category_links = (
+      Campaign.categories.through(campaign_id=cid, category_id=category_id)
+      for cid in self.campaign_ids
+      for category_id in rng.sample(category_ids, rng.randint(1, 2))
+    )
+    _insert(Campaign.categories.through, category_links, o.batch_size)
+    tag_links = (
+      Campaign.tags.through(campaign_id=cid, tag_id=tag_id)
+      for cid in self.campaign_ids
+      for tag_id in {tag_picker.pick() for _ in range(rng.randint(1, 5))}
+    )
+    _insert(Campaign.tags.through, tag_links, o.batch_size)
+    self.log(f"{len(self.campaign_ids)} campaigns")
+    return len(self.campaign_ids)
+
+  def seed_groups(self) -> tuple[int, int]:
+    o, rng = self.o, self.rng
+    owners = [rng.choice(self.user_ids) for _ in range(o.groups)]
+    groups = (
+      DonorGroup(name=f"{rng.choice(WORDS).title()} circle {i}", owner_id=owners[i], created_at=self._ago(500))
+      for i in range(o.groups)
+    )
+    self.group_ids = _insert_returning_ids(DonorGroup, groups, o.batch_size)
+
+    # Group sizes follow the same skew: a few large groups, a long tail of small ones.
+    self.group_members = {}
+    self.user_groups = {}
+    rows = []
+    for rank, (gid, owner) in enumerate(zip(self.group_ids, owners), start=1):
+      size = max(2, min(len(self.user_ids), int(500 / rank**o.zipf)))
+      members = {owner, *rng.sample(self.user_ids, size - 1)}
+      self.group_members[gid] = list(members)
+      for uid in members:
+        self.user_groups.setdefault(uid, []).append(gid)
+        role = GroupMembership.ROLE_LEADER if uid == owner else GroupMembership.ROLE_MEMBER
+        rows.append(GroupMembership(group_id=gid, user_id=uid, role=role, joined_at=self._ago(400)))
+    memberships = _insert(GroupMembership, iter(rows), o.batch_size)
+    DonorGroup.objects.filter(id__gte=self.group_ids[0], id__lte=self.group_ids[-1]).update(
+      member_count=models.Subquery(
+        GroupMembership.objects.filter(group_id=models.OuterRef("id"))
+        .order_by()
+        .values("group_id")
+        .annotate(n=models.Count("id"))
+        .values("n")
+      )
+    )
+    self.log(f"{len(self.group_ids)} groups, {memberships} memberships")
+    return len(self.group_ids), memberships
+
+  def seed_donations(self) -> int:
+    o, rng = self.o, self.rng
+    campaign_picker = ZipfPicker(rng, self.campaign_ids, o.zipf)
+    fundraisers = set(self.fundraiser_ids)
+    donor_picker = ZipfPicker(rng, [uid for uid in self.user_ids if uid not in fundraisers] or self.user_ids, o.zipf)
+    amount_cum = list(accumulate(AMOUNT_WEIGHTS))
+    amounts = [Decimal(amount) for amount in AMOUNTS]
+    columns = [
+      "campaign", "donor", "group", "amount", "is_anonymous", "display_name",
+      "status", "decided_by", "decided_at", "created_at",
+    ]
+
+    def donations():
+      for i in range(o.donations):
+        cid = campaign_picker.pick()
+        donor = donor_picker.pick()
+        start, end = self.campaign_windows[cid]
+        created = start + (end - start) * rng.random()
+        roll = rng.random()
+        status = Donation.STATUS_APPROVED if roll < 0.8 else Donation.STATUS_PENDING if roll < 0.92 else Donation.STATUS_REJECTED
+        groups = self.user_groups.get(donor)
+        decided = status != Donation.STATUS_PENDING
+        yield (
+          cid,
+          donor,
+          rng.choice(groups) if groups and rng.random() < 0.3 else None,
+          amounts[bisect_right(amount_cum, rng.random() * amount_cum[-1])],
+          rng.random() < 0.1,
+          "",
+          status,
+          self.campaign_owner[cid] if decided else None,
+          self._db_datetime(created + timedelta(hours=rng.random() * 48)) if decided else None,
+          self._db_datetime(created),
+        )
+        if i and i % 1_000_000 == 0:
+          self.log(f"  {i} donations")
+
+    written = _copy_rows(Donation, columns, donations(), o.batch_size)
+    self.log(f"{written} donations")
+    return written
+
+  def seed_messages(self) -> int:
+    o, rng = self.o, self.rng
+    group_picker = ZipfPicker(rng, self.group_ids, o.zipf)
+    messages = (
+      (gid, rng.choice(self.group_members[gid]), " ".join(rng.choices(WORDS, k=rng.randint(3, 25))), self._db_datetime(self._ago(365)))
+      for gid in (group_picker.pick() for _ in range(o.messages))
+    )
+    written = _copy_rows(GroupMessage, ["group", "sender", "content", "created_at"], messages, o.batch_size)
+    self.log(f"{written} group messages")
+    return written
+
+  def seed_notifications(self) -> int:
+    o, rng = self.o, self.rng
+    user_picker = ZipfPicker(rng, self.user_ids, o.zipf)
+    columns = ["user", "kind", "message", "url", "is_read", "coalesce_key", "count", "created_at"]
+    notifications = (
+      (
+        user_picker.pick(),
+        rng.choice(NOTIFICATION_KINDS),
+        f"Seeded notification {i}",
+        "",
+        rng.random() < 0.7,
+        "",
+        1,
+        self._db_datetime(self._ago(120)),
+      )
+      for i in range(o.notifications)
+    )
+    written = _copy_rows(Notification, columns, notifications, o.batch_size)
+    self.log(f"{written} notifications")
+    return written
+
+  def finish(self) -> None:
+    """Recompute what signals and the app's write paths would have maintained."""
+    raised = (
+      Donation.objects.filter(campaign_id=models.OuterRef("id"), status=Donation.STATUS_APPROVED)
+      .order_by()
+      .values("campaign_id")
+      .annotate(total=models.Sum("amount"))
+      .values("total")
+    )
+    seeded = Campaign.objects.filter(id__gte=self.campaign_ids[0], id__lte=self.campaign_ids[-1])
+    seeded.filter(status=Campaign.STATUS_ENDED).annotate(
+      raised=Coalesce(models.Subquery(raised), Decimal("0"))
+    ).filter(raised__gte=models.F("goal_amount")).update(status=Campaign.STATUS_FUNDED)
+    # Whole-table rebuilds: id lists of this size would exceed SQLite's parameter limit.
+    reconcile_unread_counts()
+    rebuild_group_stats()
+    self.log("Recomputed campaign statuses, unread counts and group stats")
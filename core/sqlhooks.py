@@ -0,0 +1,42 @@
+"""SQL hooks scoped to a context rather than to a connection.
+
+`connection.execute_wrapper()` only sees queries of the connection object of
+the current thread. Async views run their queries in worker threads (the
+async ORM's thread, core.asyncdb's pool), so per-request instrumentation
+(core.querybudget, core.tracing) registers hooks in a context variable
+instead. One dispatcher, added to every connection when it connects, runs
+the hooks of whatever context the query comes from; sync_to_async copies the
+context into its threads, so the hooks follow the request there.
+"""
+
+from __future__ import annotations
+
+import functools
+from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_hooks: ContextVar[tuple[Callable, ...]] = ContextVar("sql_hooks", default=())
+
+
+def _dispatch(execute, sql, params, many, context):
+  hooks = _hooks.get()
+  for hook in reversed(hooks):
+    execute = functools.partial(hook, execute)
+  return execute(sql, params, many, context)
+
+
+def install(sender=None, connection=None, **kwargs) -> None:
+  """connection_created receiver (see CoreConfig.ready)."""
+  if _dispatch not in connection.execute_wrappers:
+    connection.execute_wrappers.append(_dispatch)
+
+
+@contextmanager
+def sql_hook(hook: Callable):
+  """Run `hook(execute, sql, params, many, context)` around every query of this context."""
+  token = _hooks.set((*_hooks.get(), hook))
+  try:
+    yield
+  finally:
+    _hooks.reset(token)
@@ -0,0 +1,36 @@
+"""WhiteNoise for a middleware stack that may run asynchronously.
+
+WhiteNoiseMiddleware is sync-only. Under ASGI, one sync-only middleware
+makes Django run the layers around it through sync_to_async/async_to_sync,
+so every request (not just static files) pays two thread hops and async
+views lose most of their point. Looking a file up is a dict lookup, or a
+stat() with autorefresh in development, so it can run on the event loop
+just as well.
+"""
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+  sync_capable = async_capable = True
+
+  def __init__(self, get_response=None, *args, **kwargs):
+    super().__init__(get_response, *args, **kwargs)
+    self.async_mode = iscoroutinefunction(get_response)
+    if self.async_mode:
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    if self.async_mode:
+      return self.__acall__(request)
+    return super().__call__(request)
+
+  async def __acall__(self, request):
+    if self.autorefresh:
+      static_file = self.find_file(request.path_info)
+    else:
+      static_file = self.files.get(request.path_info)
+    if static_file is not None:
+      return self.serve(static_file, request)
+    return await self.get_response(request)
@@ -0,0 +1,35 @@
+"""The Django template backend, timing each render for core.metrics and core.tracing."""
+
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+from . import tracing
+from .metrics import TEMPLATE_RENDER
+
+
+class TimedTemplate:
+  def __init__(self, template):
+    self.template = template
+
+  def __getattr__(self, name):
+    return getattr(self.template, name)
+
+  def render(self, context=None, request=None):
+    name = self.template.origin.template_name or "<string>"
+    start = time.perf_counter()
+    try:
+      with tracing.span("template.render", template=name):
+        return self.template.render(context, request)
+    finally:
+      TEMPLATE_RENDER.observe(time.perf_counter() - start, template=name)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+  """Use as TEMPLATES' BACKEND; {% include %}d templates count toward the including one."""
+
+  def from_string(self, template_code):
+    return TimedTemplate(super().from_string(template_code))
+
+  def get_template(self, template_name):
+    return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,152 @@
+import logging
+from datetime import UTC, datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count
+from django.test import TestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+
+from campaigns.models import Campaign, Category
+from groups.models import GroupMembership
+
+from .querybudget import Budget, QueryBudgetExceeded, assert_query_budget
+from .seed import DEFAULT_ANCHOR, Seeder, SeedOptions
+
+
+class AssertQueryBudgetTests(TestCase):
+  def test_block_within_budget_passes(self):
+    with assert_query_budget(queries=2) as recorder:
+      get_user_model().objects.count()
+      list(get_user_model().objects.all())
+    self.assertEqual(recorder.count, 2)
+
+  def test_block_over_budget_raises(self):
+    with self.assertRaisesMessage(QueryBudgetExceeded, "2 queries (budget 1)"):
+      with assert_query_budget(queries=1):
+        get_user_model().objects.count()
+        list(get_user_model().objects.all())
+
+  def test_repeated_query_raises(self):
+    users = [get_user_model().objects.create_user(f"u{i}") for i in range(4)]
+    with self.assertRaisesMessage(QueryBudgetExceeded, "4x SELECT"):
+      with assert_query_budget(repeats=3):
+        for user in users:
+          get_user_model().objects.get(pk=user.pk)
+
+
+class SeederTests(TestCase):
+  SMALL = ["--users", "20", "--campaigns", "5", "--donations", "50", "--groups", "2", "--messages", "10", "--notifications", "10", "--tags", "5"]
+
+  def seeded_range(self):
+    created = Campaign.objects.values_list("created_at", flat=True)
+    return min(created), max(created)
+
+  def test_default_anchor_is_fixed(self):
+    call_command("seed_bulk", *self.SMALL, stdout=StringIO())
+    first, last = self.seeded_range()
+    self.assertLess(last, DEFAULT_ANCHOR)
+    self.assertGreaterEqual(first, DEFAULT_ANCHOR - timedelta(days=365))
+
+  def test_anchor_option(self):
+    call_command("seed_bulk", *self.SMALL, "--anchor", "2030-06-01", stdout=StringIO())
+    anchor = datetime(2030, 6, 1, tzinfo=UTC)
+    first, last = self.seeded_range()
+    self.assertLess(last, anchor)
+    self.assertGreaterEqual(first, anchor - timedelta(days=365))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class ViewQueryBudgetTests(TestCase):
+  """Every budgeted view stays within its budget on a seeded dataset (`seed_bulk --users 2000 --donations 20000`)."""
+
+  @classmethod
+  def setUpTestData(cls):
+    # Anchored at today so the seeded campaigns are still open to list and donate to.
+    today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    Seeder(SeedOptions(users=2000, campaigns=200, donations=20000, groups=50, messages=2000, notifications=2000, anchor=today)).run()
+    User = get_user_model()
+    cls.users = list(User.objects.filter(username__startswith="seed_").order_by("id")[:5])
+    cls.campaigns = list(Campaign.objects.select_related("created_by").order_by("id")[:5])
+    cls.category = Category.objects.order_by("id").first()
+    # The largest group has the most members to notify and read positions to count.
+    largest = GroupMembership.objects.values("group_id").annotate(n=Count("id")).order_by("-n")[0]["group_id"]
+    cls.memberships = [GroupMembership.objects.filter(group_id=largest).select_related("user").first()]
+    cls.memberships += list(GroupMembership.objects.exclude(group_id=largest).select_related("user").order_by("id")[:4])
+
+  def setUp(self):
+    # Cold caches: budgets must hold for the first request too.
+    cache.clear()
+    # Keep the per-request counts out of the test output; violations still show.
+    logger = logging.getLogger("core.querybudget")
+    self.addCleanup(logger.setLevel, logger.level)
+    logger.setLevel(logging.WARNING)
+
+  def assertOk(self, response):
+    self.assertLess(response.status_code, 400, response)
+
+  def test_reader_pages(self):
+    for user in self.users:
+      self.client.force_login(user)
+      for path in (
+        "/",
+        "/?sort=popular",
+        "/?sort=urgent",
+        f"/?category={self.category.slug}",
+        "/?q=water",
+        "/campaigns/autocomplete/?q=c",
+        "/accounts/notifications/",
+        "/accounts/feed/",
+        "/donations/donated/",
+        "/groups/",
+        "/groups/leaderboard/",
+      ):
+        with self.subTest(user=user.username, path=path):
+          self.assertOk(self.client.get(path))
+
+  def test_campaign_pages_and_donations(self):
+    for user, campaign in zip(self.users, self.campaigns):
+      self.client.force_login(user)
+      self.assertOk(self.client.get(f"/campaigns/{campaign.id}/"))
+      self.assertOk(self.client.post(f"/donations/campaign/{campaign.id}/", {"amount": "50000"}))
+
+      self.client.force_login(campaign.created_by)
+      self.assertOk(self.client.get(f"/campaigns/{campaign.id}/"))
+      self.assertOk(self.client.get(f"/campaigns/{campaign.id}/donation-requests/"))
+
+  def test_campaign_create(self):
+    user = self.users[0]
+    user.profile.can_fundraise = True
+    user.profile.save(update_fields=["can_fundraise"])
+    self.client.force_login(user)
+    self.assertOk(self.client.get("/campaigns/new/"))
+    response = self.client.post("/campaigns/new/", {
+      "title": "Clean water",
+      "description": "Wells for the village.",
+      "goal_amount": "1000000",
+      "end_date": "2099-01-01",
+      "categories_text": "Medical, Water, Brand new",
+      "tags": "clean-water, wells, village, summer, river",
+      "donate_qr_image_url": "https://example.org/qr.png",
+    })
+    self.assertRedirects(response, f"/campaigns/{Campaign.objects.latest('id').id}/", fetch_redirect_response=False)
+
+  def test_group_pages(self):
+    for membership in self.memberships:
+      self.client.force_login(membership.user)
+      group_id = membership.group_id
+      self.assertOk(self.client.get(f"/groups/{group_id}/"))
+      self.assertOk(self.client.post(f"/groups/{group_id}/messages/", {"content": "hello there"}))
+      self.assertOk(self.client.get(f"/groups/{group_id}/messages/history/"))
+      self.assertOk(self.client.get(f"/groups/{group_id}/messages/search/?q=hello"))
+
+  def test_strict_mode_fails_an_over_budget_view(self):
+    view = resolve("/").func
+    self.client.force_login(self.users[0])
+    with mock.patch.object(view, "query_budget", Budget(queries=1)):
+      with self.assertLogs("core.querybudget", "WARNING"), self.assertRaises(QueryBudgetExceeded):
+        self.client.get("/")
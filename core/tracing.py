@@ -0,0 +1,358 @@
+"""Request and job tracing with tail-based sampling.
+
+TracingMiddleware opens a root span per request; inside it, spans are
+opened for:
+- each SQL query (a core.sqlhooks hook, so worker threads of async views too),
+- each template render (core.template_backends),
+- cached_query lookups (core.cache),
+- and any `with span("name", key=value):` block.
+
+Background jobs start their own trace from the W3C `traceparent` saved when
+they were enqueued (see CampaignFanout.trace_context), so a fan-out shows up
+as part of the request that posted the update. Incoming `traceparent`
+headers are honoured the same way. Responses carry `X-Trace-Id`.
+
+Spans of a trace are buffered in memory (at most TRACING_MAX_SPANS) and the
+keep/drop decision is made when the root span ends. A trace is always kept
+if it took TRACING_SLOW_MS or more or ended with an error; otherwise it is
+kept with probability TRACING_SAMPLE_RATE. Kept traces go to TRACING_EXPORT:
+- `file:///path/traces.jsonl` appends one JSON line per trace;
+- `http://host:4318` posts OTLP/HTTP JSON from a background thread
+  (`manage.py trace_collector` is a local stand-in for a collector).
+
+With TRACING_EXPORT empty the middleware is not installed, and span() costs
+one context variable lookup.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import random
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .sqlhooks import sql_hook
+
+logger = logging.getLogger(__name__)
+
+KIND_INTERNAL = "internal"
+KIND_SERVER = "server"
+KIND_CLIENT = "client"
+KIND_CONSUMER = "consumer"
+
+_OTLP_KINDS = {KIND_INTERNAL: 1, KIND_SERVER: 2, KIND_CLIENT: 3, KIND_CONSUMER: 5}
+_SQL_MAX_LENGTH = 2000
+
+
+@dataclass
+class Span:
+  trace_id: str
+  span_id: str
+  parent_id: str
+  name: str
+  kind: str = KIND_INTERNAL
+  start_ns: int = 0
+  end_ns: int = 0
+  attributes: dict = field(default_factory=dict)
+  error: bool = False
+
+  @property
+  def duration_ms(self) -> float:
+    return (self.end_ns - self.start_ns) / 1e6
+
+  def set(self, **attributes) -> None:
+    self.attributes.update(attributes)
+
+
+@dataclass
+class Trace:
+  root: Span
+  spans: list[Span] = field(default_factory=list)
+  dropped: int = 0
+
+
+_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+_span: ContextVar[Span | None] = ContextVar("span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+  return secrets.token_hex(nbytes)
+
+
+def parse_traceparent(value: str) -> tuple[str, str] | None:
+  """(trace_id, parent_span_id) from a W3C traceparent, or None if malformed."""
+  parts = (value or "").strip().split("-")
+  if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+    return None
+  try:
+    int(parts[1], 16), int(parts[2], 16)
+  except ValueError:
+    return None
+  return parts[1], parts[2]
+
+
+def current_traceparent() -> str:
+  """The W3C traceparent of the active span ("" outside a trace), for handing to jobs."""
+  current = _span.get()
+  return f"00-{current.trace_id}-{current.span_id}-01" if current else ""
+
+
+def _sql_span(execute, sql, params, many, context):
+  with span("db.query", KIND_CLIENT, **{"db.system": context["connection"].vendor, "db.statement": sql[:_SQL_MAX_LENGTH]}):
+    return execute(sql, params, many, context)
+
+
+@contextmanager
+def start_trace(name: str, traceparent: str = "", kind: str = KIND_INTERNAL, **attributes):
+  """Open a root span, continuing `traceparent` if given; the trace is sampled and exported at exit.
+
+  Inside an active trace (a job run from a request) this is a plain child span.
+  """
+  active = _trace.get()
+  if active is not None:
+    with _child(active, name, kind, attributes) as child:
+      yield child
+    return
+
+  parent = parse_traceparent(traceparent)
+  trace_id, parent_id = parent if parent else (_new_id(16), "")
+  root = Span(trace_id, _new_id(8), parent_id, name, kind, time.time_ns(), attributes=attributes)
+  trace = Trace(root, [root])
+  trace_token, span_token = _trace.set(trace), _span.set(root)
+  try:
+    with sql_hook(_sql_span):
+      yield root
+  except BaseException:
+    root.error = True
+    raise
+  finally:
+    root.end_ns = time.time_ns()
+    _span.reset(span_token)
+    _trace.reset(trace_token)
+    if _keep(root):
+      export(trace)
+
+
+@contextmanager
+def _child(trace: Trace, name: str, kind: str, attributes: dict):
+  parent = _span.get()
+  child = Span(trace.root.trace_id, _new_id(8), parent.span_id, name, kind, time.time_ns(), attributes=attributes)
+  token = _span.set(child)
+  try:
+    yield child
+  except BaseException:
+    child.error = True
+    raise
+  finally:
+    child.end_ns = time.time_ns()
+    _span.reset(token)
+    if len(trace.spans) < settings.TRACING_MAX_SPANS:
+      trace.spans.append(child)
+    else:
+      trace.dropped += 1
+
+
+def span(name: str, kind: str = KIND_INTERNAL, **attributes):
+  """A child span of the active one; a no-op context (yielding None) outside a trace."""
+  trace = _trace.get()
+  if trace is None:
+    return nullcontext()
+  return _child(trace, name, kind, attributes)
+
+
+def _keep(root: Span) -> bool:
+  return root.error or root.duration_ms >= settings.TRACING_SLOW_MS or random.random() < settings.TRACING_SAMPLE_RATE
+
+
+# Export
+
+
+def _span_dict(span: Span) -> dict:
+  return {
+    "span_id": span.span_id,
+    "parent_id": span.parent_id,
+    "name": span.name,
+    "kind": span.kind,
+    "start_ns": span.start_ns,
+    "duration_ms": round(span.duration_ms, 3),
+    "error": span.error,
+    "attributes": span.attributes,
+  }
+
+
+def _otlp_value(value) -> dict:
+  if isinstance(value, bool):
+    return {"boolValue": value}
+  if isinstance(value, int):
+    return {"intValue": str(value)}
+  if isinstance(value, float):
+    return {"doubleValue": value}
+  return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> dict:
+  data = {
+    "traceId": span.trace_id,
+    "spanId": span.span_id,
+    "name": span.name,
+    "kind": _OTLP_KINDS[span.kind],
+    "startTimeUnixNano": str(span.start_ns),
+    "endTimeUnixNano": str(span.end_ns),
+    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+    "status": {"code": 2 if span.error else 1},
+  }
+  if span.parent_id:
+    data["parentSpanId"] = span.parent_id
+  return data
+
+
+def otlp_payload(traces: list[Trace]) -> dict:
+  return {
+    "resourceSpans": [
+      {
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.TRACING_SERVICE_NAME}}]},
+        "scopeSpans": [
+          {"scope": {"name": "core.tracing"}, "spans": [_otlp_span(s) for trace in traces for s in trace.spans]}
+        ],
+      }
+    ]
+  }
+
+
+class JsonLinesExporter:
+  def __init__(self, path: str):
+    self.path = path
+    self._lock = threading.Lock()
+
+  def export(self, trace: Trace) -> None:
+    record = {
+      "trace_id": trace.root.trace_id,
+      "name": trace.root.name,
+      "duration_ms": round(trace.root.duration_ms, 3),
+      "error": trace.root.error,
+      "dropped_spans": trace.dropped,
+      "spans": [_span_dict(s) for s in trace.spans],
+    }
+    line = json.dumps(record, default=str) + "\n"
+    with self._lock, open(self.path, "a", encoding="utf-8") as f:
+      f.write(line)
+
+
+class OtlpHttpExporter:
+  """Posts batches of traces as OTLP/HTTP JSON from a daemon thread; drops when the queue is full."""
+
+  BATCH_SIZE = 50
+  QUEUE_SIZE = 1000
+
+  def __init__(self, endpoint: str):
+    self.url = endpoint.rstrip("/") + "/v1/traces"
+    self.queue = queue.Queue(self.QUEUE_SIZE)
+    self._worker = None
+    self._pid = None
+
+  def export(self, trace: Trace) -> None:
+    if self._pid != os.getpid():
+      self._pid = os.getpid()
+      self._worker = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+      self._worker.start()
+    try:
+      self.queue.put_nowait(trace)
+    except queue.Full:
+      logger.warning("Trace export queue is full; dropping trace %s", trace.root.trace_id)
+
+  def _run(self) -> None:
+    while True:
+      batch = [self.queue.get()]
+      while len(batch) < self.BATCH_SIZE:
+        try:
+          batch.append(self.queue.get_nowait())
+        except queue.Empty:
+          break
+      body = json.dumps(otlp_payload(batch), default=str).encode()
+      request = urllib.request.Request(self.url, body, {"Content-Type": "application/json"}, method="POST")
+      try:
+        urllib.request.urlopen(request, timeout=5).close()
+      except OSError:
+        logger.warning("Could not export %d trace(s) to %s", len(batch), self.url, exc_info=True)
+
+
+_exporter = None
+
+
+def get_exporter():
+  global _exporter
+  if _exporter is None:
+    url = urlsplit(settings.TRACING_EXPORT)
+    if url.scheme == "file":
+      _exporter = JsonLinesExporter(url.path)
+    elif url.scheme in ("http", "https"):
+      _exporter = OtlpHttpExporter(settings.TRACING_EXPORT)
+    else:
+      raise ValueError(f"Unsupported TRACING_EXPORT: {settings.TRACING_EXPORT!r}")
+  return _exporter
+
+
+def export(trace: Trace) -> None:
+  if not settings.TRACING_EXPORT:
+    return
+  try:
+    get_exporter().export(trace)
+  except OSError:
+    logger.exception("Could not export trace %s", trace.root.trace_id)
+
+
+class TracingMiddleware:
+  sync_capable = async_capable = True
+
+  def __init__(self, get_response):
+    if not settings.TRACING_EXPORT:
+      raise MiddlewareNotUsed
+    get_exporter()  # fail at startup on a bad TRACING_EXPORT
+    self.get_response = get_response
+    self.async_mode = iscoroutinefunction(get_response)
+    if self.async_mode:
+      markcoroutinefunction(self)
+
+  def _start(self, request):
+    return start_trace(
+      f"{request.method} {request.path}",
+      request.headers.get("traceparent", ""),
+      KIND_SERVER,
+      **{"http.method": request.method, "http.target": request.path},
+    )
+
+  def __call__(self, request):
+    if self.async_mode:
+      return self.__acall__(request)
+    with self._start(request) as root:
+      response = self.get_response(request)
+      self._finish(root, request, response)
+    return response
+
+  async def __acall__(self, request):
+    with self._start(request) as root:
+      response = await self.get_response(request)
+      self._finish(root, request, response)
+    return response
+
+  def _finish(self, root: Span, request, response) -> None:
+    match = getattr(request, "resolver_match", None)
+    if match:
+      root.name = f"{request.method} {match.view_name}"
+      root.set(**{"http.route": match.route})
+    root.set(**{"http.status_code": response.status_code})
+    root.error = response.status_code >= 500
+    response["X-Trace-Id"] = root.trace_id
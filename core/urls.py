@@ -0,0 +1,10 @@
+from django.urls import path
+
+from . import views
+
+app_name = "core"
+
+urlpatterns = [
+  path("profiles/", views.profile_list, name="profile_list"),
+  path("profiles/<str:view_name>/", views.profile_detail, name="profile_detail"),
+]
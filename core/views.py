@@ -0,0 +1,75 @@
+import secrets
+from datetime import UTC, datetime
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpRequest, HttpResponse
+from django.shortcuts import redirect, render
+
+from . import metrics as metrics_registry
+from .profiling import SORT_KEYS, get_store
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+  token = settings.METRICS_TOKEN
+  if token:
+    scheme, _, given = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(given, token):
+      raise Http404
+  elif not settings.DEBUG:
+    raise Http404
+  return HttpResponse(metrics_registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@staff_member_required
+def profile_list(request: HttpRequest) -> HttpResponse:
+  store = get_store()
+  if request.method == "POST":
+    store.clear()
+    return redirect("core:profile_list")
+
+  views = store.views()
+  for summary in views:
+    summary["mean_ms"] = summary["seconds"] * 1000 / summary["samples"]
+    summary["last_sampled_at"] = datetime.fromtimestamp(summary["last_sampled"], tz=UTC)
+  context = {**admin.site.each_context(request), "title": "Request profiles", "views": views}
+  return render(request, "core/profile_list.html", context)
+
+
+@staff_member_required
+def profile_detail(request: HttpRequest, view_name: str) -> HttpResponse:
+  store = get_store()
+  summary = store.summary(view_name)
+  if summary is None:
+    raise Http404("No profile for this view.")
+  if request.method == "POST":
+    store.clear(view_name)
+    return redirect("core:profile_list")
+
+  sort = request.GET.get("sort") if request.GET.get("sort") in SORT_KEYS else "cumulative"
+  samples = summary["samples"]
+  functions = [
+    {
+      "function": row.function,
+      "calls": row.calls / samples,
+      "tottime_ms": row.tottime * 1000 / samples,
+      "cumtime_ms": row.cumtime * 1000 / samples,
+    }
+    for row in store.top_functions(view_name, sort=sort)
+  ]
+  allocations = [
+    {"site": site, "kib": size / 1024 / samples, "count": count / samples}
+    for site, (size, count) in summary["allocations"].items()
+  ]
+  context = {
+    **admin.site.each_context(request),
+    "title": f"Profile of {view_name}",
+    "summary": summary,
+    "mean_ms": summary["seconds"] * 1000 / samples,
+    "sort": sort,
+    "sort_keys": SORT_KEYS,
+    "functions": functions,
+    "allocations": allocations,
+  }
+  return render(request, "core/profile_detail.html", context)
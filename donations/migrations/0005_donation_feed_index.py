@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0004_alter_donation_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['campaign', 'status', '-created_at'], name='donation_campaign_feed_idx'),
+        ),
+    ]
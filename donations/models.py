@@ -38,6 +38,9 @@ class Donation(models.Model):
 
   class Meta:
     ordering = ["-created_at"]
+    indexes = [
+      models.Index(fields=["campaign", "status", "-created_at"], name="donation_campaign_feed_idx"),
+    ]
 
   @property
   def public_name(self) -> str:
@@ -1,10 +1,12 @@
 from django.urls import path
 
+from core.querybudget import query_budget
+
 from . import views
 
 app_name = "donations"
 
 urlpatterns = [
-  path("campaign/<int:campaign_id>/", views.donate_to_campaign, name="donate"),
-  path("donated/", views.donated_campaigns, name="donated_campaigns"),
+  path("campaign/<int:campaign_id>/", query_budget(views.donate_to_campaign, queries=11), name="donate"),
+  path("donated/", query_budget(views.donated_campaigns, queries=8), name="donated_campaigns"),
 ]
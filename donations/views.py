@@ -8,10 +8,13 @@ from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.db.models import Q, Sum
 from django.utils.translation import gettext as _
+from django.utils.translation import ngettext
 
-from campaigns.models import Campaign
+from campaigns.models import Campaign, with_progress
+from core.metrics import DONATIONS
 from groups.models import DonorGroup
-from user.models import Notification, Profile
+from user.models import Notification
+from user.notifications import notify
 
 from .models import Donation
 
@@ -49,7 +52,7 @@ def donate_to_campaign(request: HttpRequest, campaign_id: int) -> HttpResponse:
 
   is_htmx = _is_htmx(request)
 
-  profile = Profile.get_or_create_for_user(request.user)
+  profile = request.profile
   if profile.can_fundraise:
     error_text = _("Fundraiser accounts cannot donate. Please use a donor account.")
     messages.error(request, error_text)
@@ -86,6 +89,24 @@ def donate_to_campaign(request: HttpRequest, campaign_id: int) -> HttpResponse:
       return render(request, "donations/partials/donation_panel.html", context, status=400)
     return redirect("campaigns:detail", campaign_id=campaign.id)
 
+  if not campaign.is_active:
+    error_text = _("This campaign has ended and no longer accepts donations.")
+    messages.error(request, error_text)
+    if is_htmx:
+      donations = (
+        Donation.objects.filter(campaign=campaign, status=Donation.STATUS_APPROVED)
+        .select_related("donor", "group")[:10]
+      )
+      context = {
+        "campaign": campaign,
+        "donations": donations,
+        "disable_donate": True,
+        "disable_donate_reason": "ended",
+        "error_message": error_text,
+      }
+      return render(request, "donations/partials/donation_panel.html", context, status=400)
+    return redirect("campaigns:detail", campaign_id=campaign.id)
+
   if request.method != "POST":
     return redirect("campaigns:detail", campaign_id=campaign.id)
 
@@ -149,13 +170,19 @@ def donate_to_campaign(request: HttpRequest, campaign_id: int) -> HttpResponse:
     display_name=display_name,
     status=Donation.STATUS_PENDING,
   )
+  DONATIONS.inc_on_commit(event="created")
 
   if campaign.created_by_id and campaign.created_by_id != request.user.id:
-    Notification.objects.create(
-      user=campaign.created_by,
-      kind=Notification.KIND_DONATION,
-      message=_("Campaign '%(title)s' has a new donation request (pending approval).") % {"title": campaign.title},
+    notify(
+      campaign.created_by,
+      Notification.KIND_DONATION,
+      lambda count: ngettext(
+        "Campaign '%(title)s' has a new donation request (pending approval).",
+        "Campaign '%(title)s' has %(count)d new donation requests (pending approval).",
+        count,
+      ) % {"title": campaign.title, "count": count},
       url=f"/campaigns/{campaign.id}/donation-requests/",
+      coalesce_key=f"donation_requests:{campaign.id}",
     )
 
   success_text = _("Donation request sent. Awaiting campaign owner approval.")
@@ -186,7 +213,7 @@ def donated_campaigns(request: HttpRequest) -> HttpResponse:
     donation_filter &= Q(donations__amount__lte=max_amount)
 
   campaigns = (
-    Campaign.objects.filter(donations__donor=request.user, donations__status=Donation.STATUS_APPROVED)
+    with_progress(Campaign.objects.filter(donations__donor=request.user, donations__status=Donation.STATUS_APPROVED))
     .distinct()
     .annotate(total_donated=Sum("donations__amount", filter=donation_filter))
     .prefetch_related("categories", "tags")
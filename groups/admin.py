@@ -1,10 +1,17 @@
 from django.contrib import admin
 
-from .models import DonorGroup
+from .models import DonorGroup, GroupMembership
+
+
+class GroupMembershipInline(admin.TabularInline):
+  model = GroupMembership
+  extra = 0
+  raw_id_fields = ("user",)
 
 
 @admin.register(DonorGroup)
 class DonorGroupAdmin(admin.ModelAdmin):
-  list_display = ("name", "owner", "created_at")
+  list_display = ("name", "owner", "member_count", "created_at")
   search_fields = ("name", "description", "owner__username")
-  filter_horizontal = ("members",)
+  readonly_fields = ("member_count",)
+  inlines = [GroupMembershipInline]
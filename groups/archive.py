@@ -0,0 +1,60 @@
+"""Archival of old group chat messages.
+
+Messages older than GROUP_MESSAGE_RETENTION_DAYS are moved from the hot
+GroupMessage table into ArchivedGroupMessage in bounded transactions, so the
+hot table (and its indexes) only holds recent chat. Ids are preserved, which
+lets `message_history` page backwards by id across both tables.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from django.db import transaction
+
+from .models import ArchivedGroupMessage, GroupMessage
+
+
+def archive_messages_before(cutoff: datetime, batch_size: int = 1000) -> int:
+  """Move messages created before `cutoff`, oldest first. Returns how many were moved."""
+  moved = 0
+  while True:
+    with transaction.atomic():
+      batch = list(
+        GroupMessage.objects.select_for_update()
+        .filter(created_at__lt=cutoff)
+        .order_by("id")
+        .values("id", "group_id", "sender_id", "content", "created_at")[:batch_size]
+      )
+      if not batch:
+        break
+
+      # ignore_conflicts keeps a rerun after a partial failure idempotent.
+      ArchivedGroupMessage.objects.bulk_create([ArchivedGroupMessage(**row) for row in batch], ignore_conflicts=True)
+      GroupMessage.objects.filter(id__in=[row["id"] for row in batch]).delete()
+    moved += len(batch)
+  return moved
+
+
+def message_history(group, before_id: int | None = None, limit: int = 50) -> tuple[list, bool]:
+  """Newest `limit` messages older than `before_id`, oldest first, plus whether more exist.
+
+  Reads the hot table first and only falls through to the archive when the
+  page reaches past the oldest hot message.
+  """
+  hot = GroupMessage.objects.filter(group=group).select_related("sender").order_by("-id")
+  if before_id is not None:
+    hot = hot.filter(id__lt=before_id)
+  items = list(hot[: limit + 1])
+
+  if len(items) <= limit:
+    oldest = items[-1].id if items else before_id
+    archived = ArchivedGroupMessage.objects.filter(group=group).select_related("sender").order_by("-id")
+    if oldest is not None:
+      archived = archived.filter(id__lt=oldest)
+    items += list(archived[: limit + 1 - len(items)])
+
+  has_more = len(items) > limit
+  items = items[:limit]
+  items.reverse()
+  return items, has_more
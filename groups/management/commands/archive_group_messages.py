@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from groups.archive import archive_messages_before
+
+
+class Command(BaseCommand):
+  help = "Moves group messages older than GROUP_MESSAGE_RETENTION_DAYS into the archive table in batches."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--days", type=int, default=settings.GROUP_MESSAGE_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=1000)
+
+  def handle(self, *args, **options):
+    cutoff = timezone.now() - timedelta(days=options["days"])
+    moved = archive_messages_before(cutoff, batch_size=options["batch_size"])
+    self.stdout.write(self.style.SUCCESS(f"Archived {moved} group message(s) older than {options['days']} day(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from groups.stats import rebuild_group_stats
+
+
+class Command(BaseCommand):
+  help = "Recomputes GroupContributionStats from approved donations."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--group-id", type=int, action="append", dest="group_ids", help="Only rebuild these groups.")
+
+  def handle(self, *args, **options):
+    written = rebuild_group_stats(options.get("group_ids"))
+    self.stdout.write(self.style.SUCCESS(f"Wrote {written} group stats row(s)."))
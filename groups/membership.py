@@ -0,0 +1,84 @@
+"""Group membership operations that keep DonorGroup.member_count in step."""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+
+from django.db import transaction
+from django.db.models import F
+
+from user.feed import first_page
+
+from .models import DonorGroup, GroupMembership
+
+MEMBERS_PAGE_SIZE = 50
+
+
+def is_member(group_id: int, user_id: int) -> bool:
+  """Single indexed EXISTS on (group, user)."""
+  return GroupMembership.objects.filter(group_id=group_id, user_id=user_id).exists()
+
+
+def add_members(group: DonorGroup, user_ids: Iterable[int], role: str = GroupMembership.ROLE_MEMBER) -> list[int]:
+  """Add users to the group; returns the ids that were not already members."""
+  user_ids = list(dict.fromkeys(user_ids))
+  if not user_ids:
+    return []
+
+  with transaction.atomic():
+    # Concurrent adds to the group queue on its row, so `existing` is still
+    # true when the rows go in: member_count and the "added" notifications
+    # cover exactly the memberships this call inserted. (SQLite runs write
+    # transactions one at a time anyway.)
+    list(DonorGroup.objects.select_for_update().filter(id=group.id).values_list("id"))
+    existing = set(
+      GroupMembership.objects.filter(group=group, user_id__in=user_ids).values_list("user_id", flat=True)
+    )
+    new_ids = [uid for uid in user_ids if uid not in existing]
+    GroupMembership.objects.bulk_create(
+      [GroupMembership(group=group, user_id=uid, role=role) for uid in new_ids],
+      batch_size=500,
+    )
+    if new_ids:
+      DonorGroup.objects.filter(id=group.id).update(member_count=F("member_count") + len(new_ids))
+      # bulk_create sends no post_save, so user/signals.py does not see these
+      # rows; the new members' cached feeds must include the group now.
+      transaction.on_commit(lambda: _forget_feeds(new_ids))
+  return new_ids
+
+
+def _forget_feeds(user_ids: list[int]) -> None:
+  for uid in user_ids:
+    first_page.forget(uid)
+
+
+def remove_members(group: DonorGroup, user_ids: Iterable[int]) -> int:
+  """Remove users from the group; returns how many memberships were deleted."""
+  user_ids = list(user_ids)
+  if not user_ids:
+    return 0
+
+  with transaction.atomic():
+    removed, _ = GroupMembership.objects.filter(group=group, user_id__in=user_ids).delete()
+    if removed:
+      DonorGroup.objects.filter(id=group.id).update(member_count=F("member_count") - removed)
+  return removed
+
+
+def member_page(group: DonorGroup, page: int) -> dict:
+  """One page of memberships, leader first; the page count comes from the cached member_count."""
+  num_pages = max(1, -(-group.member_count // MEMBERS_PAGE_SIZE))
+  page = min(max(1, page), num_pages)
+  offset = (page - 1) * MEMBERS_PAGE_SIZE
+  memberships = (
+    GroupMembership.objects.filter(group=group)
+    .select_related("user")
+    .order_by("role", "id")[offset : offset + MEMBERS_PAGE_SIZE]
+  )
+  return {
+    "memberships": memberships,
+    "page": page,
+    "num_pages": num_pages,
+    "previous_page": page - 1 if page > 1 else None,
+    "next_page": page + 1 if page < num_pages else None,
+  }
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:38
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_stats(apps, schema_editor):
+    # Self-contained (not groups.stats.rebuild_group_stats), so later changes
+    # to that module cannot break this migration.
+    Donation = apps.get_model('donations', 'Donation')
+    GroupContributionStats = apps.get_model('groups', 'GroupContributionStats')
+
+    donations = Donation.objects.filter(status='approved', group__isnull=False)
+    amount = Donation._meta.get_field('amount')
+    integer_digits = amount.max_digits - amount.decimal_places
+    if integer_digits > 0:
+        # Skip previously-stored out-of-range amounts.
+        donations = donations.filter(amount__lt=Decimal(10) ** integer_digits)
+
+    rows = []
+    for key, qs in ((None, donations), ('campaign_id', donations), ('donor_id', donations.filter(is_anonymous=False))):
+        fields = ['group_id', key] if key else ['group_id']
+        for row in qs.order_by().values(*fields).annotate(total=Sum('amount'), n=Count('id')).iterator():
+            rows.append(
+                GroupContributionStats(
+                    group_id=row['group_id'],
+                    campaign_id=row.get('campaign_id'),
+                    member_id=row.get('donor_id'),
+                    total_amount=row['total'],
+                    donation_count=row['n'],
+                )
+            )
+    GroupContributionStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0004_increase_goal_amount_precision'),
+        ('donations', '0004_alter_donation_status'),
+        ('groups', '0004_group_messages'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupContributionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=24)),
+                ('donation_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('campaign', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='campaigns.campaign')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contribution_stats', to='groups.donorgroup')),
+                ('member', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('campaign__isnull', True), ('member__isnull', True)), fields=['-total_amount'], name='group_stats_leaderboard_idx'), models.Index(fields=['group', '-total_amount'], name='group_stats_group_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('campaign__isnull', True), ('member__isnull', True)), fields=('group',), name='group_stats_total_uniq'), models.UniqueConstraint(condition=models.Q(('campaign__isnull', False), ('member__isnull', True)), fields=('group', 'campaign'), name='group_stats_campaign_uniq'), models.UniqueConstraint(condition=models.Q(('campaign__isnull', True), ('member__isnull', False)), fields=('group', 'member'), name='group_stats_member_uniq')],
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,108 @@
+# Turns the auto-created DonorGroup.members table into an explicit GroupMembership
+# through-model, keeping existing rows.
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_roles_and_counts(apps, schema_editor):
+    DonorGroup = apps.get_model("groups", "DonorGroup")
+    GroupMembership = apps.get_model("groups", "GroupMembership")
+
+    # Leaders were always added as members by group_create; make sure of it.
+    existing = set(GroupMembership.objects.values_list("group_id", "user_id"))
+    GroupMembership.objects.bulk_create(
+        [
+            GroupMembership(group_id=group_id, user_id=owner_id, role="leader")
+            for group_id, owner_id in DonorGroup.objects.values_list("id", "owner_id")
+            if (group_id, owner_id) not in existing
+        ],
+        batch_size=500,
+    )
+    for group_id, owner_id in DonorGroup.objects.values_list("id", "owner_id").iterator():
+        GroupMembership.objects.filter(group_id=group_id, user_id=owner_id).update(role="leader")
+        DonorGroup.objects.filter(id=group_id).update(
+            member_count=GroupMembership.objects.filter(group_id=group_id).count()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0005_group_contribution_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='GroupMembership',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('donorgroup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='groups.donorgroup')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'groups_donorgroup_members',
+                        'unique_together': {('donorgroup', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='donorgroup',
+                    name='members',
+                    field=models.ManyToManyField(blank=True, related_name='groups_member', through='groups.GroupMembership', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.RenameField(
+            model_name='groupmembership',
+            old_name='donorgroup',
+            new_name='group',
+        ),
+        migrations.AlterField(
+            model_name='groupmembership',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='groups.donorgroup'),
+        ),
+        migrations.AlterField(
+            model_name='groupmembership',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='group_memberships', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterModelTable(
+            name='groupmembership',
+            table=None,
+        ),
+        migrations.AlterUniqueTogether(
+            name='groupmembership',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='groupmembership',
+            name='role',
+            field=models.CharField(choices=[('leader', 'Leader'), ('member', 'Member')], default='member', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='groupmembership',
+            name='joined_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='donorgroup',
+            name='member_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='groupmembership',
+            constraint=models.UniqueConstraint(fields=('group', 'user'), name='group_membership_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='groupmembership',
+            index=models.Index(fields=['group', 'role', 'id'], name='group_membership_list_idx'),
+        ),
+        migrations.RunPython(backfill_roles_and_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0006_group_membership'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedGroupMessage',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='groupmessage',
+            index=models.Index(fields=['group', '-id'], name='group_message_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupmessage',
+            index=models.Index(fields=['created_at'], name='group_message_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedgroupmessage',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_messages', to='groups.donorgroup'),
+        ),
+        migrations.AddField(
+            model_name='archivedgroupmessage',
+            name='sender',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_group_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedgroupmessage',
+            index=models.Index(fields=['group', '-id'], name='archived_message_history_idx'),
+        ),
+    ]
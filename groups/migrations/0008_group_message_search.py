@@ -0,0 +1,95 @@
+# Full-text index over group chat messages (hot and archived), see groups.search.
+#
+# SQLite: a standalone FTS5 table keyed by message id, kept in step by triggers.
+#   Deleting a hot message that was just archived keeps its FTS row, so archived
+#   history stays searchable.
+# PostgreSQL: GIN expression indexes on to_tsvector('simple', content).
+
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS groups_groupmessage_fts USING fts5(
+        group_key,
+        content,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO groups_groupmessage_fts (rowid, group_key, content)
+    SELECT id, 'g' || group_id, content FROM groups_groupmessage
+    UNION ALL
+    SELECT id, 'g' || group_id, content FROM groups_archivedgroupmessage
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS groups_groupmessage_fts_ai AFTER INSERT ON groups_groupmessage BEGIN
+        INSERT INTO groups_groupmessage_fts (rowid, group_key, content) VALUES (new.id, 'g' || new.group_id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS groups_groupmessage_fts_au AFTER UPDATE OF content ON groups_groupmessage BEGIN
+        UPDATE groups_groupmessage_fts SET content = new.content WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS groups_groupmessage_fts_ad AFTER DELETE ON groups_groupmessage
+    WHEN NOT EXISTS (SELECT 1 FROM groups_archivedgroupmessage WHERE id = old.id) BEGIN
+        DELETE FROM groups_groupmessage_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS groups_archivedgroupmessage_fts_ad AFTER DELETE ON groups_archivedgroupmessage BEGIN
+        DELETE FROM groups_groupmessage_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS groups_archivedgroupmessage_fts_ad",
+    "DROP TRIGGER IF EXISTS groups_groupmessage_fts_ad",
+    "DROP TRIGGER IF EXISTS groups_groupmessage_fts_au",
+    "DROP TRIGGER IF EXISTS groups_groupmessage_fts_ai",
+    "DROP TABLE IF EXISTS groups_groupmessage_fts",
+]
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX IF NOT EXISTS group_message_fts_idx ON groups_groupmessage USING GIN (to_tsvector('simple', content))",
+    "CREATE INDEX IF NOT EXISTS archived_message_fts_idx ON groups_archivedgroupmessage USING GIN (to_tsvector('simple', content))",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS archived_message_fts_idx",
+    "DROP INDEX IF EXISTS group_message_fts_idx",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def forward(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_FORWARD)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def backward(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        _run(schema_editor, SQLITE_BACKWARD)
+    elif vendor == "postgresql":
+        _run(schema_editor, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0007_group_message_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, backward),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0008_group_message_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='groupmessage',
+            index=models.Index(fields=['group', '-created_at'], name='group_message_feed_idx'),
+        ),
+    ]
@@ -9,7 +9,14 @@ class DonorGroup(models.Model):
   image_url = models.URLField(blank=True)
   description = models.TextField(blank=True)
   owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="groups_owned")
-  members = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="groups_member", blank=True)
+  members = models.ManyToManyField(
+    settings.AUTH_USER_MODEL,
+    through="GroupMembership",
+    related_name="groups_member",
+    blank=True,
+  )
+  # Denormalized; maintained by groups.membership.
+  member_count = models.PositiveIntegerField(default=0)
   created_at = models.DateTimeField(auto_now_add=True)
 
   class Meta:
@@ -19,6 +26,33 @@ class DonorGroup(models.Model):
     return self.name
 
 
+class GroupMembership(models.Model):
+  ROLE_LEADER = "leader"
+  ROLE_MEMBER = "member"
+
+  ROLE_CHOICES = [
+    (ROLE_LEADER, "Leader"),
+    (ROLE_MEMBER, "Member"),
+  ]
+
+  group = models.ForeignKey(DonorGroup, on_delete=models.CASCADE, related_name="memberships")
+  user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="group_memberships")
+  role = models.CharField(max_length=10, choices=ROLE_CHOICES, default=ROLE_MEMBER)
+  joined_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(fields=["group", "user"], name="group_membership_uniq"),
+    ]
+    indexes = [
+      # Paginated member panel: leader first, then by join order.
+      models.Index(fields=["group", "role", "id"], name="group_membership_list_idx"),
+    ]
+
+  def __str__(self) -> str:
+    return f"GroupMembership({self.group_id}, {self.user_id}, {self.role})"
+
+
 class GroupMessage(models.Model):
   group = models.ForeignKey(DonorGroup, on_delete=models.CASCADE, related_name="messages")
   sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="group_messages")
@@ -27,6 +61,31 @@ class GroupMessage(models.Model):
 
   class Meta:
     ordering = ["-created_at"]
+    indexes = [
+      models.Index(fields=["group", "-id"], name="group_message_history_idx"),
+      models.Index(fields=["created_at"], name="group_message_created_idx"),
+      models.Index(fields=["group", "-created_at"], name="group_message_feed_idx"),
+    ]
+
+
+class ArchivedGroupMessage(models.Model):
+  """Group messages moved out of the hot GroupMessage table by groups.archive.
+
+  Keeps the original message id, so history pagination by id spans both tables.
+  """
+
+  id = models.BigIntegerField(primary_key=True)
+  group = models.ForeignKey(DonorGroup, on_delete=models.CASCADE, related_name="archived_messages")
+  sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_group_messages")
+  content = models.TextField()
+  created_at = models.DateTimeField()
+  archived_at = models.DateTimeField(auto_now_add=True)
+
+  class Meta:
+    ordering = ["-id"]
+    indexes = [
+      models.Index(fields=["group", "-id"], name="archived_message_history_idx"),
+    ]
 
 
 class GroupMessageReadState(models.Model):
@@ -37,3 +96,51 @@ class GroupMessageReadState(models.Model):
 
   class Meta:
     unique_together = [("group", "user")]
+
+
+class GroupContributionStats(models.Model):
+  """Approved-donation totals for a group, maintained incrementally by groups.stats.
+
+  One row per group (campaign and member empty), plus one row per (group, campaign)
+  and one per (group, member). Anonymous donations count towards the group and
+  campaign rows but not towards a member's row.
+  """
+
+  group = models.ForeignKey(DonorGroup, on_delete=models.CASCADE, related_name="contribution_stats")
+  campaign = models.ForeignKey("campaigns.Campaign", on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+  member = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+  total_amount = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+  donation_count = models.PositiveIntegerField(default=0)
+  updated_at = models.DateTimeField(auto_now=True)
+
+  class Meta:
+    constraints = [
+      models.UniqueConstraint(
+        fields=["group"],
+        condition=models.Q(campaign__isnull=True, member__isnull=True),
+        name="group_stats_total_uniq",
+      ),
+      models.UniqueConstraint(
+        fields=["group", "campaign"],
+        condition=models.Q(member__isnull=True, campaign__isnull=False),
+        name="group_stats_campaign_uniq",
+      ),
+      models.UniqueConstraint(
+        fields=["group", "member"],
+        condition=models.Q(campaign__isnull=True, member__isnull=False),
+        name="group_stats_member_uniq",
+      ),
+    ]
+    indexes = [
+      # Cross-group leaderboard: top-K group totals.
+      models.Index(
+        fields=["-total_amount"],
+        condition=models.Q(campaign__isnull=True, member__isnull=True),
+        name="group_stats_leaderboard_idx",
+      ),
+      # Per-group breakdowns: top campaigns / top members of one group.
+      models.Index(fields=["group", "-total_amount"], name="group_stats_group_idx"),
+    ]
+
+  def __str__(self) -> str:
+    return f"GroupContributionStats({self.group_id}, {self.campaign_id}, {self.member_id})"
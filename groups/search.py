@@ -0,0 +1,184 @@
+"""Full-text search over a group's chat history (hot and archived messages).
+
+SQLite uses the FTS5 table created in migration 0008, PostgreSQL the GIN
+expression indexes on to_tsvector('simple', content). Other backends, or a
+SQLite build without FTS5, fall back to newest-first substring matching.
+
+Results are ordered by (score, id) ascending, where a lower score is a better
+match, and paged with an opaque "{score}_{id}" cursor. Scores depend on corpus
+statistics, so a page boundary can shift slightly if messages arrive between
+requests.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import SafeString, mark_safe
+
+from .models import ArchivedGroupMessage, GroupMessage
+
+SEARCH_PAGE_SIZE = 20
+
+# Longer queries are truncated; every term must match, so extra terms only narrow results.
+MAX_QUERY_TERMS = 8
+
+FTS_TABLE = "groups_groupmessage_fts"
+
+_WORD_RE = re.compile(r"\w+")
+
+_fts_tables: dict[str, bool] = {}
+
+
+def _fold(word: str) -> str:
+  """Lowercase and strip diacritics, roughly matching FTS5 `remove_diacritics`."""
+  decomposed = unicodedata.normalize("NFKD", word.lower())
+  return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def query_terms(query: str) -> list[str]:
+  """Word terms of a user query; punctuation and search operators are dropped."""
+  return _WORD_RE.findall(query.lower())[:MAX_QUERY_TERMS]
+
+
+def highlight(content: str, terms: list[str]) -> SafeString:
+  """Escape `content` and wrap words matching `terms` (last term as a prefix) in <mark>."""
+  if not terms:
+    return escape(content)
+  exact = {_fold(t) for t in terms[:-1]}
+  prefix = _fold(terms[-1])
+
+  out = []
+  pos = 0
+  for match in _WORD_RE.finditer(content):
+    word = _fold(match.group())
+    if word in exact or word.startswith(prefix):
+      out.append(escape(content[pos : match.start()]))
+      out.append(f"<mark>{escape(match.group())}</mark>")
+      pos = match.end()
+  out.append(escape(content[pos:]))
+  return mark_safe("".join(out))
+
+
+def encode_cursor(score: float, message_id: int) -> str:
+  return f"{score!r}_{message_id}"
+
+
+def parse_cursor(cursor: str | None) -> tuple[float, int] | None:
+  if not cursor:
+    return None
+  try:
+    score, message_id = cursor.rsplit("_", 1)
+    return float(score), int(message_id)
+  except ValueError:
+    return None
+
+
+def _has_fts_table() -> bool:
+  alias = connection.alias
+  if alias not in _fts_tables:
+    _fts_tables[alias] = FTS_TABLE in connection.introspection.table_names()
+  return _fts_tables[alias]
+
+
+def _keyset_clause(after: tuple[float, int] | None) -> tuple[str, list]:
+  if after is None:
+    return "", []
+  score, message_id = after
+  return "WHERE score > %s OR (score = %s AND id > %s)", [score, score, message_id]
+
+
+def _sqlite_hits(group_id: int, terms: list[str], after, limit: int) -> list[tuple[int, float]]:
+  # group_key is an indexed column holding "g<group_id>", so the group filter
+  # is resolved inside the FTS index rather than by post-filtering every match.
+  content_terms = " ".join([f'"{t}"' for t in terms[:-1]] + [f'"{terms[-1]}"*'])
+  match = f'group_key : "g{group_id}" AND content : ({content_terms})'
+  keyset, keyset_params = _keyset_clause(after)
+  sql = f"""
+    SELECT id, score FROM (
+      SELECT rowid AS id, bm25({FTS_TABLE}, 0.0, 1.0) AS score
+      FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+    ) {keyset}
+    ORDER BY score, id LIMIT %s
+  """
+  with connection.cursor() as cursor:
+    cursor.execute(sql, [match, *keyset_params, limit])
+    return cursor.fetchall()
+
+
+def _postgres_hits(group_id: int, terms: list[str], after, limit: int) -> list[tuple[int, float]]:
+  tsquery = " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+  keyset, keyset_params = _keyset_clause(after)
+  branches = " UNION ALL ".join(
+    f"""
+      SELECT id, -ts_rank(to_tsvector('simple', content), q.query)::float8 AS score
+      FROM {table}, q
+      WHERE group_id = %s AND to_tsvector('simple', content) @@ q.query
+    """
+    for table in (GroupMessage._meta.db_table, ArchivedGroupMessage._meta.db_table)
+  )
+  sql = f"""
+    WITH q AS (SELECT to_tsquery('simple', %s) AS query)
+    SELECT id, score FROM ({branches}) hits {keyset}
+    ORDER BY score, id LIMIT %s
+  """
+  with connection.cursor() as cursor:
+    cursor.execute(sql, [tsquery, group_id, group_id, *keyset_params, limit])
+    return cursor.fetchall()
+
+
+def _fallback_hits(group_id: int, terms: list[str], after, limit: int) -> list[tuple[int, float]]:
+  # Newest first, expressed as score = -id so the cursor format stays the same.
+  hits = []
+  for model in (GroupMessage, ArchivedGroupMessage):
+    qs = model.objects.filter(group_id=group_id)
+    for term in terms:
+      qs = qs.filter(content__icontains=term)
+    if after is not None:
+      qs = qs.filter(id__lt=after[1])
+    hits += [(pk, float(-pk)) for pk in qs.order_by("-id").values_list("id", flat=True)[:limit]]
+  return sorted(hits, key=lambda hit: hit[1])[:limit]
+
+
+def _hits(group_id: int, terms: list[str], after, limit: int) -> list[tuple[int, float]]:
+  if connection.vendor == "postgresql":
+    return _postgres_hits(group_id, terms, after, limit)
+  if connection.vendor == "sqlite" and _has_fts_table():
+    return _sqlite_hits(group_id, terms, after, limit)
+  return _fallback_hits(group_id, terms, after, limit)
+
+
+def search_messages(group, query: str, cursor: str | None = None, limit: int = SEARCH_PAGE_SIZE) -> tuple[list, str | None]:
+  """Best-matching messages for `query` in `group`, plus the cursor for the next page.
+
+  Each returned message (GroupMessage or ArchivedGroupMessage) carries a
+  `highlighted` attribute with its escaped content and matches in <mark>.
+  """
+  terms = query_terms(query)
+  if not terms:
+    return [], None
+
+  hits = _hits(group.id, terms, parse_cursor(cursor), limit + 1)
+  next_cursor = None
+  if len(hits) > limit:
+    hits = hits[:limit]
+    last_id, last_score = hits[-1]
+    next_cursor = encode_cursor(last_score, last_id)
+
+  ids = [message_id for message_id, _ in hits]
+  found = GroupMessage.objects.filter(group=group).select_related("sender").in_bulk(ids)
+  missing = [message_id for message_id in ids if message_id not in found]
+  if missing:
+    found.update(ArchivedGroupMessage.objects.filter(group=group).select_related("sender").in_bulk(missing))
+
+  results = []
+  for message_id in ids:
+    message = found.get(message_id)
+    if message is None:
+      continue
+    message.highlighted = highlight(message.content, terms)
+    results.append(message)
+  return results, next_cursor
@@ -0,0 +1,106 @@
+"""Maintained contribution totals for donor groups (see GroupContributionStats)."""
+
+from __future__ import annotations
+
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+
+def _max_amount(donation_model) -> Decimal | None:
+  # Guard against previously-stored out-of-range amounts (see group_detail).
+  field = donation_model._meta.get_field("amount")
+  integer_digits = int(field.max_digits) - int(field.decimal_places)
+  if integer_digits <= 0:
+    return None
+  return (Decimal(10) ** integer_digits) - (Decimal(1) / (Decimal(10) ** int(field.decimal_places)))
+
+
+def _apply(stats_model, group_id: int, campaign_id: int | None, member_id: int | None, amount: Decimal, count: int) -> None:
+  lookup = {"group_id": group_id, "campaign_id": campaign_id, "member_id": member_id}
+  updated = stats_model.objects.filter(**lookup).update(
+    total_amount=F("total_amount") + amount,
+    donation_count=F("donation_count") + count,
+  )
+  if updated:
+    return
+
+  try:
+    with transaction.atomic():
+      stats_model.objects.create(**lookup, total_amount=amount, donation_count=count)
+  except IntegrityError:
+    # Another request created the row first; add to it instead.
+    stats_model.objects.filter(**lookup).update(
+      total_amount=F("total_amount") + amount,
+      donation_count=F("donation_count") + count,
+    )
+
+
+def record_donation_decision(donation, previous_status: str) -> None:
+  """Update group totals after `donation` moved from `previous_status` to its current status."""
+  if not donation.group_id:
+    return
+
+  approved = donation.STATUS_APPROVED
+  if donation.status == approved and previous_status != approved:
+    sign = 1
+  elif previous_status == approved and donation.status != approved:
+    sign = -1
+  else:
+    return
+
+  from .models import GroupContributionStats
+
+  amount = donation.amount * sign
+  with transaction.atomic():
+    _apply(GroupContributionStats, donation.group_id, None, None, amount, sign)
+    _apply(GroupContributionStats, donation.group_id, donation.campaign_id, None, amount, sign)
+    if not donation.is_anonymous:
+      _apply(GroupContributionStats, donation.group_id, None, donation.donor_id, amount, sign)
+
+
+def rebuild_group_stats(group_ids: list[int] | None = None) -> int:
+  """Recompute stats rows from approved donations. Returns the number of rows written."""
+  Donation = apps.get_model("donations", "Donation")
+  GroupContributionStats = apps.get_model("groups", "GroupContributionStats")
+
+  donations = Donation.objects.filter(status="approved", group__isnull=False)
+  max_amount = _max_amount(Donation)
+  if max_amount is not None:
+    donations = donations.filter(amount__lte=max_amount)
+  existing = GroupContributionStats.objects.all()
+  if group_ids is not None:
+    donations = donations.filter(group_id__in=group_ids)
+    existing = existing.filter(group_id__in=group_ids)
+
+  def grouped(qs, *fields):
+    return qs.order_by().values("group_id", *fields).annotate(total=Sum("amount"), n=Count("id"))
+
+  rows = []
+  for row in grouped(donations).iterator():
+    rows.append(GroupContributionStats(group_id=row["group_id"], total_amount=row["total"], donation_count=row["n"]))
+  for row in grouped(donations, "campaign_id").iterator():
+    rows.append(
+      GroupContributionStats(
+        group_id=row["group_id"],
+        campaign_id=row["campaign_id"],
+        total_amount=row["total"],
+        donation_count=row["n"],
+      )
+    )
+  for row in grouped(donations.filter(is_anonymous=False), "donor_id").iterator():
+    rows.append(
+      GroupContributionStats(
+        group_id=row["group_id"],
+        member_id=row["donor_id"],
+        total_amount=row["total"],
+        donation_count=row["n"],
+      )
+    )
+
+  with transaction.atomic():
+    existing.delete()
+    GroupContributionStats.objects.bulk_create(rows, batch_size=1000)
+  return len(rows)
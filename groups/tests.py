@@ -0,0 +1,271 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from campaigns.models import Campaign
+from donations.models import Donation
+from user.models import Notification
+
+from . import search, views
+from .archive import archive_messages_before, message_history
+from .membership import add_members, remove_members
+from .models import ArchivedGroupMessage, DonorGroup, GroupContributionStats, GroupMembership, GroupMessage
+
+
+class MembershipTests(TestCase):
+  def setUp(self):
+    User = get_user_model()
+    self.leader = User.objects.create_user("leader", password="pw")
+    self.users = [User.objects.create_user(f"member{i}", email=f"member{i}@example.org") for i in range(4)]
+    self.group = DonorGroup.objects.create(name="Circle", owner=self.leader)
+    add_members(self.group, [self.leader.id], role=GroupMembership.ROLE_LEADER)
+
+  def assertMemberCount(self, expected: int):
+    self.group.refresh_from_db()
+    self.assertEqual(self.group.member_count, expected)
+    self.assertEqual(GroupMembership.objects.filter(group=self.group).count(), expected)
+
+  def added_notices(self) -> set[str]:
+    return set(
+      Notification.objects.filter(kind=Notification.KIND_GROUP_ADDED, group=self.group).values_list("user__username", flat=True)
+    )
+
+  def flashed(self, response) -> list[str]:
+    return [str(m) for m in get_messages(response.wsgi_request)]
+
+  def test_add_returns_only_new_members(self):
+    first, second, third, _ = self.users
+    self.assertEqual(add_members(self.group, [first.id, second.id, first.id]), [first.id, second.id])
+    self.assertEqual(add_members(self.group, [second.id, third.id, self.leader.id]), [third.id])
+    self.assertEqual(add_members(self.group, [third.id]), [])
+    self.assertMemberCount(4)
+
+  def test_remove_keeps_member_count(self):
+    add_members(self.group, [u.id for u in self.users])
+    self.assertEqual(remove_members(self.group, [self.users[0].id, self.users[1].id]), 2)
+    self.assertEqual(remove_members(self.group, [self.users[0].id]), 0)
+    self.assertMemberCount(3)
+
+  def test_bulk_add_notifies_only_new_members(self):
+    add_members(self.group, [self.users[0].id])
+    self.client.force_login(self.leader)
+    names = "member0\nmember1, MEMBER2@example.org\nmember1\nnobody"
+    self.client.post(f"/groups/{self.group.id}/members/bulk-add/", {"names": names})
+
+    self.assertMemberCount(4)
+    self.assertEqual(self.added_notices(), {"member1", "member2"})
+
+  def test_bulk_remove_and_leave_keep_member_count(self):
+    add_members(self.group, [u.id for u in self.users])
+    self.client.force_login(self.leader)
+    self.client.post(f"/groups/{self.group.id}/members/bulk-remove/", {"names": "member0 member1 nobody"})
+    self.assertMemberCount(3)
+
+    self.client.force_login(self.users[2])
+    self.client.post(f"/groups/{self.group.id}/leave/")
+    self.assertMemberCount(2)
+
+  def test_bulk_add_reads_csv_upload(self):
+    self.client.force_login(self.leader)
+    upload = SimpleUploadedFile("members.csv", b"\xef\xbb\xbfusername\nmember0\n\"member1\"\n")
+    self.client.post(f"/groups/{self.group.id}/members/bulk-add/", {"csv_file": upload})
+    self.assertEqual(self.added_notices(), {"member0", "member1"})
+
+  def test_bulk_add_rejects_oversized_upload(self):
+    self.client.force_login(self.leader)
+    upload = SimpleUploadedFile("members.csv", b"member0\n" + b"x" * views.BULK_MEMBERS_UPLOAD_MAX_BYTES)
+    with mock.patch.object(views, "_resolve_users") as resolve_users:
+      response = self.client.post(f"/groups/{self.group.id}/members/bulk-add/", {"csv_file": upload})
+    resolve_users.assert_not_called()
+    self.assertIn("The CSV file must be at most 64 KB.", self.flashed(response))
+    self.assertMemberCount(1)
+
+  def test_bulk_remove_rejects_too_many_names(self):
+    self.client.force_login(self.leader)
+    names = "\n".join(f"user{i}" for i in range(views.BULK_MEMBERS_MAX + 1))
+    with mock.patch.object(views, "_resolve_users") as resolve_users:
+      response = self.client.post(f"/groups/{self.group.id}/members/bulk-remove/", {"names": names})
+    resolve_users.assert_not_called()
+    self.assertIn(f"At most {views.BULK_MEMBERS_MAX} names per submission.", self.flashed(response))
+
+
+class GroupStatsTests(TestCase):
+  def setUp(self):
+    User = get_user_model()
+    self.owner = User.objects.create_user("owner", password="pw")
+    self.alice = User.objects.create_user("alice")
+    self.bob = User.objects.create_user("bob")
+    end_date = timezone.localdate() + timedelta(days=30)
+    self.wells = Campaign.objects.create(created_by=self.owner, title="Wells", description="d", goal_amount=1000, end_date=end_date)
+    self.school = Campaign.objects.create(created_by=self.owner, title="School", description="d", goal_amount=1000, end_date=end_date)
+    self.group = DonorGroup.objects.create(name="Circle", owner=self.alice)
+    add_members(self.group, [self.alice.id, self.bob.id])
+    self.client.force_login(self.owner)
+
+  def donate(self, donor, campaign, amount, **kwargs) -> Donation:
+    return Donation.objects.create(campaign=campaign, donor=donor, group=self.group, amount=Decimal(amount), **kwargs)
+
+  def decide(self, donation: Donation, action: str):
+    self.client.post(f"/campaigns/{donation.campaign_id}/donation-requests/{donation.id}/{action}/")
+
+  def stats(self) -> dict:
+    return {
+      (row.campaign_id, row.member_id): (row.total_amount, row.donation_count)
+      for row in GroupContributionStats.objects.filter(group=self.group)
+    }
+
+  def test_approve_and_reject_update_totals(self):
+    first = self.donate(self.alice, self.wells, "100")
+    second = self.donate(self.alice, self.school, "40")
+    anonymous = self.donate(self.bob, self.wells, "25", is_anonymous=True)
+    rejected = self.donate(self.bob, self.school, "999")
+    for donation in (first, second, anonymous):
+      self.decide(donation, "approve")
+    self.decide(rejected, "reject")
+
+    self.assertEqual(self.stats(), {
+      (None, None): (Decimal("165"), 3),
+      (self.wells.id, None): (Decimal("125"), 2),
+      (self.school.id, None): (Decimal("40"), 1),
+      # The anonymous donation counts for the group and campaign, not for bob.
+      (None, self.alice.id): (Decimal("140"), 2),
+    })
+
+  def test_rebuild_matches_incremental_totals(self):
+    for donor, campaign, amount in ((self.alice, self.wells, "100"), (self.bob, self.wells, "60"), (self.bob, self.school, "5")):
+      self.decide(self.donate(donor, campaign, amount), "approve")
+    self.donate(self.alice, self.school, "70")
+    incremental = self.stats()
+
+    GroupContributionStats.objects.filter(group=self.group).update(total_amount=0, donation_count=0)
+    call_command("rebuild_group_stats", group_ids=[self.group.id], stdout=StringIO())
+
+    self.assertEqual(self.stats(), incremental)
+    self.assertEqual(incremental[(None, None)], (Decimal("165"), 3))
+
+
+class ArchiveTests(TestCase):
+  def setUp(self):
+    self.alice = get_user_model().objects.create_user("alice", password="pw")
+    self.group = DonorGroup.objects.create(name="Circle", owner=self.alice)
+    add_members(self.group, [self.alice.id])
+    other = DonorGroup.objects.create(name="Other", owner=self.alice)
+    self.ids = []
+    for i in range(7):
+      self.ids.append(GroupMessage.objects.create(group=self.group, sender=self.alice, content=f"message {i}").id)
+      GroupMessage.objects.create(group=other, sender=self.alice, content=f"elsewhere {i}")
+    # The oldest four messages of each group fall outside the retention window.
+    old = GroupMessage.objects.order_by("id")[:8].values_list("id", flat=True)
+    GroupMessage.objects.filter(id__in=list(old)).update(created_at=timezone.now() - timedelta(days=40))
+
+  def archive(self) -> str:
+    out = StringIO()
+    call_command("archive_group_messages", days=30, batch_size=3, stdout=out)
+    return out.getvalue()
+
+  def test_archive_keeps_ids(self):
+    self.assertIn("Archived 8 group message(s)", self.archive())
+    self.assertIn("Archived 0 group message(s)", self.archive())
+
+    archived = ArchivedGroupMessage.objects.filter(group=self.group).order_by("id")
+    self.assertEqual([m.id for m in archived], self.ids[:4])
+    self.assertEqual([m.content for m in archived], [f"message {i}" for i in range(4)])
+    self.assertEqual(list(GroupMessage.objects.filter(group=self.group).order_by("id").values_list("id", flat=True)), self.ids[4:])
+
+  def test_history_pages_across_the_archive(self):
+    self.archive()
+    seen = []
+    before_id = None
+    while True:
+      page, has_more = message_history(self.group, before_id=before_id, limit=3)
+      seen = [m.id for m in page] + seen
+      if not has_more:
+        break
+      before_id = page[0].id
+    self.assertEqual(seen, self.ids)
+
+  def test_history_view_reaches_archived_messages(self):
+    self.archive()
+    self.client.force_login(self.alice)
+    response = self.client.get(f"/groups/{self.group.id}/messages/history/", {"before": self.ids[4]}, headers={"HX-Request": "true"})
+    self.assertContains(response, "message 3")
+    self.assertContains(response, "message 0")
+    self.assertNotContains(response, "message 4")
+    self.assertNotContains(response, "elsewhere")
+
+
+class SearchTests(TestCase):
+  """Search on SQLite's FTS5 table, which covers hot and archived messages alike."""
+
+  def setUp(self):
+    if connection.vendor != "sqlite" or not search._has_fts_table():
+      self.skipTest("needs SQLite with FTS5")
+    self.alice = get_user_model().objects.create_user("alice", password="pw")
+    self.group = DonorGroup.objects.create(name="Circle", owner=self.alice)
+    add_members(self.group, [self.alice.id])
+    other = DonorGroup.objects.create(name="Other", owner=self.alice)
+    contents = [
+      "Digging wells this weekend",
+      "Water wells need pumps",
+      "Who can drive to the wells?",
+      "The well is finished",
+      "Lunch at noon",
+      "Wells, wells and more wells",
+      "Thanks for the Wellington donation",
+    ]
+    self.ids = {c: GroupMessage.objects.create(group=self.group, sender=self.alice, content=c).id for c in contents}
+    GroupMessage.objects.create(group=other, sender=self.alice, content="Other wells")
+    # Move the first three into the archive.
+    GroupMessage.objects.filter(id__lte=self.ids["Who can drive to the wells?"]).update(created_at=timezone.now() - timedelta(days=40))
+    archive_messages_before(timezone.now() - timedelta(days=30))
+
+  def search_all(self, query: str, limit: int) -> list:
+    found = []
+    cursor = None
+    while True:
+      page, cursor = search.search_messages(self.group, query, cursor=cursor, limit=limit)
+      self.assertLessEqual(len(page), limit)
+      found += page
+      if cursor is None:
+        return found
+
+  def test_matches_hot_and_archived_messages(self):
+    with mock.patch.object(search, "_fallback_hits") as fallback:
+      found = self.search_all("wells", limit=10)
+    fallback.assert_not_called()
+
+    expected = {"Digging wells this weekend", "Water wells need pumps", "Who can drive to the wells?", "Wells, wells and more wells"}
+    self.assertEqual({m.content for m in found}, expected)
+    self.assertEqual({type(m) for m in found}, {GroupMessage, ArchivedGroupMessage})
+    # The message repeating the term ranks first.
+    self.assertEqual(found[0].content, "Wells, wells and more wells")
+    self.assertIn("<mark>Wells</mark>", found[0].highlighted)
+
+  def test_cursor_pages_without_gaps_or_repeats(self):
+    everything = [m.id for m in self.search_all("wel", limit=50)]
+    paged = [m.id for m in self.search_all("wel", limit=2)]
+    self.assertEqual(paged, everything)
+    self.assertEqual(len(everything), 6)
+
+  def test_all_terms_must_match(self):
+    found = self.search_all("water wells", limit=10)
+    self.assertEqual([m.id for m in found], [self.ids["Water wells need pumps"]])
+
+  def test_search_view_pages(self):
+    self.client.force_login(self.alice)
+    path = f"/groups/{self.group.id}/messages/search/"
+    response = self.client.get(path, {"q": "wells"}, headers={"HX-Request": "true"})
+    next_cursor = response.context["next_cursor"]
+    self.assertEqual(len(response.context["results"]), 4)
+    self.assertIsNone(next_cursor)
+    self.assertContains(response, "Digging <mark>wells</mark>")
+    self.assertNotContains(response, "Other wells")
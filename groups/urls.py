@@ -1,16 +1,24 @@
 from django.urls import path
 
+from core.querybudget import query_budget
+
 from . import views
 
 app_name = "groups"
 
 urlpatterns = [
-  path("", views.group_list, name="list"),
+  path("", query_budget(views.group_list, queries=6), name="list"),
   path("new/", views.group_create, name="create"),
-  path("<int:group_id>/", views.group_detail, name="detail"),
+  path("leaderboard/", query_budget(views.group_leaderboard, queries=6), name="leaderboard"),
+  path("<int:group_id>/", query_budget(views.group_detail, queries=19), name="detail"),
   path("<int:group_id>/image/", views.group_update_image, name="update_image"),
+  path("<int:group_id>/members/", views.group_members, name="members"),
   path("<int:group_id>/members/add/", views.group_add_member, name="add_member"),
+  path("<int:group_id>/members/bulk-add/", views.group_bulk_add_members, name="bulk_add_members"),
+  path("<int:group_id>/members/bulk-remove/", views.group_bulk_remove_members, name="bulk_remove_members"),
   path("<int:group_id>/members/<int:user_id>/remove/", views.group_remove_member, name="remove_member"),
-  path("<int:group_id>/messages/", views.group_post_message, name="post_message"),
+  path("<int:group_id>/messages/", query_budget(views.group_post_message, queries=19), name="post_message"),
+  path("<int:group_id>/messages/history/", query_budget(views.group_message_history, queries=9), name="message_history"),
+  path("<int:group_id>/messages/search/", query_budget(views.group_message_search, queries=10), name="message_search"),
   path("<int:group_id>/leave/", views.group_leave, name="leave"),
 ]
@@ -1,16 +1,103 @@
 from __future__ import annotations
 
+import re
+
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import Lower
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from core.metrics import GROUP_MESSAGES
 from donations.models import Donation
 
 from user.models import Notification
+from user.notifications import mark_read, notify, notify_coalesced_many, notify_many
+
+from .archive import message_history
+from .membership import add_members, is_member, member_page, remove_members
+from .models import DonorGroup, GroupContributionStats, GroupMembership, GroupMessage, GroupMessageReadState
+from .search import search_messages
+
+# Upper bound on names accepted by one bulk add/remove submission.
+BULK_MEMBERS_MAX = 1000
+
+# Largest CSV accepted for bulk add/remove; BULK_MEMBERS_MAX names fit well within it.
+BULK_MEMBERS_UPLOAD_MAX_BYTES = 64 * 1024
+
+LEADERBOARD_SIZE = 20
+
+MESSAGES_PAGE_SIZE = 50
+
+# Members handled per round when fanning out unread-message notifications.
+MESSAGE_FANOUT_BATCH = 500
+
+
+def _member_upload_too_large(request: HttpRequest) -> bool:
+  upload = request.FILES.get("csv_file")
+  return bool(upload) and upload.size > BULK_MEMBERS_UPLOAD_MAX_BYTES
+
+
+def _parse_member_list(request: HttpRequest) -> list[str]:
+  """Usernames/emails from the pasted text and/or an uploaded CSV, de-duplicated in order.
+
+  Stops after BULK_MEMBERS_MAX + 1 names: enough for the caller to reject the list.
+  """
+  raw = request.POST.get("names") or ""
+  upload = request.FILES.get("csv_file")
+  if upload:
+    raw += "\n" + upload.read(BULK_MEMBERS_UPLOAD_MAX_BYTES).decode("utf-8-sig", errors="ignore")
+
+  seen = set()
+  result = []
+  for match in re.finditer(r"[^\s,;]+", raw):
+    token = match.group().strip('"')
+    key = token.lower()
+    if not token or key in seen:
+      continue
+    seen.add(key)
+    result.append(token)
+    if len(result) > BULK_MEMBERS_MAX:
+      break
+  return result
+
 
-from .models import DonorGroup, GroupMessage, GroupMessageReadState
+def _resolve_users(names: list[str]) -> tuple[dict[str, int], list[str]]:
+  """Map each name to a user id in one query; returns (matches, unknown names)."""
+  emails = [n.lower() for n in names if "@" in n]
+  usernames = [n for n in names if "@" not in n]
+
+  User = get_user_model()
+  rows = (
+    User.objects.annotate(email_lower=Lower("email"))
+    .filter(Q(username__in=usernames) | Q(email_lower__in=emails))
+    .values_list("id", "username", "email_lower")
+  )
+  by_username = {}
+  by_email = {}
+  for user_id, username, email in rows:
+    by_username[username] = user_id
+    by_email.setdefault(email, user_id)
+
+  matches = {}
+  unknown = []
+  for name in names:
+    user_id = by_email.get(name.lower()) if "@" in name else by_username.get(name)
+    if user_id is None:
+      unknown.append(name)
+    else:
+      matches[name] = user_id
+  return matches, unknown
+
+
+def _report_unknown(request: HttpRequest, unknown: list[str]) -> None:
+  if unknown:
+    shown = ", ".join(unknown[:20])
+    more = f" (+{len(unknown) - 20} more)" if len(unknown) > 20 else ""
+    messages.warning(request, f"Not found: {shown}{more}")
 
 
 @login_required
@@ -30,7 +117,7 @@ def group_create(request: HttpRequest) -> HttpResponse:
       messages.error(request, "Group name is required.")
     else:
       group = DonorGroup.objects.create(name=name, image_url=image_url, description=description, owner=request.user)
-      group.members.add(request.user)
+      add_members(group, [request.user.id], role=GroupMembership.ROLE_LEADER)
       messages.success(request, "Group created.")
       return redirect("groups:detail", group_id=group.id)
 
@@ -39,8 +126,8 @@ def group_create(request: HttpRequest) -> HttpResponse:
 
 @login_required
 def group_detail(request: HttpRequest, group_id: int) -> HttpResponse:
-  group = get_object_or_404(DonorGroup.objects.prefetch_related("members"), id=group_id)
-  if not group.members.filter(id=request.user.id).exists():
+  group = get_object_or_404(DonorGroup, id=group_id)
+  if not is_member(group.id, request.user.id):
     messages.error(request, "You are not a member of this group.")
     return redirect("groups:list")
 
@@ -56,29 +143,119 @@ def group_detail(request: HttpRequest, group_id: int) -> HttpResponse:
     donations_qs = donations_qs.filter(amount__lte=max_value)
   donations = donations_qs.select_related("campaign", "donor")[:20]
 
-  messages_qs = GroupMessage.objects.filter(group=group).select_related("sender").order_by("-created_at")[:50]
-  messages_list = list(messages_qs)
-  messages_list.reverse()
+  messages_list, has_older = message_history(group, limit=MESSAGES_PAGE_SIZE)
 
   latest_id = messages_list[-1].id if messages_list else 0
   if latest_id:
     GroupMessageReadState.objects.update_or_create(group=group, user=request.user, defaults={"last_read_message_id": latest_id})
-    Notification.objects.filter(
-      user=request.user,
-      kind=Notification.KIND_GROUP_MESSAGES,
-      group=group,
-      is_read=False,
-    ).update(is_read=True)
+    mark_read(
+      Notification.objects.filter(
+        user=request.user,
+        kind=Notification.KIND_GROUP_MESSAGES,
+        group=group,
+      )
+    )
+
+  stats = GroupContributionStats.objects.filter(group=group)
+  group_total = stats.filter(campaign__isnull=True, member__isnull=True).first()
+  top_campaigns = (
+    stats.filter(campaign__isnull=False).select_related("campaign").order_by("-total_amount")[:5]
+  )
+  top_members = stats.filter(member__isnull=False).select_related("member").order_by("-total_amount")[:10]
 
   context = {
     "group": group,
     "donations": donations,
     "messages": messages_list,
+    "has_older": has_older,
     "is_owner": group.owner_id == request.user.id,
+    "group_total": group_total,
+    "top_campaigns": top_campaigns,
+    "top_members": top_members,
+    **member_page(group, 1),
   }
   return render(request, "groups/group_detail.html", context)
 
 
+@login_required
+def group_message_history(request: HttpRequest, group_id: int) -> HttpResponse:
+  group = get_object_or_404(DonorGroup, id=group_id)
+  if not is_member(group.id, request.user.id):
+    messages.error(request, "You are not a member of this group.")
+    return redirect("groups:list")
+
+  if not request.htmx:
+    return redirect("groups:detail", group_id=group.id)
+
+  try:
+    before_id = int(request.GET.get("before") or 0) or None
+  except ValueError:
+    before_id = None
+
+  chat_messages, has_older = message_history(group, before_id=before_id, limit=MESSAGES_PAGE_SIZE)
+  context = {
+    "group": group,
+    "chat_messages": chat_messages,
+    "has_older": has_older,
+  }
+  return render(request, "groups/partials/message_page.html", context)
+
+
+@login_required
+def group_message_search(request: HttpRequest, group_id: int) -> HttpResponse:
+  group = get_object_or_404(DonorGroup, id=group_id)
+  if not is_member(group.id, request.user.id):
+    messages.error(request, "You are not a member of this group.")
+    return redirect("groups:list")
+
+  if not request.htmx:
+    return redirect("groups:detail", group_id=group.id)
+
+  query = (request.GET.get("q") or "").strip()
+  results, next_cursor = search_messages(group, query, cursor=request.GET.get("cursor"))
+  context = {
+    "group": group,
+    "query": query,
+    "results": results,
+    "next_cursor": next_cursor,
+    "is_next_page": bool(request.GET.get("cursor")),
+  }
+  return render(request, "groups/partials/message_search_results.html", context)
+
+
+@login_required
+def group_members(request: HttpRequest, group_id: int) -> HttpResponse:
+  group = get_object_or_404(DonorGroup, id=group_id)
+  if not is_member(group.id, request.user.id):
+    messages.error(request, "You are not a member of this group.")
+    return redirect("groups:list")
+
+  if not request.htmx:
+    return redirect("groups:detail", group_id=group.id)
+
+  try:
+    page = int(request.GET.get("page") or 1)
+  except ValueError:
+    page = 1
+
+  context = {
+    "group": group,
+    "is_owner": group.owner_id == request.user.id,
+    **member_page(group, page),
+  }
+  return render(request, "groups/partials/member_list.html", context)
+
+
+@login_required
+def group_leaderboard(request: HttpRequest) -> HttpResponse:
+  top_groups = (
+    GroupContributionStats.objects.filter(campaign__isnull=True, member__isnull=True, total_amount__gt=0)
+    .select_related("group")
+    .order_by("-total_amount")[:LEADERBOARD_SIZE]
+  )
+  return render(request, "groups/leaderboard.html", {"top_groups": top_groups})
+
+
 @login_required
 def group_update_image(request: HttpRequest, group_id: int) -> HttpResponse:
   group = get_object_or_404(DonorGroup, id=group_id)
@@ -117,11 +294,14 @@ def group_add_member(request: HttpRequest, group_id: int) -> HttpResponse:
     messages.error(request, "User not found.")
     return redirect("groups:detail", group_id=group.id)
 
-  group.members.add(user)
-  Notification.objects.create(
-    user=user,
-    kind=Notification.KIND_GROUP_ADDED,
-    message=f"Bạn đã được thêm vào nhóm '{group.name}'.",
+  if not add_members(group, [user.id]):
+    messages.info(request, f"{user.username} is already in the group.")
+    return redirect("groups:detail", group_id=group.id)
+
+  notify(
+    user,
+    Notification.KIND_GROUP_ADDED,
+    f"Bạn đã được thêm vào nhóm '{group.name}'.",
     url=f"/groups/{group.id}/",
     group=group,
   )
@@ -129,10 +309,91 @@ def group_add_member(request: HttpRequest, group_id: int) -> HttpResponse:
   return redirect("groups:detail", group_id=group.id)
 
 
+@login_required
+def group_bulk_add_members(request: HttpRequest, group_id: int) -> HttpResponse:
+  group = get_object_or_404(DonorGroup, id=group_id)
+  if group.owner_id != request.user.id:
+    messages.error(request, "Only the group leader can add members.")
+    return redirect("groups:detail", group_id=group.id)
+
+  if request.method != "POST":
+    return redirect("groups:detail", group_id=group.id)
+
+  if _member_upload_too_large(request):
+    messages.error(request, f"The CSV file must be at most {BULK_MEMBERS_UPLOAD_MAX_BYTES // 1024} KB.")
+    return redirect("groups:detail", group_id=group.id)
+
+  names = _parse_member_list(request)
+  if not names:
+    messages.error(request, "Paste at least one username or email.")
+    return redirect("groups:detail", group_id=group.id)
+  if len(names) > BULK_MEMBERS_MAX:
+    messages.error(request, f"At most {BULK_MEMBERS_MAX} names per submission.")
+    return redirect("groups:detail", group_id=group.id)
+
+  matches, unknown = _resolve_users(names)
+  user_ids = list(dict.fromkeys(matches.values()))
+
+  with transaction.atomic():
+    new_ids = add_members(group, user_ids)
+    notify_many(
+      new_ids,
+      Notification.KIND_GROUP_ADDED,
+      f"Bạn đã được thêm vào nhóm '{group.name}'.",
+      url=f"/groups/{group.id}/",
+      group=group,
+    )
+
+  messages.success(request, f"Added {len(new_ids)} member(s). {len(user_ids) - len(new_ids)} already in the group.")
+  _report_unknown(request, unknown)
+  return redirect("groups:detail", group_id=group.id)
+
+
+@login_required
+def group_bulk_remove_members(request: HttpRequest, group_id: int) -> HttpResponse:
+  group = get_object_or_404(DonorGroup, id=group_id)
+  if group.owner_id != request.user.id:
+    messages.error(request, "Only the group leader can remove members.")
+    return redirect("groups:detail", group_id=group.id)
+
+  if request.method != "POST":
+    return redirect("groups:detail", group_id=group.id)
+
+  if _member_upload_too_large(request):
+    messages.error(request, f"The CSV file must be at most {BULK_MEMBERS_UPLOAD_MAX_BYTES // 1024} KB.")
+    return redirect("groups:detail", group_id=group.id)
+
+  names = _parse_member_list(request)
+  if not names:
+    messages.error(request, "Paste at least one username or email.")
+    return redirect("groups:detail", group_id=group.id)
+  if len(names) > BULK_MEMBERS_MAX:
+    messages.error(request, f"At most {BULK_MEMBERS_MAX} names per submission.")
+    return redirect("groups:detail", group_id=group.id)
+
+  matches, unknown = _resolve_users(names)
+  # The leader always stays in the group.
+  user_ids = [uid for uid in set(matches.values()) if uid != group.owner_id]
+
+  removed = remove_members(group, user_ids)
+
+  messages.success(request, f"Removed {removed} member(s).")
+  _report_unknown(request, unknown)
+  return redirect("groups:detail", group_id=group.id)
+
+
+def _unread_after(group: DonorGroup, positions: set[int]) -> dict[int, int]:
+  """Messages after each read position, counted in one query."""
+  counts = GroupMessage.objects.filter(group=group, id__gt=min(positions)).aggregate(
+    **{f"after_{position}": Count("id", filter=Q(id__gt=position)) for position in positions}
+  )
+  return {position: counts[f"after_{position}"] for position in positions}
+
+
 @login_required
 def group_post_message(request: HttpRequest, group_id: int) -> HttpResponse:
-  group = get_object_or_404(DonorGroup.objects.prefetch_related("members"), id=group_id)
-  if not group.members.filter(id=request.user.id).exists():
+  group = get_object_or_404(DonorGroup, id=group_id)
+  if not is_member(group.id, request.user.id):
     messages.error(request, "You are not a member of this group.")
     return redirect("groups:list")
 
@@ -145,23 +406,33 @@ def group_post_message(request: HttpRequest, group_id: int) -> HttpResponse:
     return redirect("groups:detail", group_id=group.id)
 
   GroupMessage.objects.create(group=group, sender=request.user, content=content)
-
-  # Update unread-message notification for other members.
-  for member in group.members.all():
-    if member.id == request.user.id:
-      continue
-
-    read_state, _ = GroupMessageReadState.objects.get_or_create(group=group, user=member, defaults={"last_read_message_id": 0})
-    unread_count = GroupMessage.objects.filter(group=group, id__gt=read_state.last_read_message_id).count()
-    Notification.objects.update_or_create(
-      user=member,
-      kind=Notification.KIND_GROUP_MESSAGES,
+  GROUP_MESSAGES.inc_on_commit()
+
+  # Update unread-message notification for other members, in batches rather
+  # than a few queries per member.
+  other_ids = GroupMembership.objects.filter(group=group).exclude(user_id=request.user.id).values_list("user_id", flat=True)
+  last_member_id = 0
+  while True:
+    member_ids = list(other_ids.filter(user_id__gt=last_member_id).order_by("user_id")[:MESSAGE_FANOUT_BATCH])
+    if not member_ids:
+      break
+    last_member_id = member_ids[-1]
+
+    last_read = dict(
+      GroupMessageReadState.objects.filter(group=group, user_id__in=member_ids).values_list("user_id", "last_read_message_id")
+    )
+    unread_by_position = _unread_after(group, {last_read.get(member_id, 0) for member_id in member_ids})
+    messages_by_user = {
+      member_id: f"Nhóm '{group.name}' có {unread_by_position[last_read.get(member_id, 0)]} tin nhắn mới chưa đọc."
+      for member_id in member_ids
+    }
+
+    notify_coalesced_many(
+      messages_by_user,
+      Notification.KIND_GROUP_MESSAGES,
+      coalesce_key=f"group_messages:{group.id}",
+      url=f"/groups/{group.id}/",
       group=group,
-      defaults={
-        "message": f"Nhóm '{group.name}' có {unread_count} tin nhắn mới chưa đọc.",
-        "url": f"/groups/{group.id}/",
-        "is_read": False,
-      },
     )
 
   return redirect("groups:detail", group_id=group.id)
@@ -181,7 +452,7 @@ def group_remove_member(request: HttpRequest, group_id: int, user_id: int) -> Ht
     messages.error(request, "You cannot remove the leader.")
     return redirect("groups:detail", group_id=group.id)
 
-  group.members.remove(user_id)
+  remove_members(group, [user_id])
   messages.success(request, "Member removed.")
   return redirect("groups:detail", group_id=group.id)
 
@@ -189,6 +460,6 @@ def group_remove_member(request: HttpRequest, group_id: int, user_id: int) -> Ht
 @login_required
 def group_leave(request: HttpRequest, group_id: int) -> HttpResponse:
   group = get_object_or_404(DonorGroup, id=group_id)
-  group.members.remove(request.user)
+  remove_members(group, [request.user.id])
   messages.success(request, "Left group.")
   return redirect("groups:list")
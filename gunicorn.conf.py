@@ -0,0 +1,30 @@
+"""Gunicorn settings, read from the working directory (render.yaml's startCommand)."""
+
+import os
+import shutil
+
+
+def on_starting(server):
+  # Worker metric snapshots from a previous run would be summed into this one's.
+  os.environ.setdefault("DJANGO_SETTINGS_MODULE", "CrowdfundingProject.settings")
+  if server.cfg.worker_class_str.startswith("uvicorn."):
+    # Workers inherit the settings loaded here, before asgi.py could set this.
+    os.environ.setdefault("ASYNC_READ_VIEWS", "True")
+  from django.conf import settings
+
+  shutil.rmtree(settings.METRICS_DIR, ignore_errors=True)
+
+
+def post_worker_init(worker):
+  # Only web workers write metric snapshots (see core.metrics).
+  from core import metrics
+
+  metrics.start_worker()
+
+
+def worker_exit(server, worker):
+  if not worker.booted:
+    return  # the application never loaded
+  from core import metrics
+
+  metrics.flush(force=True)
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from django.conf import settings
 
-from .models import Notification, Profile
+from .middleware import get_profile
 
 
 def nav_profile(request):
@@ -15,10 +15,12 @@ def nav_profile(request):
       "ui_theme": ui_theme,
     }
 
-  unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
+  # The badge reads the denormalized counter from the request-scoped profile we
+  # already load for the avatar, so it costs no extra query.
+  profile = get_profile(request)
 
   return {
-    "nav_profile": Profile.get_or_create_for_user(request.user),
-    "unread_notifications_count": unread_count,
+    "nav_profile": profile,
+    "unread_notifications_count": profile.unread_count,
     "ui_theme": ui_theme,
   }
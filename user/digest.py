@@ -0,0 +1,173 @@
+"""Email digests of unread notifications.
+
+Run `manage.py send_notification_digests` from cron (hourly is enough for
+both cadences). Each due user gets at most one email per window listing the
+unread notifications that have not been emailed yet. A batch is claimed
+(its rows stamped with `emailed_at`, its users' `last_digest_at` moved on)
+before it is rendered and handed to the mail backend, and handed back if
+sending fails. Only the rows a run's own claim stamped go out, so neither a
+rerun nor an overlapping run sends the same notification twice. A process
+killed while sending drops that batch instead.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import get_template
+from django.urls import reverse
+from django.utils import timezone, translation
+from django.utils.translation import ngettext
+
+from .models import Notification, Profile
+
+WINDOWS = {
+  Profile.DIGEST_HOURLY: timedelta(hours=1),
+  Profile.DIGEST_DAILY: timedelta(days=1),
+}
+
+DIGEST_KINDS = [
+  Notification.KIND_DONATION,
+  Notification.KIND_GROUP_ADDED,
+  Notification.KIND_GROUP_MESSAGES,
+  Notification.KIND_CAMPAIGN_UPDATE,
+  Notification.KIND_CAMPAIGN_EVENT,
+  Notification.KIND_CAMPAIGN_CLOSED,
+]
+
+
+@dataclass
+class Digest:
+  profile: Profile
+  notifications: list[Notification] = field(default_factory=list)
+
+
+def _absolute_url(url: str) -> str:
+  if not url or "://" in url:
+    return url
+  return settings.SITE_URL.rstrip("/") + url
+
+
+def due_profiles(window: str, now: datetime):
+  """Profiles on `window` cadence whose last digest is at least one window old."""
+  cutoff = now - WINDOWS[window]
+  return (
+    Profile.objects.filter(email_digest=window)
+    .exclude(user__email="")
+    .filter(Q(last_digest_at__isnull=True) | Q(last_digest_at__lte=cutoff))
+    .select_related("user")
+    .order_by("user_id")
+  )
+
+
+def build_digests(window: str, now: datetime | None = None) -> list[Digest]:
+  """Group pending notifications per due user in one query."""
+  now = now or timezone.now()
+  profiles = {p.user_id: p for p in due_profiles(window, now)}
+  if not profiles:
+    return []
+
+  pending = (
+    Notification.objects.filter(
+      user_id__in=list(profiles),
+      kind__in=DIGEST_KINDS,
+      is_read=False,
+      emailed_at__isnull=True,
+      created_at__lte=now,
+    )
+    .order_by("user_id", "-created_at", "-id")
+  )
+
+  by_user: dict[int, list[Notification]] = defaultdict(list)
+  for notification in pending.iterator():
+    since = profiles[notification.user_id].last_digest_at or (now - WINDOWS[window])
+    if notification.created_at > since:
+      by_user[notification.user_id].append(notification)
+
+  return [Digest(profile=profiles[uid], notifications=items) for uid, items in by_user.items()]
+
+
+def render_digests(digests: list[Digest]) -> list[tuple[Digest, EmailMessage]]:
+  """Render one email per digest, switching the active language once per locale."""
+  template = get_template("user/email/notification_digest.txt")
+
+  by_language: dict[str, list[Digest]] = defaultdict(list)
+  for digest in digests:
+    by_language[digest.profile.language or settings.LANGUAGE_CODE].append(digest)
+
+  rendered = []
+  for language, group in by_language.items():
+    with translation.override(language):
+      for digest in group:
+        count = len(digest.notifications)
+        subject = ngettext(
+          "You have %(count)d new notification",
+          "You have %(count)d new notifications",
+          count,
+        ) % {"count": count}
+        body = template.render(
+          {
+            "user": digest.profile.user,
+            "notifications": [(n, _absolute_url(n.url)) for n in digest.notifications],
+            "notifications_url": _absolute_url(reverse("user:notifications")),
+            "profile_url": _absolute_url(reverse("user:profile")),
+          }
+        )
+        message = EmailMessage(subject=subject, body=body, to=[digest.profile.user.email])
+        rendered.append((digest, message))
+  return rendered
+
+
+def _claim(digests: list[Digest], now: datetime) -> list[Digest]:
+  """Stamp the notifications of `digests` that no other run has taken; the digests left with any."""
+  ids = [n.id for digest in digests for n in digest.notifications]
+  with transaction.atomic():
+    # An overlapping run may have built the same digests. Each run only sends
+    # the rows it stamps itself: on PostgreSQL the row locks keep two runs
+    # from taking the same ones, on SQLite the transactions run one at a time.
+    claimed = set(
+      Notification.objects.select_for_update(skip_locked=True)
+      .filter(id__in=ids, emailed_at__isnull=True)
+      .values_list("id", flat=True)
+    )
+    Notification.objects.filter(id__in=claimed).update(emailed_at=now)
+    for digest in digests:
+      digest.notifications = [n for n in digest.notifications if n.id in claimed]
+    digests = [digest for digest in digests if digest.notifications]
+    Profile.objects.filter(id__in=[digest.profile.id for digest in digests]).update(last_digest_at=now)
+  return digests
+
+
+def send_digests(window: str, now: datetime | None = None, batch_size: int | None = None, dry_run: bool = False) -> int:
+  """Build, claim, render and send digests over one reused mail connection. Returns emails sent."""
+  now = now or timezone.now()
+  batch_size = batch_size or settings.NOTIFICATION_DIGEST_BATCH_SIZE
+
+  digests = build_digests(window, now)
+  if dry_run or not digests:
+    return len(render_digests(digests))
+
+  sent = 0
+  with get_connection() as connection:
+    for start in range(0, len(digests), batch_size):
+      batch = _claim(digests[start : start + batch_size], now)
+      if not batch:
+        continue
+      rendered = render_digests(batch)
+      try:
+        connection.send_messages([message for _, message in rendered])
+      except BaseException:
+        # The profiles still hold their previous last_digest_at.
+        with transaction.atomic():
+          notification_ids = [n.id for digest in batch for n in digest.notifications]
+          Notification.objects.filter(id__in=notification_ids, emailed_at=now).update(emailed_at=None)
+          Profile.objects.bulk_update([digest.profile for digest in batch], ["last_digest_at"])
+        raise
+      sent += len(rendered)
+  return sent
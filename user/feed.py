@@ -0,0 +1,125 @@
+"""Personal activity feed: updates, events and donations from followed campaigns
+(see campaigns.fanout) plus messages from the user's groups.
+
+Each source is read with one indexed range query returning its newest
+`limit + 1` rows below the cursor; the already-sorted lists are then merged
+with heapq.merge. Items are ordered by (created_at, source rank, id)
+descending, which is also what the cursor encodes, so ties on created_at
+across sources page correctly. The first page is cached per user for
+FEED_CACHE_SECONDS and dropped when the user's follows, donations or group
+memberships change (see user/signals.py).
+"""
+
+from __future__ import annotations
+
+import heapq
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from core.cache import cached_query
+
+from campaigns.fanout import followed_campaign_ids
+from campaigns.models import Campaign, CampaignUpdate, Event
+from donations.models import Donation
+from groups.models import GroupMembership, GroupMessage
+
+FEED_PAGE_SIZE = 20
+
+KIND_UPDATE = "update"
+KIND_EVENT = "event"
+KIND_DONATION = "donation"
+KIND_MESSAGE = "message"
+
+# Tie-break between sources when created_at is equal.
+SOURCE_RANKS = {KIND_UPDATE: 0, KIND_EVENT: 1, KIND_DONATION: 2, KIND_MESSAGE: 3}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+@dataclass(frozen=True)
+class FeedItem:
+  kind: str
+  created_at: datetime
+  id: int
+  obj: object
+
+  @property
+  def sort_key(self) -> tuple[datetime, int, int]:
+    return (self.created_at, SOURCE_RANKS[self.kind], self.id)
+
+
+def encode_cursor(item: FeedItem) -> str:
+  micros = (item.created_at - _EPOCH) // _MICROSECOND
+  return f"{micros}_{SOURCE_RANKS[item.kind]}_{item.id}"
+
+
+def parse_cursor(raw: str) -> tuple[datetime, int, int] | None:
+  try:
+    micros_raw, rank_raw, id_raw = raw.split("_", 2)
+    return _EPOCH + int(micros_raw) * _MICROSECOND, int(rank_raw), int(id_raw)
+  except (ValueError, OverflowError):
+    return None
+
+
+def _below(cursor: tuple[datetime, int, int] | None, rank: int) -> Q:
+  """Rows of the source with `rank` whose sort key is below `cursor`."""
+  if cursor is None:
+    return Q()
+  created_at, cursor_rank, item_id = cursor
+  if rank < cursor_rank:
+    return Q(created_at__lte=created_at)
+  if rank > cursor_rank:
+    return Q(created_at__lt=created_at)
+  return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=item_id)
+
+
+def _sources(user_id: int) -> list[tuple[str, object]]:
+  campaign_ids = followed_campaign_ids(user_id)
+  campaign_ids.update(Campaign.objects.filter(created_by_id=user_id).values_list("id", flat=True))
+  group_ids = list(GroupMembership.objects.filter(user_id=user_id).values_list("group_id", flat=True))
+
+  sources = []
+  if campaign_ids:
+    campaign_ids = list(campaign_ids)
+    sources += [
+      (KIND_UPDATE, CampaignUpdate.objects.filter(campaign_id__in=campaign_ids).select_related("campaign")),
+      (KIND_EVENT, Event.objects.filter(campaign_id__in=campaign_ids).select_related("campaign")),
+      (
+        KIND_DONATION,
+        Donation.objects.filter(campaign_id__in=campaign_ids, status=Donation.STATUS_APPROVED)
+        .select_related("campaign", "donor")
+        .defer("amount"),
+      ),
+    ]
+  if group_ids:
+    sources.append((KIND_MESSAGE, GroupMessage.objects.filter(group_id__in=group_ids).select_related("group", "sender")))
+  return sources
+
+
+def _page(user_id: int, after: tuple[datetime, int, int] | None, limit: int) -> tuple[list[FeedItem], str]:
+  lists = []
+  for kind, qs in _sources(user_id):
+    rows = qs.filter(_below(after, SOURCE_RANKS[kind])).order_by("-created_at", "-id")[: limit + 1]
+    lists.append([FeedItem(kind, row.created_at, row.id, row) for row in rows])
+
+  items = list(islice(heapq.merge(*lists, key=lambda item: item.sort_key, reverse=True), limit + 1))
+  next_cursor = encode_cursor(items[limit - 1]) if len(items) > limit else ""
+  return items[:limit], next_cursor
+
+
+@cached_query("feed", ttl=settings.FEED_CACHE_SECONDS, key=str)
+def first_page(user_id: int) -> tuple[list[FeedItem], str]:
+  return _page(user_id, None, FEED_PAGE_SIZE)
+
+
+def feed_page(user_id: int, cursor: str = "", limit: int = FEED_PAGE_SIZE) -> tuple[list[FeedItem], str]:
+  """One page of the user's feed, newest first, plus the cursor for the next page ("" at the end)."""
+  after = parse_cursor(cursor) if cursor else None
+  if after is None and limit == FEED_PAGE_SIZE:
+    return first_page(user_id)
+  return _page(user_id, after, limit)
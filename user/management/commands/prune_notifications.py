@@ -0,0 +1,31 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from user.models import Notification
+
+
+class Command(BaseCommand):
+  help = "Deletes read notifications older than NOTIFICATION_RETENTION_DAYS in bounded batches."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--days", type=int, default=settings.NOTIFICATION_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=1000)
+
+  def handle(self, *args, **options):
+    cutoff = timezone.now() - timedelta(days=options["days"])
+    batch_size = options["batch_size"]
+
+    # Unread rows are kept regardless of age so Profile.unread_count stays correct.
+    stale = Notification.objects.filter(is_read=True, created_at__lt=cutoff).order_by("id")
+
+    deleted = 0
+    while True:
+      ids = list(stale.values_list("id", flat=True)[:batch_size])
+      if not ids:
+        break
+      deleted += Notification.objects.filter(id__in=ids).delete()[0]
+
+    self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} read notification(s) older than {options['days']} day(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from user.notifications import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+  help = "Recomputes Profile.unread_count from the notifications table. Run periodically (e.g. hourly cron)."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--user-id", type=int, action="append", dest="user_ids", help="Only reconcile these users.")
+
+  def handle(self, *args, **options):
+    updated = reconcile_unread_counts(options.get("user_ids"))
+    self.stdout.write(self.style.SUCCESS(f"Reconciled unread counts for {updated} profile(s)."))
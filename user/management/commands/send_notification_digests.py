@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from user.digest import WINDOWS, send_digests
+
+
+class Command(BaseCommand):
+  help = "Emails a digest of unread notifications to users whose hourly/daily window is due. Safe to rerun."
+
+  def add_arguments(self, parser):
+    parser.add_argument("--window", choices=sorted(WINDOWS), action="append", dest="windows", help="Defaults to all windows.")
+    parser.add_argument("--batch-size", type=int, default=None, help="Emails per SMTP batch.")
+    parser.add_argument("--dry-run", action="store_true", help="Build and render, but do not send.")
+
+  def handle(self, *args, **options):
+    for window in options.get("windows") or sorted(WINDOWS):
+      sent = send_digests(window, batch_size=options["batch_size"], dry_run=options["dry_run"])
+      verb = "Would send" if options["dry_run"] else "Sent"
+      self.stdout.write(self.style.SUCCESS(f"{verb} {sent} {window} digest(s)."))
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.utils.functional import SimpleLazyObject
+
+from .models import Profile
+
+
+def get_profile(request):
+  """Load the current user's profile at most once per request."""
+  if not hasattr(request, "_cached_profile"):
+    user = getattr(request, "user", None)
+    profile = None
+    if user is not None and user.is_authenticated:
+      profile = Profile.objects.select_related("user").filter(user_id=user.pk).first()
+      if profile is None:
+        # Users created before profiles were guaranteed (or via raw fixtures).
+        profile = Profile.get_or_create_for_user(user)
+    request._cached_profile = profile
+  return request._cached_profile
+
+
+async def aget_profile(request):
+  """get_profile() for async views, with the async ORM; call aload_user() first.
+
+  The nav_profile context processor then finds the profile (and the unread
+  badge count) already cached on the request.
+  """
+  if not hasattr(request, "_cached_profile"):
+    user = getattr(request, "user", None)
+    profile = None
+    if user is not None and user.is_authenticated:
+      profile = await Profile.objects.select_related("user").filter(user_id=user.pk).afirst()
+      if profile is None:
+        profile = await sync_to_async(Profile.get_or_create_for_user)(user)
+    request._cached_profile = profile
+  return request._cached_profile
+
+
+async def aload_user(request):
+  """Resolve `request.user` with the async ORM (loading the session too) and return it.
+
+  Async views call this first, so templates and sync helpers read an
+  already loaded user instead of querying from the event loop.
+  """
+  request.user = await request.auser()
+  return request.user
+
+
+class ProfileMiddleware:
+  """Attach a lazy `request.profile` (with `unread_count` for the navbar badge).
+
+  Must come after AuthenticationMiddleware.
+  """
+
+  sync_capable = async_capable = True
+
+  def __init__(self, get_response):
+    self.get_response = get_response
+    if iscoroutinefunction(get_response):
+      markcoroutinefunction(self)
+
+  def __call__(self, request):
+    request.profile = SimpleLazyObject(lambda: get_profile(request))
+    # In async mode this returns get_response's coroutine for the caller to await.
+    return self.get_response(request)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_unread_count(apps, schema_editor):
+    Profile = apps.get_model("user", "Profile")
+    Notification = apps.get_model("user", "Notification")
+
+    unread = (
+        Notification.objects.filter(user_id=OuterRef("user_id"), is_read=False)
+        .order_by()
+        .values("user_id")
+        .annotate(n=Count("id"))
+        .values("n")
+    )
+    Profile.objects.update(unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0005_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='unread_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_unread_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:52
+
+from django.conf import settings
+from django.db import migrations
+
+
+def backfill_profiles(apps, schema_editor):
+    app_label, model_name = settings.AUTH_USER_MODEL.split(".")
+    User = apps.get_model(app_label, model_name)
+    Profile = apps.get_model("user", "Profile")
+
+    missing = User.objects.filter(profile__isnull=True).values_list("id", flat=True)
+    Profile.objects.bulk_create([Profile(user_id=user_id, phone="") for user_id in missing.iterator()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0006_profile_unread_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_profiles, migrations.RunPython.noop),
+    ]
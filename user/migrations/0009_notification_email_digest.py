@@ -0,0 +1,40 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0004_group_messages'),
+        ('user', '0008_notification_coalescing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='emailed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='email_digest',
+            field=models.CharField(choices=[('off', 'Off'), ('hourly', 'Hourly'), ('daily', 'Daily')], default='off', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='language',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='last_digest_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('emailed_at__isnull', True), ('is_read', False)), fields=['user', 'created_at'], name='notification_digest_idx'),
+        ),
+    ]
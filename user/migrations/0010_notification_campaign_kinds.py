@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0009_notification_email_digest'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(choices=[('group_added', 'Group added'), ('donation', 'Donation'), ('group_messages', 'Group messages'), ('campaign_update', 'Campaign update'), ('campaign_event', 'Campaign event')], max_length=40),
+        ),
+    ]
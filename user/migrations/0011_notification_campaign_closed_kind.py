@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0010_notification_campaign_kinds'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(choices=[('group_added', 'Group added'), ('donation', 'Donation'), ('group_messages', 'Group messages'), ('campaign_update', 'Campaign update'), ('campaign_event', 'Campaign event'), ('campaign_closed', 'Campaign closed')], max_length=40),
+        ),
+    ]
@@ -5,6 +5,16 @@ from django.db import models
 
 
 class Profile(models.Model):
+	DIGEST_OFF = "off"
+	DIGEST_HOURLY = "hourly"
+	DIGEST_DAILY = "daily"
+
+	DIGEST_CHOICES = [
+		(DIGEST_OFF, "Off"),
+		(DIGEST_HOURLY, "Hourly"),
+		(DIGEST_DAILY, "Daily"),
+	]
+
 	user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="profile")
 
 	# Simplified roles for MVP
@@ -15,6 +25,15 @@ class Profile(models.Model):
 	interests = models.TextField(blank=True, default="")
 	avatar_url = models.URLField(blank=True, default="")
 
+	# Denormalized count of unread notifications for the navbar badge.
+	# Maintained by user.notifications; reconciled by `reconcile_unread_counts`.
+	unread_count = models.PositiveIntegerField(default=0)
+
+	# Email digest of unread notifications (see user.digest).
+	email_digest = models.CharField(max_length=10, choices=DIGEST_CHOICES, default=DIGEST_OFF)
+	language = models.CharField(max_length=10, blank=True, default="")
+	last_digest_at = models.DateTimeField(null=True, blank=True)
+
 	created_at = models.DateTimeField(auto_now_add=True)
 
 	@classmethod
@@ -30,11 +49,17 @@ class Notification(models.Model):
 	KIND_GROUP_ADDED = "group_added"
 	KIND_DONATION = "donation"
 	KIND_GROUP_MESSAGES = "group_messages"
+	KIND_CAMPAIGN_UPDATE = "campaign_update"
+	KIND_CAMPAIGN_EVENT = "campaign_event"
+	KIND_CAMPAIGN_CLOSED = "campaign_closed"
 
 	KIND_CHOICES = [
 		(KIND_GROUP_ADDED, "Group added"),
 		(KIND_DONATION, "Donation"),
 		(KIND_GROUP_MESSAGES, "Group messages"),
+		(KIND_CAMPAIGN_UPDATE, "Campaign update"),
+		(KIND_CAMPAIGN_EVENT, "Campaign event"),
+		(KIND_CAMPAIGN_CLOSED, "Campaign closed"),
 	]
 
 	user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="notifications")
@@ -45,8 +70,30 @@ class Notification(models.Model):
 	is_read = models.BooleanField(default=False)
 	created_at = models.DateTimeField(auto_now_add=True)
 
+	# Repeated notifications with the same key collapse into one unread row
+	# (e.g. "3 new donation requests for campaign X") instead of one row per event.
+	coalesce_key = models.CharField(max_length=120, blank=True, default="")
+	count = models.PositiveIntegerField(default=1)
+
+	# Set once the notification went out in an email digest; reruns skip it.
+	emailed_at = models.DateTimeField(null=True, blank=True)
+
 	class Meta:
-		ordering = ["-created_at"]
+		ordering = ["-created_at", "-id"]
+		indexes = [
+			models.Index(fields=["user", "-created_at", "-id"], name="notification_user_feed_idx"),
+			models.Index(
+				fields=["user", "coalesce_key"],
+				condition=models.Q(is_read=False),
+				name="notification_coalesce_idx",
+			),
+			models.Index(fields=["is_read", "created_at"], name="notification_prune_idx"),
+			models.Index(
+				fields=["user", "created_at"],
+				condition=models.Q(is_read=False, emailed_at__isnull=True),
+				name="notification_digest_idx",
+			),
+		]
 
 	def __str__(self) -> str:
 		return f"Notification({self.user_id}, {self.kind}, read={self.is_read})"
@@ -0,0 +1,193 @@
+"""Helpers for creating and reading notifications.
+
+Every write that changes how many unread notifications a user has goes
+through this module so `Profile.unread_count` (the navbar badge) stays in
+step without counting the notifications table on each page render.
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Callable, Iterable
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from core.metrics import NOTIFICATIONS
+
+from .models import Notification, Profile
+
+# A message is either a plain string or a callable building it from the
+# coalesced count (so it can pluralize "N new donation requests").
+Message = str | Callable[[int], str]
+
+
+def _render(message: Message, count: int) -> str:
+  return message(count) if callable(message) else message
+
+
+def _bump_unread(user_id: int, delta: int) -> None:
+  if not delta:
+    return
+  if delta > 0:
+    Profile.objects.filter(user_id=user_id).update(unread_count=F("unread_count") + delta)
+  else:
+    Profile.objects.filter(user_id=user_id).update(unread_count=Greatest(F("unread_count") + delta, 0))
+
+
+def notify(user, kind: str, message: Message, url: str = "", group=None, coalesce_key: str = "") -> Notification:
+  """Create one unread notification and bump the recipient's counter.
+
+  With a `coalesce_key`, an existing unread notification with the same key is
+  updated in place (count + 1, moved to the top) instead of adding a row; the
+  unread counter does not change in that case.
+  """
+  with transaction.atomic():
+    NOTIFICATIONS.inc_on_commit(kind=kind)
+    if coalesce_key:
+      existing = (
+        Notification.objects.select_for_update()
+        .filter(user=user, coalesce_key=coalesce_key, is_read=False)
+        .order_by("-id")
+        .first()
+      )
+      if existing is not None:
+        existing.count += 1
+        existing.message = _render(message, existing.count)
+        existing.url = url
+        existing.created_at = timezone.now()
+        # The updated count has not been emailed yet.
+        existing.emailed_at = None
+        existing.save(update_fields=["count", "message", "url", "created_at", "emailed_at"])
+        return existing
+
+    notification = Notification.objects.create(
+      user=user,
+      kind=kind,
+      message=_render(message, 1),
+      url=url,
+      group=group,
+      coalesce_key=coalesce_key,
+    )
+    _bump_unread(notification.user_id, 1)
+  return notification
+
+
+def notify_many(user_ids: Iterable[int], kind: str, message: str, url: str = "", group=None) -> int:
+  """Create the same notification for many users with one INSERT and one UPDATE."""
+  user_ids = list(dict.fromkeys(user_ids))
+  if not user_ids:
+    return 0
+
+  with transaction.atomic():
+    Notification.objects.bulk_create(
+      [Notification(user_id=uid, kind=kind, message=message, url=url, group=group) for uid in user_ids],
+      batch_size=500,
+    )
+    Profile.objects.filter(user_id__in=user_ids).update(unread_count=F("unread_count") + 1)
+    NOTIFICATIONS.inc_on_commit(len(user_ids), kind=kind)
+  return len(user_ids)
+
+
+def notify_each(messages: Iterable[tuple[int, str, str]], kind: str) -> int:
+  """Create one notification per (user_id, message, url) with one INSERT.
+
+  Counters are bumped with one UPDATE per distinct per-user count, usually one.
+  """
+  messages = list(messages)
+  if not messages:
+    return 0
+
+  with transaction.atomic():
+    Notification.objects.bulk_create(
+      [Notification(user_id=uid, kind=kind, message=message, url=url) for uid, message, url in messages],
+      batch_size=500,
+    )
+    users_by_delta = {}
+    for user_id, n in Counter(uid for uid, _, _ in messages).items():
+      users_by_delta.setdefault(n, []).append(user_id)
+    for n, user_ids in users_by_delta.items():
+      Profile.objects.filter(user_id__in=user_ids).update(unread_count=F("unread_count") + n)
+    NOTIFICATIONS.inc_on_commit(len(messages), kind=kind)
+  return len(messages)
+
+
+def notify_coalesced_many(
+  messages_by_user: dict[int, str],
+  kind: str,
+  coalesce_key: str,
+  url: str = "",
+  group=None,
+) -> int:
+  """Batch form of notify(..., coalesce_key=...) with a per-user message.
+
+  Existing unread rows with the key are updated with one bulk UPDATE, missing
+  ones inserted with one bulk INSERT; returns how many rows were created.
+  """
+  if not messages_by_user:
+    return 0
+
+  now = timezone.now()
+  with transaction.atomic():
+    existing = list(
+      Notification.objects.select_for_update().filter(
+        user_id__in=list(messages_by_user),
+        coalesce_key=coalesce_key,
+        is_read=False,
+      )
+    )
+    seen = set()
+    for notification in existing:
+      seen.add(notification.user_id)
+      notification.count += 1
+      notification.message = messages_by_user[notification.user_id]
+      notification.url = url
+      notification.created_at = now
+      notification.emailed_at = None
+    Notification.objects.bulk_update(existing, ["count", "message", "url", "created_at", "emailed_at"], batch_size=500)
+
+    new_ids = [uid for uid in messages_by_user if uid not in seen]
+    Notification.objects.bulk_create(
+      [
+        Notification(user_id=uid, kind=kind, message=messages_by_user[uid], url=url, group=group, coalesce_key=coalesce_key)
+        for uid in new_ids
+      ],
+      batch_size=500,
+    )
+    Profile.objects.filter(user_id__in=new_ids).update(unread_count=F("unread_count") + 1)
+    NOTIFICATIONS.inc_on_commit(len(messages_by_user), kind=kind)
+  return len(new_ids)
+
+
+def mark_read(queryset) -> int:
+  """Mark the unread rows of `queryset` as read and decrement the owners' counters."""
+  ids_by_user: dict[int, list[int]] = {}
+  for notification_id, user_id in queryset.filter(is_read=False).values_list("id", "user_id"):
+    ids_by_user.setdefault(user_id, []).append(notification_id)
+
+  updated = 0
+  with transaction.atomic():
+    # One UPDATE per owner (usually just one) so each counter drops by the rows
+    # this call flipped; a concurrent mark_read may have taken some already.
+    for user_id, ids in ids_by_user.items():
+      n = Notification.objects.filter(id__in=ids, is_read=False).update(is_read=True)
+      _bump_unread(user_id, -n)
+      updated += n
+  return updated
+
+
+def reconcile_unread_counts(user_ids: Iterable[int] | None = None) -> int:
+  """Recompute counters from the notifications table in a single UPDATE."""
+  unread = (
+    Notification.objects.filter(user_id=OuterRef("user_id"), is_read=False)
+    .order_by()
+    .values("user_id")
+    .annotate(n=Count("id"))
+    .values("n")
+  )
+  profiles = Profile.objects.all()
+  if user_ids is not None:
+    profiles = profiles.filter(user_id__in=list(user_ids))
+  return profiles.update(unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)))
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from campaigns.models import Campaign, CampaignFollow
+from core.cache import invalidate_on
+from donations.models import Donation
+from groups.models import GroupMembership
+
+from .feed import first_page
+from .models import Profile
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_profile_for_new_user(sender, instance, created, raw=False, **kwargs):
+  """Every user gets a profile at creation time, so readers never need get_or_create."""
+  if created and not raw:
+    Profile.objects.get_or_create(user=instance, defaults={"phone": ""})
+
+
+def _feed_key(user_field: str):
+  return lambda instance: [first_page.key(getattr(instance, user_field))]
+
+
+# Which campaigns and groups a feed draws from changes with these rows.
+# (groups.membership.add_members bulk-creates memberships and forgets the
+# feeds itself.)
+invalidate_on(CampaignFollow, GroupMembership, keys=_feed_key("user_id"))
+invalidate_on(Donation, keys=_feed_key("donor_id"))
+invalidate_on(Campaign, keys=_feed_key("created_by_id"))
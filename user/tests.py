@@ -1,3 +1,94 @@
-from django.test import TestCase
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .digest import build_digests, send_digests
+from .models import Notification, Profile
+from .notifications import mark_read, notify
+
+
+class MarkReadTests(TestCase):
+  def setUp(self):
+    self.user = get_user_model().objects.create_user("an", password="pw")
+    self.notifications = [notify(self.user, Notification.KIND_DONATION, f"Donation {i}") for i in range(3)]
+
+  def unread_count(self) -> int:
+    return Profile.objects.get(user=self.user).unread_count
+
+  def test_counter_follows_reads(self):
+    self.assertEqual(self.unread_count(), 3)
+    self.assertEqual(mark_read(Notification.objects.filter(id=self.notifications[0].id)), 1)
+    self.assertEqual(mark_read(Notification.objects.filter(user=self.user)), 2)
+    self.assertEqual(mark_read(Notification.objects.filter(user=self.user)), 0)
+    self.assertEqual(self.unread_count(), 0)
+
+  def test_concurrent_reads_decrement_once(self):
+    # This call read the unread rows, then another request marked one of them
+    # read and a new notification arrived before this call's UPDATE.
+    stale = mock.Mock()
+    stale.filter.return_value.values_list.return_value = list(
+      Notification.objects.filter(user=self.user, is_read=False).values_list("id", "user_id")
+    )
+    mark_read(Notification.objects.filter(id=self.notifications[0].id))
+    notify(self.user, Notification.KIND_DONATION, "Donation 3")
+
+    self.assertEqual(mark_read(stale), 2)
+    self.assertEqual(self.unread_count(), 1)
+    self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), 1)
+
+
+@override_settings(SITE_URL="https://example.org", EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class DigestTests(TestCase):
+  def setUp(self):
+    self.users = []
+    for name in ("an", "binh"):
+      user = get_user_model().objects.create_user(name, f"{name}@example.org", "pw")
+      Profile.objects.filter(user=user).update(email_digest=Profile.DIGEST_DAILY)
+      notify(user, Notification.KIND_DONATION, f"Donation for {name}", url="/campaigns/1/")
+      self.users.append(user)
+    self.now = timezone.now() + timedelta(seconds=1)
+
+  def test_sends_one_email_per_user_and_stamps_the_notifications(self):
+    self.assertEqual(send_digests(Profile.DIGEST_DAILY, now=self.now), 2)
+
+    self.assertEqual(sorted(m.to[0] for m in mail.outbox), ["an@example.org", "binh@example.org"])
+    body = mail.outbox[0].body
+    self.assertIn("https://example.org/campaigns/1/", body)
+    self.assertIn("https://example.org" + reverse("user:notifications"), body)
+    self.assertIn("https://example.org" + reverse("user:profile"), body)
+    self.assertFalse(Notification.objects.filter(emailed_at__isnull=True).exists())
+    self.assertFalse(Profile.objects.filter(user__in=self.users, last_digest_at__isnull=True).exists())
+
+  def test_rerun_sends_nothing_twice(self):
+    send_digests(Profile.DIGEST_DAILY, now=self.now)
+    mail.outbox.clear()
+
+    self.assertEqual(send_digests(Profile.DIGEST_DAILY, now=self.now + timedelta(days=2)), 0)
+    self.assertEqual(mail.outbox, [])
+
+  def test_overlapping_runs_send_each_digest_once(self):
+    # The second run read the same due digests before the first one claimed them.
+    overlapping = build_digests(Profile.DIGEST_DAILY, now=self.now)
+    self.assertEqual(send_digests(Profile.DIGEST_DAILY, now=self.now), 2)
+
+    with mock.patch("user.digest.build_digests", return_value=overlapping):
+      self.assertEqual(send_digests(Profile.DIGEST_DAILY, now=self.now), 0)
+    self.assertEqual(len(mail.outbox), 2)
+
+  def test_failed_batch_is_handed_back(self):
+    with mock.patch.object(EmailBackend, "send_messages", side_effect=SMTPException("down")):
+      with self.assertRaises(SMTPException):
+        send_digests(Profile.DIGEST_DAILY, now=self.now)
+
+    self.assertEqual(Notification.objects.filter(emailed_at__isnull=True).count(), 2)
+    self.assertFalse(Profile.objects.filter(user__in=self.users, last_digest_at__isnull=False).exists())
+
+    self.assertEqual(send_digests(Profile.DIGEST_DAILY, now=self.now), 2)
+    self.assertEqual(len(mail.outbox), 2)
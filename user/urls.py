@@ -1,6 +1,8 @@
 from django.contrib.auth import views as auth_views
 from django.urls import path
 
+from core.querybudget import query_budget
+
 from . import views
 
 app_name = "user"
@@ -11,7 +13,8 @@ urlpatterns = [
   path("signup/", views.signup, name="signup"),
   path("profile/", views.profile, name="profile"),
   path("toggle-theme/", views.toggle_theme, name="toggle_theme"),
-  path("notifications/", views.notifications, name="notifications"),
+  path("notifications/", query_budget(views.notifications, queries=9), name="notifications"),
+  path("feed/", query_budget(views.feed, queries=13), name="feed"),
 
   path(
     "password-reset/",
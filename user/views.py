@@ -1,13 +1,18 @@
 from __future__ import annotations
 
+from datetime import datetime, timedelta, timezone as dt_timezone
+
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
+from django.db.models import Q
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect, render
 
+from .feed import feed_page
 from .forms import SignUpForm
 from .models import Notification, Profile
+from .notifications import mark_read
 
 
 def signup(request: HttpRequest) -> HttpResponse:
@@ -29,7 +34,7 @@ def signup(request: HttpRequest) -> HttpResponse:
 
 @login_required
 def profile(request: HttpRequest) -> HttpResponse:
-  profile = Profile.get_or_create_for_user(request.user)
+  profile = request.profile
 
   if request.method == "POST":
     profile.phone = (request.POST.get("phone") or "").strip()
@@ -38,7 +43,15 @@ def profile(request: HttpRequest) -> HttpResponse:
     profile.interests = (request.POST.get("interests") or "").strip()
     profile.avatar_url = (request.POST.get("avatar_url") or "").strip()
 
-    profile.save()
+    email_digest = request.POST.get("email_digest") or Profile.DIGEST_OFF
+    if email_digest in dict(Profile.DIGEST_CHOICES):
+      profile.email_digest = email_digest
+    # Digests are rendered in the language the user last saved their profile in.
+    profile.language = getattr(request, "LANGUAGE_CODE", "") or ""
+
+    # Only the form's fields: unread_count and last_digest_at are updated
+    # concurrently, and the values read at the start of the request are stale.
+    profile.save(update_fields=["phone", "full_name", "interests", "avatar_url", "email_digest", "language"])
 
     request.user.email = (request.POST.get("email") or "").strip()
     request.user.save(update_fields=["email"])
@@ -63,11 +76,63 @@ def toggle_theme(request: HttpRequest) -> HttpResponse:
   return response
 
 
+NOTIFICATIONS_PAGE_SIZE = 20
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+def _notification_cursor(notification: Notification) -> str:
+  micros = (notification.created_at - _EPOCH) // _MICROSECOND
+  return f"{micros}_{notification.id}"
+
+
+def _parse_notification_cursor(raw: str) -> Q | None:
+  try:
+    micros_raw, id_raw = raw.split("_", 1)
+    created_at = _EPOCH + int(micros_raw) * _MICROSECOND
+    notification_id = int(id_raw)
+  except (ValueError, OverflowError):
+    return None
+  return Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=notification_id)
+
+
 @login_required
 def notifications(request: HttpRequest) -> HttpResponse:
-  items = Notification.objects.filter(user=request.user).order_by("-created_at")[:50]
-  Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
-  return render(request, "user/notifications.html", {"notifications": items})
+  qs = Notification.objects.filter(user=request.user).order_by("-created_at", "-id")
+
+  cursor = _parse_notification_cursor((request.GET.get("before") or "").strip())
+  if cursor is not None:
+    qs = qs.filter(cursor)
+
+  items = list(qs[: NOTIFICATIONS_PAGE_SIZE + 1])
+  has_more = len(items) > NOTIFICATIONS_PAGE_SIZE
+  items = items[:NOTIFICATIONS_PAGE_SIZE]
+
+  # Only what the user actually sees is marked read.
+  unread_ids = [n.id for n in items if not n.is_read]
+  if unread_ids:
+    mark_read(Notification.objects.filter(user=request.user, id__in=unread_ids))
+
+  context = {
+    "notifications": items,
+    "next_cursor": _notification_cursor(items[-1]) if has_more else "",
+  }
+  if request.htmx:
+    return render(request, "user/partials/notification_page.html", context)
+  return render(request, "user/notifications.html", context)
+
+
+@login_required
+def feed(request: HttpRequest) -> HttpResponse:
+  items, next_cursor = feed_page(request.user.id, (request.GET.get("before") or "").strip())
+  context = {
+    "feed_items": items,
+    "next_cursor": next_cursor,
+  }
+  if request.htmx:
+    return render(request, "user/partials/feed_page.html", context)
+  return render(request, "user/feed.html", context)
 
 
 def hello_user(request):